@@ -1,30 +1,257 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify, send_file, stream_with_context, url_for
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import openai
 import os
 from datetime import datetime, timedelta
+from contextlib import contextmanager
 import json
 import base64
+import logging
+import math
+import sys
+import threading
+
+from utils.matcher import KeywordMatcher
+from utils.knowledge import get_knowledge, get_loader
+from utils.retrieval import tokenize
+from utils.storage import Storage
+from utils.blob_store import SAFE_IMAGE_TYPES, BlobWriter, UploadTooLarge, decode_data_url, sniff_mime_type
+from utils.answer_cache import AnswerCache
+from utils.ratelimit import Overloaded, RateLimiter, parse_limit
+from utils.reminders import ReminderScheduler, notifier_from_env
+from utils import log, metrics
+from utils.responses import FastJSONProvider, compress_response
 
 app = Flask(__name__)
 CORS(app)
+# orjson when installed (see utils/responses.py); used by jsonify and get_json
+app.json = FastJSONProvider(app)
+
+# JSON lines on stderr, written by a background thread (see utils/log.py
+# for the LOG_* settings)
+log.configure()
+logger = logging.getLogger("app")
 
 # Configure OpenAI API
 openai.api_key = os.getenv('OPENAI_API_KEY', 'your-openai-api-key-here')
 
-# User session management
-user_sessions = {}
-user_chat_histories = {}
-user_reminders = {}
-user_drawings = {}
-user_uploaded_files = {}
+# Persistent storage for sessions, chat history, reminders, drawings and files
+storage = Storage()
+
+# Due reminders are delivered by a background thread in each worker (see
+# utils/reminders.py); REMINDER_WEBHOOK_URL sends them to a webhook
+reminder_scheduler = ReminderScheduler(
+    storage,
+    notifier_from_env(),
+    poll_interval=float(os.getenv("REMINDER_POLL_SECONDS", 30))
+)
+
+# How many chat messages are kept per user
+CHAT_HISTORY_LIMIT = int(os.getenv("CHAT_HISTORY_LIMIT", 100))
+
+# Most items accepted in one call to a /batch endpoint
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", 50))
+
+# Uploads larger than this are rejected with 413
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+# Allow for base64 inflation in JSON bodies and multipart framing
+MAX_UPLOAD_BODY_BYTES = MAX_UPLOAD_BYTES * 4 // 3 + 64 * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Werkzeug enforces this while reading, so it also holds for chunked
+# bodies, which carry no Content-Length to check up front
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BODY_BYTES
+
+# Optional local text-generation model (backend/model.py) for questions
+# the knowledge base cannot answer
+USE_LOCAL_MODEL = os.getenv("USE_LOCAL_MODEL", "0") == "1"
+LOCAL_MODEL_WARMUP = os.getenv("LOCAL_MODEL_WARMUP", "1") == "1"
+# Set when gunicorn imports this module in its master (preload_app, see
+# gunicorn.conf.py)
+LOCAL_MODEL_PRELOAD = os.getenv("LOCAL_MODEL_PRELOAD", "0") == "1"
+
+def warm_up_model():
+    """One warm-up generation in this process, if enabled"""
+    if USE_LOCAL_MODEL and LOCAL_MODEL_WARMUP:
+        local_model.warm_up()
+
+if USE_LOCAL_MODEL:
+    import model as local_model
+    # With gunicorn preload_app this runs once in the master and the
+    # loaded weights are shared copy-on-write by the forked workers
+    if LOCAL_MODEL_WARMUP:
+        local_model.preload()
+    # A forward pass starts torch's intra-op thread pool, which must not be
+    # running in the master when it forks; preloaded workers each warm up
+    # in post_worker_init instead
+    if not LOCAL_MODEL_PRELOAD:
+        warm_up_model()
+
+# Answers to repeated questions are served from here instead of recomputed
+answer_cache = AnswerCache(
+    max_size=int(os.getenv("ANSWER_CACHE_SIZE", 1024)),
+    ttl=int(os.getenv("ANSWER_CACHE_TTL", 3600)),
+    shared=storage if os.getenv("ANSWER_CACHE_SHARED", "0") == "1" else None
+)
+
+# Token buckets per client on the expensive endpoints; the client is the
+# username the request is for, or else its address. Limits are
+# "<requests>/<seconds>", and RATE_LIMIT_SHARED=1 keeps the buckets in the
+# database so that they hold across gunicorn workers
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+rate_limit_backend = storage if os.getenv("RATE_LIMIT_SHARED", "0") == "1" else None
+rate_limiters = {
+    "ask": RateLimiter("ask", *parse_limit(os.getenv("RATE_LIMIT_ASK", "60/60")), shared=rate_limit_backend),
+    "upload": RateLimiter("upload", *parse_limit(os.getenv("RATE_LIMIT_UPLOAD", "20/60")), shared=rate_limit_backend)
+}
+# Which bucket each endpoint spends from
+RATE_LIMITED_ENDPOINTS = {
+    "ask": "ask",
+    "ask_stream": "ask",
+    "ask_batch": "ask",
+    "upload_file": "upload",
+    "save_drawing": "upload"
+}
+
+# Per-request metrics for /metrics; each worker process keeps its own
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+REQUESTS = metrics.Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "endpoint", "status")
+)
+REQUEST_SECONDS = metrics.Histogram(
+    "http_request_duration_seconds", "Time to produce a response", ("method", "endpoint")
+)
+IN_FLIGHT = metrics.Gauge("http_requests_in_flight", "Requests being handled right now")
+
+# JSON responses above COMPRESS_MIN_BYTES are gzip- or brotli-encoded
+# when the client accepts it
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+
+if COMPRESSION_ENABLED:
+    @app.after_request
+    def compress_large_responses(response):
+        return compress_response(response, request.accept_encodings)
+
+@app.before_request
+def tag_request():
+    # Endpoint names, not paths, so usernames and ids do not become metric labels
+    current = request._get_current_object()
+    endpoint = current.endpoint or "unmatched"
+    current.environ[metrics.WSGIMetrics.ENDPOINT_KEY] = endpoint
+    log.bind(route=endpoint)
+    if current.view_args and "username" in current.view_args:
+        log.bind(user=current.view_args["username"])
+
+def retry_later(status, message, retry_after):
+    """A 429 or 503 telling the client when to try again"""
+    body = {"error": message, "retry_after": retry_after}
+    # The chat window shows the answer field of whatever /ask returns
+    if request.endpoint in ("ask", "ask_stream"):
+        body["answer"] = message
+    response = jsonify(body)
+    response.status_code = status
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+def rate_limit_key():
+    username = request.view_args.get("username") if request.view_args else None
+    if not username and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            username = data.get("username")
+    return f"user:{username}" if username else f"ip:{request.remote_addr}"
+
+if RATE_LIMIT_ENABLED:
+    @app.before_request
+    def enforce_rate_limit():
+        bucket = RATE_LIMITED_ENDPOINTS.get(request.endpoint)
+        if bucket is None:
+            return None
+        cost = 1
+        if request.endpoint == "ask_batch":
+            # Each question in a batch counts as one /ask
+            data = request.get_json(silent=True)
+            questions = data.get("questions") if isinstance(data, dict) else None
+            if isinstance(questions, list) and questions:
+                cost = len(questions)
+        wait = rate_limiters[bucket].take(rate_limit_key(), cost)
+        if wait:
+            return retry_later(429, "You're sending requests too quickly. Please wait a moment and try again.",
+                               math.ceil(wait))
+        return None
+
+if METRICS_ENABLED:
+    # Timing and counting happen in WSGI middleware rather than Flask's
+    # before/after/teardown hooks, which cost several times as much per
+    # request
+    app.wsgi_app = metrics.WSGIMetrics(app.wsgi_app, REQUESTS, REQUEST_SECONDS, IN_FLIGHT)
+
+# Outermost, so the request id is set for everything below it
+app.wsgi_app = log.AccessLog(app.wsgi_app)
+
+# Everything below is read when /metrics is scraped, not on each request
+metrics.REGISTRY.register_callback(
+    "app_answer_cache_hits_total", "counter", "Answer cache hits",
+    lambda: {("local",): answer_cache.hits, ("shared",): answer_cache.shared_hits}, ("tier",)
+)
+metrics.REGISTRY.register_callback(
+    "app_answer_cache_misses_total", "counter", "Answer cache misses", lambda: answer_cache.misses
+)
+metrics.REGISTRY.register_callback(
+    "app_answer_cache_evictions_total", "counter", "Answers evicted from the local cache",
+    lambda: answer_cache.evictions
+)
+metrics.REGISTRY.register_callback(
+    "app_answer_cache_entries", "gauge", "Answers in the local cache", lambda: answer_cache.stats()["size"]
+)
+metrics.REGISTRY.register_callback(
+    "app_answer_cache_hit_ratio", "gauge", "Share of lookups answered from the cache",
+    lambda: answer_cache.stats()["hit_rate"]
+)
+metrics.REGISTRY.register_callback(
+    "app_stored_items", "gauge", "Rows stored, from the incrementally maintained counters",
+    lambda: {(kind,): value for kind, value in storage.stats().items()}, ("kind",)
+)
+metrics.REGISTRY.register_callback(
+    "app_reminders_delivered_total", "counter", "Reminders handed to the notifier by this process",
+    lambda: reminder_scheduler.delivered
+)
+metrics.REGISTRY.register_callback(
+    "app_reminders_failed_total", "counter", "Delivery attempts the notifier failed",
+    lambda: reminder_scheduler.failed
+)
+metrics.REGISTRY.register_callback(
+    "app_reminders_dropped_total", "counter", "Reminders given up on after too many failed deliveries",
+    lambda: reminder_scheduler.dropped
+)
+metrics.REGISTRY.register_callback(
+    "app_log_records_dropped_total", "counter", "Log records dropped because the log queue was full",
+    log.dropped_records
+)
+metrics.REGISTRY.register_callback(
+    "app_rate_limited_total", "counter", "Requests refused with 429 by this process",
+    lambda: {(name,): limiter.limited for name, limiter in rate_limiters.items()}, ("bucket",)
+)
+metrics.REGISTRY.register_callback(
+    "app_knowledge_base_entries", "gauge", "Entries in the loaded knowledge base", lambda: len(get_knowledge())
+)
+metrics.REGISTRY.register_callback(
+    "app_knowledge_base_reloads_total", "counter", "Knowledge base reloads", lambda: get_loader().reloads
+)
 
 class UserSession:
+    # One of these is built per request, so it is kept small: no instance
+    # dict, topics as a tuple of interned strings (topic names repeat across
+    # users, so every session shares one copy), quiz scores as (score, total)
+    __slots__ = ("username", "login_time", "questions_asked", "topics_covered",
+                 "quiz_scores", "last_activity", "theme_preference")
+    
     def __init__(self, username):
         self.username = username
         self.login_time = datetime.now()
         self.questions_asked = 0
-        self.topics_covered = set()
+        self.topics_covered = ()
         self.quiz_scores = {}
         self.last_activity = datetime.now()
         self.theme_preference = "light"
@@ -34,57 +261,268 @@ class UserSession:
         self.questions_asked += 1
     
     def add_topic(self, topic):
-        self.topics_covered.add(topic)
+        if topic not in self.topics_covered:
+            self.topics_covered += (sys.intern(topic),)
     
     def add_quiz_score(self, topic, score, total):
-        self.quiz_scores[topic] = {"score": score, "total": total}
+        self.quiz_scores[sys.intern(topic)] = (score, total)
     
     def set_theme(self, theme):
         self.theme_preference = theme
+    
+    def to_record(self):
+        return {
+            "username": self.username,
+            "login_time": self.login_time.isoformat(),
+            "questions_asked": self.questions_asked,
+            "topics_covered": sorted(self.topics_covered),
+            "quiz_scores": {topic: {"score": score, "total": total}
+                            for topic, (score, total) in self.quiz_scores.items()},
+            "last_activity": self.last_activity.isoformat(),
+            "theme_preference": self.theme_preference
+        }
+    
+    @classmethod
+    def from_record(cls, record):
+        session = cls(record["username"])
+        session.login_time = datetime.fromisoformat(record["login_time"])
+        session.questions_asked = record["questions_asked"]
+        session.topics_covered = tuple(sys.intern(topic) for topic in record["topics_covered"])
+        session.quiz_scores = {sys.intern(topic): (score["score"], score["total"])
+                               for topic, score in record["quiz_scores"].items()}
+        session.last_activity = datetime.fromisoformat(record["last_activity"])
+        session.theme_preference = record["theme_preference"]
+        return session
+
+@contextmanager
+def edit_session(username, create=True):
+    """Yield (session, created) for update and save it back in the same transaction"""
+    with storage.transaction() as conn:
+        record = storage.load_session(username, conn)
+        created = record is None
+        if not created:
+            session = UserSession.from_record(record)
+        elif create:
+            session = UserSession(username)
+        else:
+            session = None
+        yield session, created
+        if session is not None:
+            storage.save_session(session.to_record(), conn)
 
-# Enhanced knowledge base
-knowledge_base = {
-    "photosynthesis": "Photosynthesis is the process by which plants use sunlight, water, and carbon dioxide to produce oxygen and energy in the form of sugar.",
-    "python": "Python is a high-level, interpreted programming language known for its simple syntax and versatility. It's great for beginners!",
-    "gravity": "Gravity is a force that attracts objects toward each other. On Earth, it gives weight to physical objects and causes them to fall toward the ground.",
-    "mitosis": "Mitosis is a process of cell division that results in two identical daughter cells. It has phases: prophase, metaphase, anaphase, and telophase.",
-    "algebra": "Algebra is a branch of mathematics dealing with symbols and the rules for manipulating those symbols to solve equations.",
-    "water cycle": "The water cycle describes how water evaporates from the surface, rises into the atmosphere, cools and condenses into clouds, and falls back as precipitation.",
-    "france": "The capital of France is Paris, known for the Eiffel Tower and rich cultural history.",
+greetings = ["hello", "hi", "hey", "greetings"]
+
+# Enhanced subject detection
+subjects = {
+    "math": ["math", "mathematics", "algebra", "geometry", "calculus"],
+    "science": ["science", "physics", "chemistry", "biology"],
+    "programming": ["programming", "coding", "python", "javascript", "java"],
+    "history": ["history", "historical", "past events"],
+    "geography": ["geography", "countries", "capitals"]
 }
 
+def build_response_matcher(knowledge):
+    """Build the keyword matcher once; priority is greeting > topic > subject"""
+    matcher = KeywordMatcher()
+    for greeting in greetings:
+        matcher.add(greeting, "greeting", greeting)
+    for topic in knowledge.topics:
+        matcher.add(topic, "topic", topic)
+    for subject, keywords in subjects.items():
+        for keyword in keywords:
+            matcher.add(keyword, "subject", subject)
+    return matcher.build()
+
+# (knowledge base, matcher built from it); replaced when the knowledge base reloads
+_response_state = (None, None)
+_response_state_lock = threading.Lock()
+
+def get_response_state():
+    """The current knowledge base and its matcher, rebuilding the matcher after a reload"""
+    global _response_state
+    knowledge = get_knowledge()
+    built_for, matcher = _response_state
+    if built_for is knowledge:
+        return built_for, matcher
+    
+    # While one thread rebuilds, the others keep answering from the old snapshot
+    if not _response_state_lock.acquire(blocking=built_for is None):
+        return built_for, matcher
+    try:
+        if _response_state[0] is not knowledge:
+            _response_state = (knowledge, build_response_matcher(knowledge))
+            # Cached answers may come from the old knowledge base; keying
+            # them by version also hides the old ones in the shared cache
+            answer_cache.set_version(knowledge.version)
+        return _response_state
+    finally:
+        _response_state_lock.release()
+
+# Load the knowledge base and build its matcher at startup, not on the first question
+get_response_state()
+
+# Questions that do not name a topic exactly are looked up in the knowledge
+# base's BM25 index; weak hits are ignored
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", 3.0))
+
+def get_retrieval_response(knowledge, question):
+    """Best indexed answer for the question, or None if nothing is close enough"""
+    results = knowledge.search(question, k=1)
+    if not results:
+        return None
+    
+    score, matched_terms, entry = results[0]
+    # A single shared word is not enough unless the question has only one
+    if score < RETRIEVAL_MIN_SCORE or matched_terms < min(2, len(tokenize(question))):
+        return None
+    
+    if not entry["topic"]:
+        return entry["answer"]
+    return format_topic_answer(entry["topic"], entry["answer"])
+
+def format_topic_answer(topic, answer):
+    return f"**{topic.title()}**: {answer}\n\nWould you like me to explain any specific aspect of {topic} in more detail?"
+
+def get_knowledge_base_response(question):
+    """Answer from greetings, the knowledge base or subject keywords; None if nothing matches"""
+    knowledge, matcher = get_response_state()
+    match = matcher.best_match(question)
+    
+    # Exact greetings and topic names win; then the retrieval index; then
+    # a general subject keyword
+    if not match or match[0] == "subject":
+        answer = get_retrieval_response(knowledge, question)
+        if answer:
+            return answer
+    
+    if not match:
+        return None
+    
+    kind, key = match
+    
+    if kind == "greeting":
+        return "Hello! I'm your AI Tutoring Bot, here to help you learn and explore various subjects. I can assist with science, math, programming, history, and much more. What would you like to learn about today?"
+    
+    if kind == "topic":
+        return format_topic_answer(key, knowledge.topic_answer(key))
+    
+    return f"I'd be happy to help you with {key}! Could you be more specific about what you'd like to learn? For example, you could ask about specific concepts, theories, or applications in {key}."
+
+def get_fallback_response(question):
+    return f"Thank you for your question about '{question}'. I'm designed to help students learn various subjects. I can provide explanations, examples, and guidance on topics like:\n\n• Mathematics (algebra, geometry, calculus)\n• Science (physics, chemistry, biology)\n• Programming (Python, web development)\n• History and social studies\n• Language arts\n\nCould you tell me which subject area you're most interested in, or ask me a more specific question?"
+
+MODEL_BUSY_RESPONSE = "I'm answering a lot of questions right now. Please try again in a moment."
+
+AI_ERROR_RESPONSE = "I apologize, but I'm having trouble processing your question right now. Please try again with a different question about your learning topic."
+
 def get_ai_response(question):
-    """Get response from AI"""
+    """
+    Get response from AI, as (answer, cacheable). The apology for a failed
+    answer is not cacheable, so the question is tried again next time, and
+    neither is the fallback, which quotes the question word for word.
+    """
     try:
-        question_lower = question.lower()
+        answer = get_knowledge_base_response(question)
+        if answer:
+            return answer, True
         
-        greetings = ["hello", "hi", "hey", "greetings"]
-        if any(greeting in question_lower for greeting in greetings):
-            return "Hello! I'm your AI Tutoring Bot, here to help you learn and explore various subjects. I can assist with science, math, programming, history, and much more. What would you like to learn about today?"
+        if USE_LOCAL_MODEL:
+            return local_model.get_answer(question), True
         
-        # Check knowledge base first
-        for topic, answer in knowledge_base.items():
-            if topic in question_lower:
-                return f"**{topic.title()}**: {answer}\n\nWould you like me to explain any specific aspect of {topic} in more detail?"
-        
-        # Enhanced subject detection
-        subjects = {
-            "math": ["math", "mathematics", "algebra", "geometry", "calculus"],
-            "science": ["science", "physics", "chemistry", "biology"],
-            "programming": ["programming", "coding", "python", "javascript", "java"],
-            "history": ["history", "historical", "past events"],
-            "geography": ["geography", "countries", "capitals"]
-        }
+        return get_fallback_response(question), False
         
-        for subject, keywords in subjects.items():
-            if any(keyword in question_lower for keyword in keywords):
-                return f"I'd be happy to help you with {subject}! Could you be more specific about what you'd like to learn? For example, you could ask about specific concepts, theories, or applications in {subject}."
-        
-        return f"Thank you for your question about '{question}'. I'm designed to help students learn various subjects. I can provide explanations, examples, and guidance on topics like:\n\n• Mathematics (algebra, geometry, calculus)\n• Science (physics, chemistry, biology)\n• Programming (Python, web development)\n• History and social studies\n• Language arts\n\nCould you tell me which subject area you're most interested in, or ask me a more specific question?"
-        
-    except Exception as e:
-        print(f"Error in AI response: {e}")
-        return "I apologize, but I'm having trouble processing your question right now. Please try again with a different question about your learning topic."
+    except Overloaded:
+        raise
+    except Exception:
+        logger.exception("AI response failed")
+        return AI_ERROR_RESPONSE, False
+
+def get_ai_responses(questions):
+    """
+    get_ai_response for several questions. The ones only the local model
+    can answer are generated together, as batched inference. A question
+    that could not be answered comes back as (None, False).
+    """
+    answers = []
+    for_model = []
+    for question in questions:
+        try:
+            answer = get_knowledge_base_response(question)
+        except Exception:
+            logger.exception("AI response failed")
+            answers.append((None, False))
+            continue
+        if answer:
+            answers.append((answer, True))
+        elif USE_LOCAL_MODEL:
+            for_model.append(len(answers))
+            answers.append((None, False))
+        else:
+            answers.append((get_fallback_response(question), False))
+    
+    if for_model:
+        try:
+            replies = local_model.get_answers([questions[i] for i in for_model])
+        except Overloaded:
+            raise
+        except Exception:
+            logger.exception("AI response failed")
+            return answers
+        for i, reply in zip(for_model, replies):
+            answers[i] = (reply, True)
+    return answers
+
+def save_exchange(username, question, answer):
+    """Record a question and its answer in the user's chat history"""
+    save_exchanges(username, [(question, answer)])
+
+def save_exchanges(username, exchanges):
+    """Record several (question, answer) pairs in one write"""
+    entries = []
+    for question, answer in exchanges:
+        entries.append({
+            "message": question,
+            "sender": "user",
+            "timestamp": datetime.now().isoformat()
+        })
+        entries.append({
+            "message": answer,
+            "sender": "bot",
+            "timestamp": datetime.now().isoformat()
+        })
+    storage.add_chat_messages(username, entries, keep=CHAT_HISTORY_LIMIT)
+
+def batch_items(field):
+    """
+    The list under `field` in a batch request's JSON body, or an error
+    response if it is missing, empty or longer than MAX_BATCH_ITEMS.
+    Returns (items, error_response).
+    """
+    data = request.get_json(silent=True)
+    items = data.get(field) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"'{field}' must be a non-empty list"}), 400)
+    if len(items) > MAX_BATCH_ITEMS:
+        return None, (jsonify({"error": f"At most {MAX_BATCH_ITEMS} items per batch"}), 400)
+    return items, None
+
+def list_page(fetch, username):
+    """
+    One page of a user's reminders, drawings or files. Pass ?after=<id> to
+    skip items the client already has and ?limit=<n> to cap the page;
+    next_cursor is the value to send as after for the next page.
+    """
+    after = request.args.get("after", 0, type=int)
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = max(1, limit)
+    
+    # One extra row tells us whether another page follows
+    items = fetch(username, after=after, limit=None if limit is None else limit + 1)
+    has_more = limit is not None and len(items) > limit
+    if has_more:
+        items = items[:limit]
+    return items, {"next_cursor": items[-1]["id"] if items else after, "has_more": has_more}
 
 # ============================================
 # STUDY REMINDERS ENDPOINTS
@@ -93,15 +531,13 @@ def get_ai_response(question):
 @app.route("/reminders/<username>", methods=["GET"])
 def get_reminders(username):
     """Get all reminders for a user"""
-    if username not in user_reminders:
-        user_reminders[username] = []
-    
-    # Filter out past reminders
-    current_time = datetime.now()
-    active_reminders = [r for r in user_reminders[username] if datetime.fromisoformat(r['datetime']) > current_time]
-    user_reminders[username] = active_reminders
+    # Reminders that are already due belong to the scheduler
+    now = datetime.now().timestamp()
+    active_reminders, page = list_page(
+        lambda username, **kwargs: storage.get_active_reminders(username, now, **kwargs), username
+    )
     
-    return jsonify({"reminders": active_reminders})
+    return jsonify({"reminders": active_reminders, **page})
 
 @app.route("/reminders/<username>/add", methods=["POST"])
 def add_reminder(username):
@@ -122,11 +558,7 @@ def add_reminder(username):
         except:
             return jsonify({"error": "Invalid datetime format"}), 400
         
-        if username not in user_reminders:
-            user_reminders[username] = []
-        
         reminder = {
-            "id": len(user_reminders[username]) + 1,
             "title": title,
             "subject": subject,
             "datetime": datetime_str,
@@ -134,24 +566,23 @@ def add_reminder(username):
             "created_at": datetime.now().isoformat()
         }
         
-        user_reminders[username].append(reminder)
+        reminder["id"] = storage.add_reminder(username, reminder, reminder_datetime.timestamp())
+        reminder_scheduler.schedule(reminder_datetime.timestamp())
         
         return jsonify({
             "status": "reminder added",
             "reminder": reminder
         })
         
-    except Exception as e:
-        print(f"Error adding reminder: {e}")
+    except Exception:
+        logger.exception("Adding reminder failed")
         return jsonify({"error": "Failed to add reminder"}), 500
 
 @app.route("/reminders/<username>/delete/<int:reminder_id>", methods=["DELETE"])
 def delete_reminder(username, reminder_id):
     """Delete a specific reminder"""
-    if username not in user_reminders:
-        return jsonify({"error": "No reminders found"}), 404
-    
-    user_reminders[username] = [r for r in user_reminders[username] if r['id'] != reminder_id]
+    if not storage.delete_reminder(username, reminder_id):
+        return jsonify({"error": "Reminder not found"}), 404
     
     return jsonify({"status": "reminder deleted"})
 
@@ -171,18 +602,26 @@ def save_drawing(username):
         if not drawing_data:
             return jsonify({"error": "Drawing data is required"}), 400
         
-        if username not in user_drawings:
-            user_drawings[username] = []
+        # Decode once; only the raw bytes are kept, on disk
+        try:
+            content, _ = decode_data_url(drawing_data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # The stored type comes from the bytes, not the data URL, since
+        # drawings are shown inline
+        mime_type = sniff_mime_type(content[:BlobWriter.SNIFF_BYTES])
+        if mime_type not in SAFE_IMAGE_TYPES:
+            return jsonify({"error": "Drawing must be a PNG, JPEG, GIF or WebP image"}), 400
         
         drawing = {
-            "id": len(user_drawings[username]) + 1,
             "title": title,
             "subject": subject,
-            "data": drawing_data,
+            "mime_type": mime_type,
             "created_at": datetime.now().isoformat()
         }
         
-        user_drawings[username].append(drawing)
+        drawing["id"] = storage.add_drawing(username, drawing, content)
         
         return jsonify({
             "status": "drawing saved",
@@ -194,46 +633,60 @@ def save_drawing(username):
             }
         })
         
-    except Exception as e:
-        print(f"Error saving drawing: {e}")
+    except Exception:
+        logger.exception("Saving drawing failed")
         return jsonify({"error": "Failed to save drawing"}), 500
 
 @app.route("/drawings/<username>", methods=["GET"])
 def get_drawings(username):
     """Get all drawings for a user"""
-    if username not in user_drawings:
-        user_drawings[username] = []
+    # Return without full drawing data (too large); each image has its own url
+    drawings_list, page = list_page(storage.list_drawings, username)
+    for drawing in drawings_list:
+        drawing["url"] = url_for("get_drawing_image", username=username, drawing_id=drawing["id"])
     
-    # Return without full drawing data (too large)
-    drawings_list = [{
-        "id": d["id"],
-        "title": d["title"],
-        "subject": d["subject"],
-        "created_at": d["created_at"]
-    } for d in user_drawings[username]]
-    
-    return jsonify({"drawings": drawings_list})
+    return jsonify({"drawings": drawings_list, **page})
 
 @app.route("/drawings/<username>/<int:drawing_id>", methods=["GET"])
 def get_drawing(username, drawing_id):
-    """Get a specific drawing with full data"""
-    if username not in user_drawings:
-        return jsonify({"error": "No drawings found"}), 404
+    """Get a specific drawing; the image itself is served from its url"""
+    drawing = storage.get_drawing(username, drawing_id)
     
-    drawing = next((d for d in user_drawings[username] if d['id'] == drawing_id), None)
+    if not drawing:
+        return jsonify({"error": "Drawing not found"}), 404
+    
+    # Drawings are never edited, so id and content hash name this version
+    etag = f'{drawing_id}-{drawing["blob_sha"][:16]}'
+    if request.if_none_match.contains_weak(etag):
+        return "", 304, {"ETag": f'"{etag}"'}
+    
+    response = jsonify({"drawing": {
+        "id": drawing["id"],
+        "title": drawing["title"],
+        "subject": drawing["subject"],
+        "mime_type": drawing["mime_type"],
+        "size": drawing["size"],
+        "created_at": drawing["created_at"],
+        "url": url_for("get_drawing_image", username=username, drawing_id=drawing_id)
+    }})
+    response.set_etag(etag)
+    return response
+
+@app.route("/drawings/<username>/<int:drawing_id>/image", methods=["GET"])
+def get_drawing_image(username, drawing_id):
+    """Stream the drawing bytes (supports Range and ETag)"""
+    drawing = storage.get_drawing(username, drawing_id)
     
     if not drawing:
         return jsonify({"error": "Drawing not found"}), 404
     
-    return jsonify({"drawing": drawing})
+    return send_blob(drawing["blob_sha"], drawing["mime_type"])
 
 @app.route("/drawings/<username>/<int:drawing_id>", methods=["DELETE"])
 def delete_drawing(username, drawing_id):
     """Delete a specific drawing"""
-    if username not in user_drawings:
-        return jsonify({"error": "No drawings found"}), 404
-    
-    user_drawings[username] = [d for d in user_drawings[username] if d['id'] != drawing_id]
+    if not storage.delete_drawing(username, drawing_id):
+        return jsonify({"error": "Drawing not found"}), 404
     
     return jsonify({"status": "drawing deleted"})
 
@@ -241,76 +694,180 @@ def delete_drawing(username, drawing_id):
 # FILE UPLOAD ENDPOINTS
 # ============================================
 
+class UploadRequest(Request):
+    """Spool multipart file parts straight into the blob store"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Parts are parsed one after another, so the earlier writers are
+        # complete; together the file parts of a request get MAX_UPLOAD_BYTES
+        writers = self.__dict__.setdefault("upload_writers", [])
+        writer = storage.blobs.writer(MAX_UPLOAD_BYTES - sum(earlier.size for earlier in writers))
+        writers.append(writer)
+        return writer
+    
+    def close(self):
+        # Drop spooled parts that were never committed, even if parsing failed
+        for writer in self.__dict__.get("upload_writers", []):
+            writer.close()
+        super().close()
+
+app.request_class = UploadRequest
+
+def read_multipart_upload():
+    """Return (writer, file_name, file_type, question) for a multipart/form-data upload"""
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return None, "", "", ""
+    writer = upload.stream
+    file_type = request.form.get("fileType") or writer.mime_type or upload.mimetype
+    file_name = request.form.get("fileName") or upload.filename
+    return writer, file_name, file_type, request.form.get("question", "")
+
+def read_raw_upload():
+    """Return (writer, file_name, file_type, question) for an application/octet-stream upload"""
+    file_name = request.args.get("fileName") or request.headers.get("X-File-Name", "")
+    if not file_name:
+        return None, "", "", ""
+    writer = storage.blobs.writer(MAX_UPLOAD_BYTES)
+    try:
+        while True:
+            chunk = request.stream.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except Exception:
+        writer.close()
+        raise
+    file_type = request.args.get("fileType") or writer.mime_type
+    return writer, file_name, file_type, request.args.get("question", "")
+
+def upload_response(file_name, file_type, question):
+    """Generate response based on file type"""
+    if file_type.startswith('image/'):
+        response = f"I can see you've uploaded an image: '{file_name}'. "
+        if question:
+            response += f"Regarding your question '{question}', I'll help you analyze this image. "
+        response += "Please describe what you need help with in the image, such as:\n\n"
+        response += "• Solving a math problem shown in the image\n"
+        response += "• Understanding a diagram or concept\n"
+        response += "• Analyzing a chart or graph\n"
+        response += "• Getting help with handwritten notes\n\n"
+        response += "The more specific you are, the better I can assist you!"
+    else:
+        response = f"I've received your file: '{file_name}'. "
+        if question:
+            response += f"You asked: '{question}'. "
+        response += "I'm analyzing your file. Please provide more details about what you need help with!"
+    return response
+
 @app.route("/files/<username>/upload", methods=["POST"])
 def upload_file(username):
-    """Upload a file and get AI help"""
+    """
+    Upload a file and get AI help.
+    Accepts multipart/form-data or application/octet-stream (streamed to
+    disk in chunks), or the original JSON body with a base64 "file" field.
+    """
+    writer = None
     try:
-        data = request.get_json()
-        file_data = data.get("file", "")
-        file_name = data.get("fileName", "")
-        file_type = data.get("fileType", "")
-        question = data.get("question", "")
+        # Reject before reading anything if the declared body is already too big
+        if request.content_length is not None and request.content_length > MAX_UPLOAD_BODY_BYTES:
+            return jsonify({"error": "File too large"}), 413
         
-        if not file_data or not file_name:
-            return jsonify({"error": "File data and name are required"}), 400
-        
-        if username not in user_uploaded_files:
-            user_uploaded_files[username] = []
+        if request.mimetype in ("multipart/form-data", "application/octet-stream"):
+            if request.mimetype == "multipart/form-data":
+                writer, file_name, file_type, question = read_multipart_upload()
+            else:
+                writer, file_name, file_type, question = read_raw_upload()
+            
+            if writer is None or writer.size == 0:
+                return jsonify({"error": "File data and name are required"}), 400
+            content = None
+        else:
+            data = request.get_json()
+            file_data = data.get("file", "")
+            file_name = data.get("fileName", "")
+            file_type = data.get("fileType", "")
+            question = data.get("question", "")
+            
+            if not file_data or not file_name:
+                return jsonify({"error": "File data and name are required"}), 400
+            
+            try:
+                content, mime_type = decode_data_url(file_data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            if len(content) > MAX_UPLOAD_BYTES:
+                return jsonify({"error": "File too large"}), 413
+            file_type = file_type or mime_type
         
         file_record = {
-            "id": len(user_uploaded_files[username]) + 1,
             "fileName": file_name,
             "fileType": file_type,
-            "data": file_data,
             "question": question,
             "uploaded_at": datetime.now().isoformat()
         }
         
-        user_uploaded_files[username].append(file_record)
-        
-        # Generate response based on file type
-        if file_type.startswith('image/'):
-            response = f"I can see you've uploaded an image: '{file_name}'. "
-            if question:
-                response += f"Regarding your question '{question}', I'll help you analyze this image. "
-            response += "Please describe what you need help with in the image, such as:\n\n"
-            response += "• Solving a math problem shown in the image\n"
-            response += "• Understanding a diagram or concept\n"
-            response += "• Analyzing a chart or graph\n"
-            response += "• Getting help with handwritten notes\n\n"
-            response += "The more specific you are, the better I can assist you!"
+        if writer is not None:
+            file_record["id"] = storage.add_file_from_writer(username, file_record, writer)
         else:
-            response = f"I've received your file: '{file_name}'. "
-            if question:
-                response += f"You asked: '{question}'. "
-            response += "I'm analyzing your file. Please provide more details about what you need help with!"
+            file_record["id"] = storage.add_file(username, file_record, content)
         
         return jsonify({
             "status": "file uploaded",
             "fileId": file_record["id"],
-            "response": response
+            "response": upload_response(file_name, file_type, question)
         })
         
-    except Exception as e:
-        print(f"Error uploading file: {e}")
+    except (UploadTooLarge, RequestEntityTooLarge):
+        return jsonify({"error": "File too large"}), 413
+    except Exception:
+        logger.exception("File upload failed")
         return jsonify({"error": "Failed to upload file"}), 500
+    finally:
+        if writer is not None:
+            writer.close()
 
 @app.route("/files/<username>", methods=["GET"])
 def get_uploaded_files(username):
     """Get all uploaded files for a user"""
-    if username not in user_uploaded_files:
-        user_uploaded_files[username] = []
-    
     # Return without full file data
-    files_list = [{
-        "id": f["id"],
-        "fileName": f["fileName"],
-        "fileType": f["fileType"],
-        "question": f["question"],
-        "uploaded_at": f["uploaded_at"]
-    } for f in user_uploaded_files[username]]
+    files_list, page = list_page(storage.list_files, username)
+    
+    return jsonify({"files": files_list, **page})
+
+@app.route("/files/<username>/<int:file_id>/download", methods=["GET"])
+def download_file(username, file_id):
+    """Stream an uploaded file (supports Range and ETag)"""
+    file_record = storage.get_file(username, file_id)
+    
+    if not file_record:
+        return jsonify({"error": "File not found"}), 404
     
-    return jsonify({"files": files_list})
+    return send_blob(file_record["blob_sha"], file_record["fileType"], file_record["fileName"])
+
+def send_blob(sha, mime_type, download_name=None):
+    """
+    Serve a stored blob; its SHA-256 doubles as a strong ETag. The stored
+    type is whatever the uploader claimed, so only bytes that are a safe
+    image are shown inline; anything else (HTML, say) is sent as a
+    download, so it never runs as a page on this origin.
+    """
+    path = storage.blob_path(sha)
+    with open(path, "rb") as f:
+        sniffed = sniff_mime_type(f.read(BlobWriter.SNIFF_BYTES))
+    inline = sniffed in SAFE_IMAGE_TYPES
+    response = send_file(
+        path,
+        mimetype=sniffed if inline else mime_type or "application/octet-stream",
+        as_attachment=not inline,
+        download_name=download_name,
+        conditional=True,
+        etag=sha,
+        max_age=3600
+    )
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
 
 # ============================================
 # EXISTING ENDPOINTS
@@ -318,13 +875,14 @@ def get_uploaded_files(username):
 
 @app.route("/session/<username>", methods=["GET"])
 def get_session(username):
-    if username in user_sessions:
-        session = user_sessions[username]
+    record = storage.load_session(username)
+    if record is not None:
+        session = UserSession.from_record(record)
         return jsonify({
             "username": session.username,
             "questions_asked": session.questions_asked,
             "topics_covered": list(session.topics_covered),
-            "quiz_scores": session.quiz_scores,
+            "quiz_scores": session.to_record()["quiz_scores"],
             "theme_preference": session.theme_preference,
             "session_duration": str(datetime.now() - session.login_time)
         })
@@ -335,19 +893,14 @@ def update_session(username):
     data = request.get_json()
     topic = data.get("topic", "")
     
-    if username in user_sessions:
-        session = user_sessions[username]
+    with edit_session(username) as (session, created):
         session.update_activity()
         if topic:
             session.add_topic(topic)
-        return jsonify({"status": "updated"})
     
-    user_sessions[username] = UserSession(username)
-    session = user_sessions[username]
-    session.update_activity()
-    if topic:
-        session.add_topic(topic)
-    return jsonify({"status": "created and updated"})
+    if created:
+        return jsonify({"status": "created and updated"})
+    return jsonify({"status": "updated"})
 
 @app.route("/session/<username>/quiz", methods=["POST"])
 def add_quiz_score(username):
@@ -356,24 +909,64 @@ def add_quiz_score(username):
     score = data.get("score", 0)
     total = data.get("total", 1)
     
-    if username in user_sessions:
-        session = user_sessions[username]
+    with edit_session(username) as (session, created):
         session.add_quiz_score(topic, score, total)
-        return jsonify({"status": "quiz score added"})
     
-    user_sessions[username] = UserSession(username)
-    session = user_sessions[username]
-    session.add_quiz_score(topic, score, total)
-    return jsonify({"status": "session created and quiz score added"})
+    if created:
+        return jsonify({"status": "session created and quiz score added"})
+    return jsonify({"status": "quiz score added"})
+
+@app.route("/session/<username>/update/batch", methods=["POST"])
+def update_session_batch(username):
+    """
+    Several /update and /quiz calls in one request and one write. Each
+    update is {"type": "topic", "topic": ...} (the default type) or
+    {"type": "quiz", "topic": ..., "score": ..., "total": ...}; results
+    line up with the updates.
+    """
+    updates, error = batch_items("updates")
+    if error:
+        return error
+    
+    results = []
+    with edit_session(username) as (session, created):
+        for update in updates:
+            if not isinstance(update, dict):
+                results.append({"error": "Update must be an object"})
+                continue
+            kind = update.get("type", "topic")
+            if kind == "topic":
+                session.update_activity()
+                topic = update.get("topic", "")
+                if topic:
+                    session.add_topic(topic)
+                results.append({"status": "updated"})
+            elif kind == "quiz":
+                score = update.get("score", 0)
+                total = update.get("total", 1)
+                if not isinstance(score, (int, float)) or not isinstance(total, (int, float)):
+                    results.append({"error": "score and total must be numbers"})
+                    continue
+                session.add_quiz_score(update.get("topic", ""), score, total)
+                results.append({"status": "quiz score added"})
+            else:
+                results.append({"error": f"Unknown update type '{kind}'"})
+    
+    return jsonify({
+        "status": "created and updated" if created else "updated",
+        "results": results
+    })
 
 @app.route("/session/<username>/theme", methods=["POST"])
 def update_theme(username):
     data = request.get_json()
     theme = data.get("theme", "light")
     
-    if username in user_sessions:
-        session = user_sessions[username]
-        session.set_theme(theme)
+    with edit_session(username, create=False) as (session, created):
+        if session is not None:
+            session.set_theme(theme)
+    
+    if session is not None:
         return jsonify({"status": "theme updated", "theme": theme})
     return jsonify({"error": "Session not found"}), 404
 
@@ -383,20 +976,44 @@ def create_session():
     username = data.get("username", "")
     
     if username:
-        user_sessions[username] = UserSession(username)
-        if username not in user_chat_histories:
-            user_chat_histories[username] = []
+        storage.save_session(UserSession(username).to_record())
         return jsonify({"status": "session created"})
     return jsonify({"error": "Username required"}), 400
 
 @app.route("/chat/<username>/history", methods=["GET"])
 def get_chat_history(username):
-    if username in user_chat_histories:
-        return jsonify({
-            "history": user_chat_histories[username],
-            "count": len(user_chat_histories[username])
-        })
-    return jsonify({"history": [], "count": 0})
+    """
+    Chat history, oldest first. Pass ?since=<id> to get only messages newer
+    than one the client already has, and ?limit=<n> to page through them;
+    next_cursor is the value to send as since for the next page.
+    """
+    since = request.args.get("since", 0, type=int)
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        # An empty page would move next_cursor past messages never sent
+        limit = max(1, limit)
+    
+    # The last sequence number and message count change on every write or
+    # clear, so they identify this version of the history
+    last_seq, total = storage.get_chat_state(username)
+    etag = f"{last_seq}-{total}"
+    # Weak comparison, as If-None-Match calls for: a compressed copy of the
+    # history carries the same tag marked weak
+    if request.if_none_match.contains_weak(etag):
+        return "", 304, {"ETag": f'"{etag}"'}
+    
+    history = storage.get_chat_history(username, since=since, limit=limit)
+    # Only an empty page may skip ahead, past messages evicted or cleared
+    next_cursor = history[-1]["id"] if history else max(since, last_seq)
+    response = jsonify({
+        "history": history,
+        "count": len(history),
+        "total": total,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor < last_seq
+    })
+    response.set_etag(etag)
+    return response
 
 @app.route("/chat/<username>/save", methods=["POST"])
 def save_chat_message(username):
@@ -405,26 +1022,48 @@ def save_chat_message(username):
     sender = data.get("sender", "user")
     timestamp = data.get("timestamp", datetime.now().isoformat())
     
-    if username not in user_chat_histories:
-        user_chat_histories[username] = []
-    
     chat_entry = {
         "message": message,
         "sender": sender,
         "timestamp": timestamp
     }
     
-    user_chat_histories[username].append(chat_entry)
+    count = storage.add_chat_messages(username, [chat_entry], keep=CHAT_HISTORY_LIMIT)
+    
+    return jsonify({"status": "message saved", "count": count})
+
+@app.route("/chat/<username>/save/batch", methods=["POST"])
+def save_chat_messages(username):
+    """
+    Save several messages, in order, in one write. Each message is what
+    /save takes; results line up with the messages.
+    """
+    messages, error = batch_items("messages")
+    if error:
+        return error
+    
+    entries = []
+    results = []
+    for item in messages:
+        if not isinstance(item, dict) or not isinstance(item.get("message", ""), str):
+            results.append({"error": "Message must be an object with a text 'message'"})
+            continue
+        entries.append({
+            "message": item.get("message", ""),
+            "sender": item.get("sender", "user"),
+            "timestamp": item.get("timestamp", datetime.now().isoformat())
+        })
+        results.append({"status": "message saved"})
     
-    if len(user_chat_histories[username]) > 100:
-        user_chat_histories[username] = user_chat_histories[username][-100:]
+    count = storage.add_chat_messages(username, entries, keep=CHAT_HISTORY_LIMIT) if entries \
+        else storage.get_chat_state(username)[1]
     
-    return jsonify({"status": "message saved", "count": len(user_chat_histories[username])})
+    return jsonify({"status": "messages saved", "saved": len(entries), "count": count, "results": results})
 
 @app.route("/chat/<username>/clear", methods=["POST"])
 def clear_chat_history(username):
-    if username in user_chat_histories:
-        user_chat_histories[username] = []
+    if storage.has_user(username):
+        storage.clear_chat_history(username)
         return jsonify({"status": "chat history cleared"})
     return jsonify({"error": "User not found"}), 404
 
@@ -457,56 +1096,183 @@ def ask():
         if not question:
             return jsonify({"answer": "Please ask a question! I'm here to help you learn."}), 400
         
-        print(f"Question received from {username}: {question}")
-        
-        answer = get_ai_response(question)
-        print(f"Answer: {answer}")
+        if username:
+            log.bind(user=username)
+        # Pick up a reloaded knowledge base before the lookup, as it changes the cache keys
+        get_response_state()
+        answer = answer_cache.get_or_compute(question, get_ai_response)
+        logger.info("question answered", extra={"question": question, "answer": answer})
         
         if username:
-            if username not in user_chat_histories:
-                user_chat_histories[username] = []
-            
-            user_chat_histories[username].append({
-                "message": question,
-                "sender": "user",
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            user_chat_histories[username].append({
-                "message": answer,
-                "sender": "bot",
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            if len(user_chat_histories[username]) > 100:
-                user_chat_histories[username] = user_chat_histories[username][-100:]
+            save_exchange(username, question, answer)
         
         return jsonify({
             "answer": answer,
             "timestamp": datetime.now().isoformat()
         })
         
-    except Exception as e:
-        print("Error:", e)
+    except Overloaded as e:
+        return retry_later(503, MODEL_BUSY_RESPONSE, e.retry_after)
+    except Exception:
+        logger.exception("Answering question failed")
         return jsonify({
             "answer": "I apologize, but I encountered an error while processing your question. Please try again in a moment.",
             "error": True
         }), 500
 
+@app.route("/ask/batch", methods=["POST"])
+def ask_batch():
+    """
+    Answer a list of questions in one request. Results line up with the
+    questions, and one that could not be answered has an error instead of
+    an answer; with a username, every answered exchange is saved in one
+    write.
+    Counts against the rate limit as one /ask per question.
+    """
+    questions, error = batch_items("questions")
+    if error:
+        return error
+    username = request.get_json().get("username", "")
+    if username:
+        log.bind(user=username)
+    
+    results = [None] * len(questions)
+    to_compute = []
+    get_response_state()
+    for i, question in enumerate(questions):
+        if not isinstance(question, str) or not question.strip():
+            results[i] = {"error": "Question is required"}
+            continue
+        question = question.strip()
+        answer = answer_cache.get(question)
+        if answer is None:
+            to_compute.append((i, question))
+        else:
+            results[i] = {"question": question, "answer": answer}
+    
+    try:
+        computed = get_ai_responses([question for _, question in to_compute]) if to_compute else []
+    except Overloaded as e:
+        return retry_later(503, MODEL_BUSY_RESPONSE, e.retry_after)
+    
+    for (i, question), (answer, cacheable) in zip(to_compute, computed):
+        if answer is None:
+            results[i] = {"question": question, "error": AI_ERROR_RESPONSE}
+            continue
+        if cacheable:
+            answer_cache.set(question, answer)
+        results[i] = {"question": question, "answer": answer}
+    
+    answered = [result for result in results if "answer" in result]
+    logger.info("questions answered", extra={"count": len(answered)})
+    if username and answered:
+        save_exchanges(username, [(result["question"], result["answer"]) for result in answered])
+    
+    return jsonify({
+        "results": results,
+        "timestamp": datetime.now().isoformat()
+    })
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+@app.route("/ask/stream", methods=["POST"])
+def ask_stream():
+    """
+    Same as /ask, but the answer is sent as Server-Sent Events.
+    Local model output is streamed token by token; cached and knowledge-base
+    answers arrive in a single event. A final "done" event carries the full
+    answer, which is then saved to the user's chat history.
+    """
+    data = request.get_json()
+    question = data.get("question", "").strip()
+    username = data.get("username", "")
+    
+    if not question:
+        return jsonify({"answer": "Please ask a question! I'm here to help you learn."}), 400
+    if username:
+        log.bind(user=username)
+    
+    # Admission is decided before the 200 goes out; the slot is held until
+    # the answer has been streamed
+    get_response_state()
+    cached = answer_cache.get(question)
+    answer = cached or get_knowledge_base_response(question)
+    slot = None
+    if answer is None and USE_LOCAL_MODEL:
+        try:
+            slot = local_model.admit()
+        except Overloaded as e:
+            return retry_later(503, MODEL_BUSY_RESPONSE, e.retry_after)
+    
+    def generate():
+        nonlocal answer
+        try:
+            if answer is None and USE_LOCAL_MODEL:
+                parts = []
+                for token in local_model.stream_answer(question):
+                    parts.append(token)
+                    yield sse_event({"token": token})
+                answer = "".join(parts)
+                answer_cache.set(question, answer)
+            elif answer is None:
+                # Not cached, as it quotes the question (see get_ai_response)
+                answer = get_fallback_response(question)
+                yield sse_event({"token": answer})
+            else:
+                # A cache hit is not written back, so its TTL is not extended
+                if cached is None:
+                    answer_cache.set(question, answer)
+                yield sse_event({"token": answer})
+            
+            if username:
+                save_exchange(username, question, answer)
+            
+            yield sse_event({"answer": answer, "timestamp": datetime.now().isoformat()}, event="done")
+            
+        except Exception:
+            logger.exception("Streaming answer failed")
+            yield sse_event({"answer": AI_ERROR_RESPONSE, "error": True}, event="error")
+        finally:
+            if slot is not None:
+                slot.release()
+    
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    if slot is not None:
+        # In case the stream is closed before it starts
+        response.call_on_close(slot.release)
+    return response
+
 @app.route("/status", methods=["GET"])
 def status():
+    stats = storage.stats()
     return jsonify({
         "status": "operational",
         "model": "AI Tutoring Bot v4.0",
         "subjects_supported": ["Math", "Science", "Programming", "History", "Geography"],
-        "active_sessions": len(user_sessions),
-        "users_with_chat_history": len(user_chat_histories),
-        "total_reminders": sum(len(r) for r in user_reminders.values()),
-        "total_drawings": sum(len(d) for d in user_drawings.values()),
-        "total_files": sum(len(f) for f in user_uploaded_files.values()),
+        "active_sessions": stats["active_sessions"],
+        "archived_sessions": stats["archived_sessions"],
+        "users_with_chat_history": stats["users_with_chat_history"],
+        "total_reminders": stats["total_reminders"],
+        "total_drawings": stats["total_drawings"],
+        "total_files": stats["total_files"],
+        "reminder_scheduler": reminder_scheduler.stats(),
+        "answer_cache": answer_cache.stats(),
+        "rate_limits": {name: limiter.stats() for name, limiter in rate_limiters.items()} if RATE_LIMIT_ENABLED else None,
+        "knowledge_base": get_loader().stats(),
+        "local_model": local_model.model_status() if USE_LOCAL_MODEL else {"enabled": False},
         "timestamp": datetime.now().isoformat()
     })
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     print("\n" + "="*60)
     print("🚀 Enhanced AI Tutoring Bot Backend Starting...")
@@ -522,4 +1288,5 @@ if __name__ == "__main__":
     print("🎨 Drawing board available")
     print("📁 File upload system ready")
     print("="*60 + "\n")
+    reminder_scheduler.ensure_running()
     app.run(debug=True, port=5000)
\ No newline at end of file
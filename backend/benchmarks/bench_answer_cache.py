@@ -0,0 +1,80 @@
+"""
+Replay a question log through the answer cache and report hit rate and latency.
+
+The log is drawn from a Zipf-like distribution (a few questions are asked
+very often), and each miss costs --model-ms to simulate local generation.
+
+Run from the backend folder:
+    python benchmarks/bench_answer_cache.py --requests 2000 --model-ms 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.answer_cache import AnswerCache
+from utils.storage import Storage
+
+TOPICS = ["photosynthesis", "gravity", "mitosis", "algebra", "the water cycle", "python", "france",
+          "calculus", "newton's laws", "chemical bonds", "the french revolution", "fractions"]
+TEMPLATES = ["what is {}", "What is {}?", "explain {}", "Explain {} please", "tell me about {}"]
+
+def make_log(count, distinct, seed=3):
+    rng = random.Random(seed)
+    questions = [rng.choice(TEMPLATES).format(f"{rng.choice(TOPICS)} {i}" if i >= len(TOPICS) else TOPICS[i])
+                 for i in range(distinct)]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(questions, weights=weights, k=count)
+
+def replay(log, cache, model_ms):
+    def compute(question):
+        time.sleep(model_ms / 1000)
+        return f"answer to {question}", True
+
+    latencies = []
+    for question in log:
+        start = time.perf_counter()
+        if cache is None:
+            compute(question)
+        else:
+            cache.get_or_compute(question, compute)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+def report(name, latencies, cache=None):
+    mean = sum(latencies) / len(latencies)
+    line = (f"{name:<14} mean={mean * 1000:7.2f}ms p50={latencies[len(latencies) // 2] * 1000:7.2f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99)] * 1000:7.2f}ms")
+    if cache is not None:
+        line += f" hit_rate={cache.stats()['hit_rate']:.2%}"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=300)
+    parser.add_argument("--model-ms", type=float, default=20)
+    parser.add_argument("--cache-size", type=int, default=128)
+    args = parser.parse_args()
+
+    log = make_log(args.requests, args.distinct)
+    report("no cache", replay(log, None, args.model_ms))
+
+    cache = AnswerCache(max_size=args.cache_size)
+    report("lru", replay(log, cache, args.model_ms), cache)
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = Storage(os.path.join(directory, "bench.db"))
+        warm = AnswerCache(max_size=args.cache_size, shared=storage)
+        replay(log, warm, args.model_ms)
+        # A second worker starting cold still benefits from the shared table
+        cold = AnswerCache(max_size=args.cache_size, shared=storage)
+        report("shared (cold)", replay(log, cold, args.model_ms), cold)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Local model inference backends compared on the same prompts: load time,
+resident memory, time to the first streamed token and generated tokens
+per second.
+
+Each backend runs in a fresh process (LOCAL_MODEL_BACKEND is read at
+import, and RSS should not include another backend's weights), with
+LOCAL_MODEL_THREADS threads. Backends whose packages are not installed
+are reported and skipped:
+
+    transformers   pip install transformers torch
+    torch-int8     pip install transformers torch
+    onnx           pip install transformers torch optimum[onnxruntime]
+    stub           nothing (LOCAL_MODEL_STUB_* settings apply)
+
+Run from the backend folder:
+    python benchmarks/bench_backends.py --threads 2 --tokens 40
+    python benchmarks/bench_backends.py --backends transformers onnx --model distilgpt2
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from common import percentile, rss_mb
+
+PROMPTS = ["Why is the sky blue?", "How do magnets work?", "What causes rain?",
+           "Explain photosynthesis to a student.", "What is a prime number?", "Why do we sleep?"]
+
+def new_tokens(bot, prompt, reply):
+    tokenizer = getattr(bot, "tokenizer", None)
+    if tokenizer is None:
+        return len(reply.split()) - len(prompt.split())
+    return len(tokenizer(reply).input_ids) - len(tokenizer(prompt).input_ids)
+
+def child(args):
+    baseline = rss_mb()
+    import model
+    start = time.perf_counter()
+    try:
+        bot = model.get_bot()
+    except ImportError as e:
+        print(json.dumps({"missing": str(e)}))
+        return
+    load_seconds = time.perf_counter() - start
+    loaded = rss_mb()
+    model.warm_up()
+
+    # First token: streamed the way /ask/stream does it. The prompt is
+    # echoed first, so time the first text past it
+    first_token = []
+    for prompt in PROMPTS:
+        start = time.perf_counter()
+        stream = bot.stream(prompt, model.get_executor().submit, model.MAX_LENGTH, model.INFERENCE_TIMEOUT)
+        text = ""
+        for piece in stream:
+            text += piece
+            if len(text) > len(prompt):
+                break
+        first_token.append(time.perf_counter() - start)
+        for _ in stream:
+            pass
+
+    # Throughput: each prompt generated on its own, as /ask does
+    tokens = 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for prompt in PROMPTS:
+            reply = bot.generate([prompt], max_new_tokens=args.tokens)[0]
+            tokens += new_tokens(bot, prompt, reply)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "model_rss_mb": loaded - baseline,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "first_token_ms": percentile(first_token, 50) * 1000,
+        "tokens_per_second": tokens / elapsed,
+        "threads": model.THREADS
+    }))
+
+def run_child(args, backend):
+    env = dict(os.environ, LOCAL_MODEL_BACKEND=backend, LOCAL_MODEL_NAME=args.model,
+               LOCAL_MODEL_THREADS=str(args.threads), LOG_LEVEL="WARNING")
+    if backend == "stub":
+        env["LOCAL_MODEL_NAME"] = "stub"
+    command = [sys.executable, __file__, "--child", "--tokens", str(args.tokens), "--rounds", str(args.rounds)]
+    out = subprocess.run(command, env=env, stdout=subprocess.PIPE, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["transformers", "torch-int8", "onnx", "stub"])
+    parser.add_argument("--model", default="distilgpt2")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tokens", type=int, default=40, help="new tokens per generation")
+    parser.add_argument("--rounds", type=int, default=3, help="times through the prompts for tokens/sec")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print(f"{args.model}, {len(PROMPTS)} prompts, {args.tokens} new tokens each, {args.threads} threads:")
+    print(f"  {'backend':<14} {'load s':>7} {'model MB':>9} {'peak RSS MB':>12} {'first token ms':>15} {'tokens/s':>9}")
+    for backend in args.backends:
+        result = run_child(args, backend)
+        if "missing" in result:
+            print(f"  {backend:<14} not installed ({result['missing']})")
+            continue
+        print(f"  {backend:<14} {result['load_seconds']:>7.2f} {result['model_rss_mb']:>9.1f} "
+              f"{result['peak_rss_mb']:>12.1f} {result['first_token_ms']:>15.1f} {result['tokens_per_second']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
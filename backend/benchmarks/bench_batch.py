@@ -0,0 +1,103 @@
+"""
+Requests and time to replay a study session one call at a time, as the
+frontend does, versus through the batch endpoints.
+
+For each question the frontend sends /session/<user>/update, saves the
+question with /chat/<user>/save, asks /ask and saves the answer; each quiz
+result is one /session/<user>/quiz. The batched replay stores the same
+data with one /session/<user>/update/batch, one /ask/batch and one
+/chat/<user>/save/batch. Half the questions name a knowledge base topic
+and half go to the (stub) model, which answers a batch in one pass.
+
+Both run over HTTP against gunicorn (see loadtest.py), alternating, with
+rate limits off. The last column adds --rtt-ms per request, what the
+same replay would take over a network with that round-trip time.
+
+Run from the backend folder:
+    python benchmarks/bench_batch.py --questions 20 --sessions 10
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common import percentile
+from loadtest import KNOWN_TOPICS, HttpClient, start_gunicorn, stop_gunicorn
+
+def post(client, path, body):
+    status, data = client.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    assert status == 200, (path, status, data[:200])
+    return json.loads(data)
+
+def make_session(tag, questions, quizzes):
+    asked = []
+    for i in range(questions):
+        topic = KNOWN_TOPICS[i % len(KNOWN_TOPICS)]
+        question = f"what is {topic}" if i % 2 == 0 else f"why are zebras striped {tag}-{i}"
+        asked.append((topic, question))
+    return asked, [(KNOWN_TOPICS[i % len(KNOWN_TOPICS)], i % 5, 5) for i in range(quizzes)]
+
+def replay_one_by_one(client, user, asked, quizzes):
+    requests = 0
+    for topic, question in asked:
+        post(client, f"/session/{user}/update", {"topic": topic})
+        post(client, f"/chat/{user}/save", {"message": question, "sender": "user"})
+        answer = post(client, "/ask", {"question": question})["answer"]
+        post(client, f"/chat/{user}/save", {"message": answer, "sender": "bot"})
+        requests += 4
+    for topic, score, total in quizzes:
+        post(client, f"/session/{user}/quiz", {"topic": topic, "score": score, "total": total})
+        requests += 1
+    return requests
+
+def replay_batched(client, user, asked, quizzes):
+    updates = [{"type": "topic", "topic": topic} for topic, _ in asked]
+    updates += [{"type": "quiz", "topic": topic, "score": score, "total": total} for topic, score, total in quizzes]
+    post(client, f"/session/{user}/update/batch", {"updates": updates})
+    results = post(client, "/ask/batch", {"questions": [question for _, question in asked]})["results"]
+    messages = []
+    for (_, question), result in zip(asked, results):
+        messages += [{"message": question, "sender": "user"}, {"message": result["answer"], "sender": "bot"}]
+    post(client, f"/chat/{user}/save/batch", {"messages": messages})
+    return 3
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--quizzes", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--model-ms", type=float, default=25, help="stub model cost per forward pass")
+    parser.add_argument("--rtt-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    env = {"CHAT_DB_PATH": os.path.join(directory, "bench.db"), "BLOB_DIR": os.path.join(directory, "blobs"),
+           "USE_LOCAL_MODEL": "1", "LOCAL_MODEL_NAME": "stub", "LOCAL_MODEL_STUB_PASS_MS": str(args.model_ms),
+           "RATE_LIMIT_ENABLED": "0", "LOG_LEVEL": "ERROR"}
+    server, port = start_gunicorn(env, workers=1)
+    try:
+        client = HttpClient(port)
+        timings = {"one by one": [], "batched": []}
+        requests = {}
+        for number in range(args.sessions):
+            for name, replay in (("one by one", replay_one_by_one), ("batched", replay_batched)):
+                # Fresh model questions and users every time, so the answer
+                # cache only helps with the knowledge base ones
+                user = f"{name[0]}{number}"
+                asked, quizzes = make_session(user, args.questions, args.quizzes)
+                start = time.perf_counter()
+                requests[name] = replay(client, user, asked, quizzes)
+                timings[name].append(time.perf_counter() - start)
+    finally:
+        stop_gunicorn(server)
+
+    print(f"session of {args.questions} questions ({args.questions // 2} for the model, "
+          f"{args.model_ms:g} ms a pass) and {args.quizzes} quiz scores, median of {args.sessions}:")
+    print(f"  {'replay':<12} {'requests':>9} {'total ms':>9} {f'at {args.rtt_ms:g} ms RTT':>15}")
+    for name, samples in timings.items():
+        total_ms = percentile(samples, 50) * 1000
+        print(f"  {name:<12} {requests[name]:>9} {total_ms:>9.1f} {total_ms + requests[name] * args.rtt_ms:>15.1f}")
+
+if __name__ == "__main__":
+    main()
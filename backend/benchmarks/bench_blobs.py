@@ -0,0 +1,79 @@
+"""
+Memory used by N drawing uploads: base64 kept in a dict vs. the blob store.
+
+Run from the backend folder:
+    python benchmarks/bench_blobs.py --uploads 300 --size 200000
+"""
+import argparse
+import base64
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.blob_store import decode_data_url
+from utils.storage import Storage
+
+def rss_mb():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def make_payloads(count, size):
+    # Unique payloads so deduplication does not flatter the blob store
+    return ["data:image/png;base64," + base64.b64encode(os.urandom(size)).decode() for _ in range(count)]
+
+def in_memory_uploads(payloads):
+    user_drawings = {"amy": []}
+    for payload in payloads:
+        user_drawings["amy"].append({
+            "id": len(user_drawings["amy"]) + 1,
+            "title": "Untitled Drawing",
+            "subject": "",
+            "data": payload,
+            "created_at": datetime.now().isoformat()
+        })
+    return user_drawings
+
+def blob_store_uploads(payloads, directory):
+    storage = Storage(os.path.join(directory, "bench.db"))
+    for payload in payloads:
+        content, mime_type = decode_data_url(payload)
+        storage.add_drawing("amy", {
+            "title": "Untitled Drawing",
+            "subject": "",
+            "mime_type": mime_type,
+            "created_at": datetime.now().isoformat()
+        }, content)
+    return storage
+
+def measure(name, func):
+    gc.collect()
+    rss_before = rss_mb()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<12} retained={retained / 1e6:8.1f} MB  peak={peak / 1e6:8.1f} MB  "
+          f"rss_delta={rss_mb() - rss_before:8.1f} MB")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=300)
+    parser.add_argument("--size", type=int, default=200000, help="raw bytes per upload")
+    args = parser.parse_args()
+
+    print(f"{args.uploads} uploads of {args.size} bytes ({args.size * 4 // 3} bytes as base64)")
+    with tempfile.TemporaryDirectory() as directory:
+        kept = measure("blob store", lambda: blob_store_uploads(make_payloads(args.uploads, args.size), directory))
+        del kept
+        kept = measure("in-memory", lambda: in_memory_uploads(make_payloads(args.uploads, args.size)))
+        del kept
+
+if __name__ == "__main__":
+    main()
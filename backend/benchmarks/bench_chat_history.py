@@ -0,0 +1,70 @@
+"""
+Cost of appending to and reading chat history at different retention sizes.
+
+Compares the previous trim (find the cut-off row with ORDER BY ... OFFSET
+<keep>, which walks `keep` index entries on every append) with the
+sequence-number ring buffer in Storage, and a full history read with an
+incremental ?since= read of the last few messages.
+
+Run from the backend folder:
+    python benchmarks/bench_chat_history.py --keep 100 1000 10000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from common import percentile
+from utils.storage import Storage
+
+def legacy_append(conn, username, entry, keep):
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute("INSERT INTO legacy (username, message, sender, timestamp) VALUES (?, ?, ?, ?)",
+                 (username, entry["message"], entry["sender"], entry["timestamp"]))
+    conn.execute("DELETE FROM legacy WHERE username = ? AND id <= "
+                 "(SELECT id FROM legacy WHERE username = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                 (username, username, keep))
+    conn.execute("COMMIT")
+
+def time_calls(func, count):
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return percentile(times, 50) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keep", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--appends", type=int, default=500)
+    args = parser.parse_args()
+
+    entry = {"message": "what is gravity", "sender": "user", "timestamp": datetime.now().isoformat()}
+    print(f"{'keep':>6} {'offset trim us':>15} {'ring trim us':>13} {'full read us':>13} {'since read us':>14}")
+    for keep in args.keep:
+        with tempfile.TemporaryDirectory() as directory:
+            storage = Storage(os.path.join(directory, "bench.db"))
+            legacy = sqlite3.connect(os.path.join(directory, "legacy.db"), isolation_level=None)
+            legacy.execute("PRAGMA journal_mode=WAL")
+            legacy.execute("PRAGMA synchronous=NORMAL")
+            legacy.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT, "
+                           "message TEXT, sender TEXT, timestamp TEXT)")
+            legacy.execute("CREATE INDEX idx_legacy ON legacy (username, id)")
+
+            # Fill both to capacity first so every timed append also trims
+            for _ in range(keep):
+                legacy_append(legacy, "amy", entry, keep)
+            storage.add_chat_messages("amy", [entry] * keep, keep=keep)
+
+            offset_us = time_calls(lambda: legacy_append(legacy, "amy", entry, keep), args.appends)
+            ring_us = time_calls(lambda: storage.add_chat_messages("amy", [entry], keep=keep), args.appends)
+            full_us = time_calls(lambda: storage.get_chat_history("amy"), 50)
+            last_seq, _ = storage.get_chat_state("amy")
+            since_us = time_calls(lambda: storage.get_chat_history("amy", since=last_seq - 2), 50)
+            print(f"{keep:>6} {offset_us:>15.1f} {ring_us:>13.1f} {full_us:>13.1f} {since_us:>14.1f}")
+
+if __name__ == "__main__":
+    main()
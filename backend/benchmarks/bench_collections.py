@@ -0,0 +1,83 @@
+"""
+Per-user collection cost for a power user with many drawings.
+
+Compares the original in-memory lists (id = len + 1, linear get, list
+rebuild on delete) with UserCollection in SQLite: get, delete, a full
+listing and one page of --page items, at each --sizes drawing count.
+
+Run from the backend folder:
+    python benchmarks/bench_collections.py --sizes 1000 10000 50000
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from common import percentile, timed
+
+from utils.storage import Storage
+
+class LegacyDrawings:
+    """The list-per-user code app.py used before drawings moved to SQLite"""
+
+    def __init__(self):
+        self.user_drawings = {}
+
+    def add(self, username, drawing):
+        drawings = self.user_drawings.setdefault(username, [])
+        drawing["id"] = len(drawings) + 1
+        drawings.append(drawing)
+
+    def get(self, username, drawing_id):
+        return next((d for d in self.user_drawings.get(username, []) if d["id"] == drawing_id), None)
+
+    def delete(self, username, drawing_id):
+        self.user_drawings[username] = [d for d in self.user_drawings[username] if d["id"] != drawing_id]
+
+    def list(self, username):
+        return [{"id": d["id"], "title": d["title"], "subject": d["subject"], "created_at": d["created_at"]}
+                for d in self.user_drawings.get(username, [])]
+
+def report(name, latencies):
+    print(f"  {name:<22} p50={percentile(latencies, 50) * 1e6:10.1f}us p99={percentile(latencies, 99) * 1e6:10.1f}us")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    drawing = {"title": "Triangle", "subject": "math", "mime_type": "image/png", "created_at": "2024-01-01T00:00:00"}
+    content = b"\x89PNG\r\n\x1a\n" + b"\0" * 64
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = Storage(os.path.join(directory, "bench.db"), os.path.join(directory, "blobs"))
+        legacy = LegacyDrawings()
+        count = 0
+        for size in args.sizes:
+            for _ in range(size - count):
+                storage.add_drawing("power", drawing, content)
+                legacy.add("power", dict(drawing))
+            count = size
+            print(f"-- {size} drawings for one user")
+
+            ids = [item["id"] for item in storage.list_drawings("power")]
+            report("legacy get", timed(lambda: legacy.get("power", rng.randint(1, size)), args.rounds))
+            report("collection get", timed(lambda: storage.get_drawing("power", rng.choice(ids)), args.rounds))
+            report("legacy list", timed(lambda: legacy.list("power"), 20))
+            report("collection list", timed(lambda: storage.list_drawings("power"), 20))
+            report(f"collection page of {args.page}", timed(
+                lambda: storage.list_drawings("power", after=rng.choice(ids), limit=args.page), args.rounds))
+
+            # Delete then re-add, so the next size starts from the same count
+            victims = rng.sample(ids, 20)
+            report("legacy delete", timed(lambda: legacy.delete("power", rng.randint(1, size)), 20))
+            report("collection delete", timed(lambda: storage.delete_drawing("power", victims.pop()), 20))
+            for _ in range(20):
+                storage.add_drawing("power", drawing, content)
+                legacy.add("power", dict(drawing))
+
+if __name__ == "__main__":
+    main()
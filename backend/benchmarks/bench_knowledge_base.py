@@ -0,0 +1,127 @@
+"""
+Startup time and memory of a large knowledge base, and how long a running
+process takes to pick up a recompiled one.
+
+A synthetic source file with --entries entries is generated, then each way
+of loading it runs in a fresh process:
+    json        parse the source into a dict (how the knowledge base used to live in code)
+    source      KnowledgeBase.from_source: parse and compile in memory
+    compiled    KnowledgeBase.open: memory-map the compiled file
+Each also builds the topic matcher and answers one question, which
+decompresses a single subject.
+
+Run from the backend folder:
+    python benchmarks/bench_knowledge_base.py --entries 50000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import BACKEND_DIR, rss_mb
+
+from utils.knowledge import KnowledgeLoader, compile_file
+
+SUBJECTS = ["math", "science", "programming", "history", "geography", "biology", "chemistry", "literature"]
+
+def make_source(path, count, seed=5):
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(20000)]
+    entries = []
+    for i in range(count):
+        topic = f"{rng.choice(words)} {rng.choice(words)} {i}"
+        entries.append({"subject": rng.choice(SUBJECTS), "topic": topic,
+                        "answer": f"{topic.title()} is " + " ".join(rng.choices(words, k=rng.randint(20, 60))) + "."})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"entries": entries}, f)
+
+def run_scenario(scenario, source, compiled):
+    """Runs in a child process; prints one JSON line of measurements"""
+    from utils.knowledge import KnowledgeBase
+    from utils.matcher import KeywordMatcher
+
+    before = rss_mb()
+    start = time.perf_counter()
+    if scenario == "json":
+        with open(source, encoding="utf-8") as f:
+            entries = json.load(f)["entries"]
+        answers = {entry["topic"]: entry["answer"] for entry in entries}
+        topics = answers
+        lookup = answers.get
+    else:
+        knowledge = KnowledgeBase.open(compiled) if scenario == "compiled" else KnowledgeBase.from_source(source)
+        topics = knowledge.topics
+        lookup = knowledge.topic_answer
+    loaded = time.perf_counter()
+    loaded_rss = rss_mb()
+
+    matcher = KeywordMatcher()
+    for topic in topics:
+        matcher.add(topic, "topic", topic)
+    matcher.build()
+    built = time.perf_counter()
+
+    topic = next(iter(topics))
+    _, key = matcher.best_match(f"tell me about {topic}")
+    lookup(key)
+    answered = time.perf_counter()
+
+    print(json.dumps({
+        "load_seconds": loaded - start,
+        "matcher_seconds": built - loaded,
+        "first_answer_ms": (answered - built) * 1000,
+        "load_rss_mb": loaded_rss - before,
+        "matcher_rss_mb": rss_mb() - loaded_rss
+    }))
+
+def measure_reload(source, compiled):
+    loader = KnowledgeLoader(source, compiled, check_interval=0.01)
+    old = loader.current()
+    time.sleep(0.02)
+    start = time.perf_counter()
+    compile_file(source, compiled)
+    compiled_at = time.perf_counter()
+    while loader.current() is old:
+        time.sleep(0.001)
+    return compiled_at - start, time.perf_counter() - compiled_at
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--scenario")
+    parser.add_argument("--source")
+    parser.add_argument("--compiled")
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(args.scenario, args.source, args.compiled)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "knowledge_base.json")
+        compiled = os.path.join(directory, "knowledge_base.kb")
+        make_source(source, args.entries)
+        start = time.perf_counter()
+        compile_file(source, compiled)
+        print(f"{args.entries} entries: source={os.path.getsize(source) / 1e6:.1f}MB "
+              f"compiled={os.path.getsize(compiled) / 1e6:.1f}MB compile={time.perf_counter() - start:.2f}s")
+
+        for scenario in ["json", "source", "compiled"]:
+            output = subprocess.run(
+                [sys.executable, __file__, "--scenario", scenario, "--source", source, "--compiled", compiled],
+                cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            print(f"{scenario:<10} load={result['load_seconds']:6.3f}s (+{result['load_rss_mb']:5.1f}MB) "
+                  f"matcher={result['matcher_seconds']:5.2f}s (+{result['matcher_rss_mb']:5.1f}MB) "
+                  f"first_answer={result['first_answer_ms']:6.2f}ms")
+
+        recompile, pickup = measure_reload(source, compiled)
+        print(f"reload     recompile={recompile:.2f}s picked up {pickup * 1000:.0f}ms later")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+/ask throughput with request logging off, written synchronously from the
+request thread (as print() used to be), handed to the background writer,
+and handed to the writer with 10% sampling.
+
+Each setting runs in a fresh process (the LOG_* settings are read at
+import) with stderr going to a file, and reports requests per second over
+--requests calls from --threads threads, plus how much log it wrote.
+With --slow-sink the log goes to a pipe read at a limited rate, like a
+collector that has fallen behind; synchronous logging then stalls
+requests, while the background writer drops what it cannot queue.
+
+Run from the backend folder:
+    python benchmarks/bench_logging.py --requests 20000 --threads 4
+    python benchmarks/bench_logging.py --requests 5000 --slow-sink 256
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import load_app
+
+SETTINGS = [
+    ("off", {"LOG_LEVEL": "WARNING"}),
+    ("synchronous", {"LOG_ASYNC": "0"}),
+    ("async", {"LOG_ASYNC": "1"}),
+    ("async, 10% sampled", {"LOG_ASYNC": "1", "LOG_SAMPLE_RATE": "0.1"})
+]
+
+QUESTIONS = ["what is algebra", "explain photosynthesis", "tell me about python",
+             "what is gravity", "explain loops in programming", "what is a cell"]
+
+def child(count, threads):
+    app = load_app(tempfile.mkdtemp())
+    client = app.app.test_client()
+    for question in QUESTIONS:
+        client.post("/ask", json={"question": question, "username": "bench"})
+
+    def worker(n):
+        client = app.app.test_client()
+        for i in range(n):
+            client.post("/ask", json={"question": QUESTIONS[i % len(QUESTIONS)], "username": f"user{i % 50}"})
+
+    workers = [threading.Thread(target=worker, args=(count // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"rps": count // threads * threads / elapsed}))
+
+def run_child(args, env):
+    """Returns (child's result, bytes of log it wrote)"""
+    command = [sys.executable, __file__, "--child", "--requests", str(args.requests), "--threads", str(args.threads)]
+    env = dict(os.environ, **env)
+    if not args.slow_sink:
+        with tempfile.TemporaryFile() as log_file:
+            out = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=log_file, text=True, check=True).stdout
+            return json.loads(out.strip().splitlines()[-1]), log_file.seek(0, os.SEEK_END)
+
+    # A log collector that falls behind: stderr is a pipe drained at
+    # --slow-sink KB/s, so writes block once its buffer is full
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    received = 0
+    def drain():
+        nonlocal received
+        while True:
+            chunk = process.stderr.read1(4096)
+            if not chunk:
+                return
+            received += len(chunk)
+            time.sleep(len(chunk) / (args.slow_sink * 1024))
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    out = process.stdout.read()
+    result = json.loads(out.decode().strip().splitlines()[-1])
+    process.kill()
+    process.wait()
+    return result, received
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--slow-sink", type=float, metavar="KB_PER_S",
+                        help="send the log to a pipe read at this rate instead of a file")
+    parser.add_argument("--child", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.requests, args.threads)
+        return
+
+    sink = f"a pipe read at {args.slow_sink:g} KB/s" if args.slow_sink else "a file"
+    print(f"/ask, {args.requests} requests from {args.threads} threads, log to {sink}:")
+    for name, env in SETTINGS:
+        result, log_bytes = run_child(args, env)
+        print(f"  {name:<20} {result['rps']:8.0f} req/s   log {log_bytes / 1024 / 1024:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
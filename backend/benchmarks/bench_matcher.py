@@ -0,0 +1,97 @@
+"""
+Micro-benchmark: compiled keyword matcher vs. the old linear substring scans.
+
+Run from the backend folder:
+    python benchmarks/bench_matcher.py --topics 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.matcher import KeywordMatcher
+
+GREETINGS = ["hello", "hi", "hey", "greetings"]
+SUBJECTS = {
+    "math": ["math", "mathematics", "algebra", "geometry", "calculus"],
+    "science": ["science", "physics", "chemistry", "biology"],
+    "programming": ["programming", "coding", "python", "javascript", "java"],
+    "history": ["history", "historical", "past events"],
+    "geography": ["geography", "countries", "capitals"]
+}
+
+def make_topics(count, seed=7):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    topics = {}
+    while len(topics) < count:
+        words = ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(rng.randint(1, 2))]
+        topics[" ".join(words)] = "answer"
+    return topics
+
+def make_questions(topics, count, seed=11):
+    rng = random.Random(seed)
+    names = list(topics)
+    questions = []
+    for i in range(count):
+        if i % 3 == 0:
+            questions.append(f"can you explain {rng.choice(names)} to me please")
+        elif i % 3 == 1:
+            questions.append("i need some help with my geometry homework tonight")
+        else:
+            questions.append("what should i study for the exam next week")
+    return questions
+
+def legacy_lookup(question, topics):
+    question_lower = question.lower()
+    if any(greeting in question_lower for greeting in GREETINGS):
+        return ("greeting", None)
+    for topic in topics:
+        if topic in question_lower:
+            return ("topic", topic)
+    for subject, keywords in SUBJECTS.items():
+        if any(keyword in question_lower for keyword in keywords):
+            return ("subject", subject)
+    return None
+
+def build_matcher(topics):
+    matcher = KeywordMatcher()
+    for greeting in GREETINGS:
+        matcher.add(greeting, "greeting", None)
+    for topic in topics:
+        matcher.add(topic, "topic", topic)
+    for subject, keywords in SUBJECTS.items():
+        for keyword in keywords:
+            matcher.add(keyword, "subject", subject)
+    return matcher.build()
+
+def time_per_call(func, questions):
+    start = time.perf_counter()
+    for question in questions:
+        func(question)
+    return (time.perf_counter() - start) / len(questions)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--topics", type=int, nargs="+", default=[10, 1000, 10000, 50000])
+    parser.add_argument("--questions", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'topics':>8} {'build ms':>10} {'legacy us/q':>13} {'matcher us/q':>14} {'speedup':>9}")
+    for count in args.topics:
+        topics = make_topics(count)
+        questions = make_questions(topics, args.questions)
+
+        start = time.perf_counter()
+        matcher = build_matcher(topics)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        legacy = time_per_call(lambda q: legacy_lookup(q, topics), questions)
+        compiled = time_per_call(matcher.best_match, questions)
+        print(f"{count:>8} {build_ms:>10.1f} {legacy * 1e6:>13.1f} {compiled * 1e6:>14.1f} {legacy / compiled:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
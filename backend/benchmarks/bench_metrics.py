@@ -0,0 +1,139 @@
+"""
+Cost of the request instrumentation and of the /status totals.
+
+1. The per-request metric updates alone (timer, in-flight gauge,
+   latency histogram, request counter), single-threaded and from several
+   threads at once.
+   Then app.py's WSGI middleware and endpoint hook.
+2. A cheap endpoint through the Flask test client, alternating batches
+   with the instrumentation installed and removed.
+3. storage.stats() from the trigger-maintained table_counts against the
+   COUNT(*) queries it replaced, with --rows sessions and reminders stored.
+
+Run from the backend folder:
+    python benchmarks/bench_metrics.py --requests 20000 --rows 200000
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from common import load_app, percentile, timed
+
+from utils import metrics
+
+def instrumentation(registry):
+    requests = metrics.Counter("requests_total", "", ("method", "endpoint", "status"), registry=registry)
+    seconds = metrics.Histogram("request_seconds", "", ("method", "endpoint"), registry=registry)
+    in_flight = metrics.Gauge("in_flight", "", registry=registry)
+
+    def one_request():
+        # What the before/after/teardown hooks in app.py do for one request
+        start = time.perf_counter()
+        in_flight.inc()
+        seconds.labels("GET", "home").observe(time.perf_counter() - start)
+        requests.labels("GET", "home", "200").inc()
+        in_flight.dec()
+    return one_request
+
+def bench_instrumentation(count, threads):
+    one_request = instrumentation(metrics.Registry())
+    latencies = timed(one_request, count)
+    print(f"  1 thread   : {sum(latencies) / count * 1e6:6.2f} us/request "
+          f"(p99 {percentile(latencies, 99) * 1e6:.2f} us)")
+
+    def worker():
+        for _ in range(count // threads):
+            one_request()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(f"  {threads} threads  : {elapsed / (count // threads * threads) * 1e6:6.2f} us/request (wall, GIL-bound)")
+
+def bench_middleware(app, count):
+    """app.py's WSGIMetrics around a do-nothing WSGI app, plus its endpoint hook in a request context"""
+    def noop_app(environ, start_response):
+        start_response("200 OK", [])
+        return [b"ok"]
+    middleware = metrics.WSGIMetrics(noop_app, app.REQUESTS, app.REQUEST_SECONDS, app.IN_FLIGHT)
+    environ = {"REQUEST_METHOD": "GET", metrics.WSGIMetrics.ENDPOINT_KEY: "home"}
+    latencies = timed(lambda: middleware(environ, lambda status, headers, exc_info=None: None), count)
+    print(f"  middleware       : {sum(latencies) / count * 1e6:6.2f} us/request "
+          f"(p99 {percentile(latencies, 99) * 1e6:.2f} us)")
+    with app.app.test_request_context("/"):
+        latencies = timed(app.name_metrics_endpoint, count)
+    print(f"  endpoint hook    : {sum(latencies) / count * 1e6:6.2f} us/request "
+          f"(p99 {percentile(latencies, 99) * 1e6:.2f} us)")
+
+def bench_client(app, count, batch=500):
+    # Batches with and without instrumentation alternate, so drift in
+    # machine speed (larger than what is measured) hits both alike
+    flask_app = app.app
+    instrumented = flask_app.wsgi_app
+    before = flask_app.before_request_funcs[None]
+    client = flask_app.test_client()
+    for _ in range(200):
+        client.get("/")
+    results = {"off": [], "on": []}
+    for _ in range(max(1, count // batch)):
+        flask_app.wsgi_app = instrumented.wsgi_app
+        before.remove(app.name_metrics_endpoint)
+        results["off"] += timed(lambda: client.get("/"), batch)
+        flask_app.wsgi_app = instrumented
+        before.append(app.name_metrics_endpoint)
+        results["on"] += timed(lambda: client.get("/"), batch)
+    p50 = {state: percentile(latencies, 50) * 1e6 for state, latencies in results.items()}
+    for state, latencies in results.items():
+        print(f"  metrics {state:<3}      : p50 {p50[state]:7.1f} us, p99 {percentile(latencies, 99) * 1e6:7.1f} us")
+    print(f"  difference       : {p50['on'] - p50['off']:7.1f} us/request at p50")
+
+def bench_status(app, rows):
+    from utils.storage import TABLE_COUNT_QUERIES
+    storage = app.storage
+    with storage.transaction() as conn:
+        for i in range(rows):
+            storage.save_session({
+                "username": f"user{i}", "login_time": "2026-01-01T00:00:00", "questions_asked": 1,
+                "last_activity": "2026-01-01T00:00:00", "theme_preference": "light",
+                "topics_covered": [], "quiz_scores": {}
+            }, conn)
+            storage.reminders.add(conn, f"user{i}", {
+                "title": "Revise", "subject": "math", "datetime": "2026-01-01T00:00",
+                "notes": "", "created_at": "2026-01-01T00:00:00", "due_at": float(i)
+            })
+
+    conn = storage.connection()
+    def count_rows():
+        return {name: conn.execute(query).fetchone()[0] for name, query in TABLE_COUNT_QUERIES.items()}
+    assert count_rows() == {
+        "chat_users": 0, "sessions": rows, "session_archive": 0, "reminders": rows, "drawings": 0, "files": 0
+    }
+    for name, fn in (("COUNT(*) queries", count_rows), ("table_counts", storage.stats)):
+        latencies = timed(fn, 20)
+        print(f"  {name:<17}: {percentile(latencies, 50) * 1e3:8.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    # utils.storage reads SESSION_IDLE_SECONDS at import time, so nothing
+    # may import it before this; 0 keeps the bulk insert from archiving
+    app = load_app(tempfile.mkdtemp(), METRICS_ENABLED=1, SESSION_IDLE_SECONDS=0)
+
+    print("Instrumentation:")
+    bench_instrumentation(args.requests, args.threads)
+    bench_middleware(app, args.requests)
+    print(f"GET / through the test client, {args.requests} requests per setting:")
+    bench_client(app, args.requests)
+    print(f"/status totals with {args.rows} sessions and reminders:")
+    bench_status(app, args.rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Read latency while slow /ask generations are running.
+
+Serves the app on a local port twice: single-threaded (like gunicorn's sync
+worker) and threaded (like the default gthread preset in gunicorn.conf.py).
+Slow clients keep /ask busy with model work while a reader measures
+/reminders/<username> and /chat/<username>/history latency.
+
+Run from the backend folder:
+    python benchmarks/bench_mixed_load.py --slow-clients 4 --model-ms 300
+"""
+import argparse
+import http.client
+import json
+import logging
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from common import load_app, percentile
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+def run(app, threaded, slow_clients, duration):
+    server = make_server("127.0.0.1", 0, app.app, threaded=threaded)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop_at = time.perf_counter() + duration
+    counter = iter(range(10 ** 9))
+
+    def slow_client():
+        while time.perf_counter() < stop_at:
+            # A new question each time so the answer cache cannot help
+            request(port, "POST", "/ask", {"question": f"why are zebras striped {next(counter)}"})
+
+    slow_threads = [threading.Thread(target=slow_client) for _ in range(slow_clients)]
+    for thread in slow_threads:
+        thread.start()
+
+    latencies = []
+    while time.perf_counter() < stop_at:
+        for path in ("/reminders/bench", "/chat/bench/history"):
+            start = time.perf_counter()
+            request(port, "GET", path)
+            latencies.append(time.perf_counter() - start)
+        time.sleep(0.01)
+
+    for thread in slow_threads:
+        thread.join()
+    server.shutdown()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slow-clients", type=int, default=4)
+    parser.add_argument("--model-ms", type=float, default=300)
+    parser.add_argument("--duration", type=float, default=4.0)
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as directory:
+        app = load_app(directory, USE_LOCAL_MODEL=1, LOCAL_MODEL_WARMUP=0,
+                       LOCAL_MODEL_NAME="stub", LOCAL_MODEL_STUB_PASS_MS=args.model_ms,
+                       LOCAL_MODEL_MAX_IN_FLIGHT=max(1, args.slow_clients),
+                       LOG_LEVEL="WARNING")
+
+        results = []
+        for name, threaded, slow_clients in (("threaded, idle", True, 0),
+                                             ("sync", False, args.slow_clients),
+                                             ("threaded", True, args.slow_clients)):
+            latencies = run(app, threaded, slow_clients, args.duration)
+            results.append((name, slow_clients, latencies))
+
+    print(f"{'server':<16} {'slow /ask':>9} {'reads':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, slow_clients, latencies in results:
+        print(f"{name:<16} {slow_clients:>9} {len(latencies):>6} "
+              f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+/ask latency for well-behaved users while one client floods the endpoint.
+
+A few users each ask a new question every --interval seconds, which stays
+inside the per-user limit, while --abusers connections send /ask back to
+back as one username (or, with --rotate, a new username every time, which
+the per-user limit cannot see). Every question is new, so each one that
+gets through reaches the (stub) model. Each setting runs against its own
+gunicorn (see loadtest.py) over HTTP:
+
+    unprotected           no rate limit, no cap on queued generations
+    rate limit            per-user token buckets (RATE_LIMIT_ASK)
+    rate limit + cap      plus LOCAL_MODEL_MAX_IN_FLIGHT admission control
+
+With --max-p99-ms the script exits non-zero if the well-behaved users' p99
+in the last setting is above it.
+
+Run from the backend folder:
+    python benchmarks/bench_rate_limit.py --duration 10
+    python benchmarks/bench_rate_limit.py --rotate --max-p99-ms 250
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from common import percentile
+from loadtest import HttpClient, start_gunicorn, stop_gunicorn
+
+SETTINGS = [
+    ("unprotected", {"RATE_LIMIT_ENABLED": "0", "LOCAL_MODEL_MAX_IN_FLIGHT": "100000"}),
+    ("rate limit", {"RATE_LIMIT_ENABLED": "1", "LOCAL_MODEL_MAX_IN_FLIGHT": "100000"}),
+    ("rate limit + cap", {"RATE_LIMIT_ENABLED": "1"})
+]
+
+def ask(client, question, username):
+    body = json.dumps({"question": question, "username": username})
+    return client.request("POST", "/ask", body, {"Content-Type": "application/json"})[0]
+
+def run(port, args):
+    stop_at = time.perf_counter() + args.duration
+    counter = iter(range(10 ** 9))
+    latencies, statuses, flood = [], Counter(), Counter()
+    lock = threading.Lock()
+
+    def student(number):
+        client = HttpClient(port)
+        # Spread the users out rather than having them all ask at once
+        time.sleep(args.interval * number / args.users)
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            status = ask(client, f"why are zebras striped {next(counter)}", f"student{number}")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+            time.sleep(max(0.0, args.interval - elapsed))
+
+    def abuser():
+        client = HttpClient(port)
+        while time.perf_counter() < stop_at:
+            n = next(counter)
+            # Retry-After is ignored; the next request goes out at once
+            status = ask(client, f"why are zebras striped {n}", f"flood{n}" if args.rotate else "flood")
+            with lock:
+                flood[status] += 1
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(args.users)]
+    threads += [threading.Thread(target=abuser) for _ in range(args.abusers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, flood
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between a user's questions")
+    parser.add_argument("--abusers", type=int, default=8, help="connections flooding /ask")
+    parser.add_argument("--rotate", action="store_true", help="flood under a new username each request")
+    parser.add_argument("--model-ms", type=float, default=25, help="stub model cost per generation")
+    parser.add_argument("--limit", default="20/10", help="RATE_LIMIT_ASK for the limited settings")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--max-p99-ms", type=float)
+    args = parser.parse_args()
+
+    flood_as = "a new username each request" if args.rotate else "one username"
+    print(f"{args.users} users asking every {args.interval:g}s, {args.abusers} connections flooding as "
+          f"{flood_as}, model {args.model_ms:g} ms, limit {args.limit}:")
+    print(f"  {'setting':<18} {'p50 ms':>8} {'p99 ms':>9} {'answered':>9}   flood responses")
+    for name, setting in SETTINGS:
+        directory = tempfile.mkdtemp()
+        env = dict(setting, CHAT_DB_PATH=os.path.join(directory, "bench.db"),
+                   BLOB_DIR=os.path.join(directory, "blobs"), USE_LOCAL_MODEL="1", LOCAL_MODEL_NAME="stub",
+                   LOCAL_MODEL_STUB_PASS_MS=str(args.model_ms), RATE_LIMIT_ASK=args.limit, LOG_LEVEL="ERROR")
+        server, port = start_gunicorn(env, workers=1)
+        try:
+            latencies, statuses, flood = run(port, args)
+        finally:
+            stop_gunicorn(server)
+        p99 = percentile(latencies, 99) * 1000
+        answered = statuses[200] / len(latencies)
+        responses = ", ".join(f"{count} x {status}" for status, count in sorted(flood.items()))
+        print(f"  {name:<18} {percentile(latencies, 50) * 1000:>8.1f} {p99:>9.1f} {answered:>8.0%}   {responses}")
+
+    if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+        sys.exit(f"p99 {p99:.1f} ms is above {args.max_p99_ms:g} ms")
+
+if __name__ == "__main__":
+    main()
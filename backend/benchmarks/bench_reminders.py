@@ -0,0 +1,94 @@
+"""
+Reminder storage and scheduling cost as the table grows to --total
+reminders spread over --users users.
+
+At each size it reports:
+    insert      one add_reminder() call (its own transaction)
+    next_due    MIN(notify_at) through its index, and as a full scan
+    is_due      the scheduler's in-memory check
+    list        GET /reminders/<user> query
+    dispatch    claiming due reminders in batches, notifying a no-op notifier
+                and deleting them
+
+Run from the backend folder:
+    python benchmarks/bench_reminders.py --total 1000000 --users 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from common import percentile, timed
+
+from utils.reminders import ReminderScheduler
+from utils.storage import Storage
+
+DAY = 24 * 3600
+
+def make_rows(count, users, start, rng):
+    for _ in range(count):
+        due_at = start + rng.uniform(60, 30 * DAY)
+        yield (f"user{rng.randrange(users)}", "Revise", "math", "", due_at, "", "", due_at)
+
+def seed(storage, count, users, start, rng, chunk=50000):
+    while count > 0:
+        n = min(chunk, count)
+        with storage.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO reminders (username, title, subject, datetime, due_at, notes, created_at, notify_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                make_rows(n, users, start, rng)
+            )
+        count -= n
+
+def report(name, latencies, unit=1e6, suffix="us"):
+    print(f"  {name:<18} p50={percentile(latencies, 50) * unit:9.2f}{suffix} "
+          f"p99={percentile(latencies, 99) * unit:9.2f}{suffix}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    now = time.time()
+    sizes = [size for size in (10000, 100000, 1000000, 10000000) if size < args.total] + [args.total]
+
+    with tempfile.TemporaryDirectory() as directory:
+        storage = Storage(os.path.join(directory, "bench.db"), os.path.join(directory, "blobs"))
+        scheduler = ReminderScheduler(storage, lambda reminder: None)
+        reminder = {"title": "Revise", "subject": "math", "datetime": "", "notes": "", "created_at": ""}
+        conn = storage.connection()
+
+        seeded = 0
+        for size in sizes:
+            start = time.perf_counter()
+            seed(storage, size - seeded, args.users, now, rng)
+            seeded = size
+            print(f"-- {size} reminders over {args.users} users (seeded in {time.perf_counter() - start:.1f}s)")
+
+            report("insert", timed(lambda: storage.add_reminder(
+                f"user{rng.randrange(args.users)}", reminder, now + rng.uniform(60, 30 * DAY)), args.rounds))
+            report("next_due (index)", timed(storage.next_reminder_due, args.rounds))
+            report("next_due (scan)", timed(
+                lambda: conn.execute("SELECT MIN(notify_at) FROM reminders NOT INDEXED").fetchone(), 5),
+                unit=1e3, suffix="ms")
+            scheduler.run_pending(now)
+            report("is_due", timed(lambda: scheduler.is_due(now), args.rounds), unit=1e9, suffix="ns")
+            report("list", timed(lambda: storage.get_active_reminders(
+                f"user{rng.randrange(args.users)}", now), args.rounds))
+
+        # Everything due in the first hour, delivered the way the scheduler does it
+        horizon = now + 3600
+        due = conn.execute("SELECT COUNT(*) FROM reminders WHERE due_at <= ?", (horizon,)).fetchone()[0]
+        start = time.perf_counter()
+        delivered = scheduler.run_pending(horizon)
+        elapsed = time.perf_counter() - start
+        print(f"-- dispatch: {delivered}/{due} due reminders in {elapsed:.2f}s "
+              f"({delivered / elapsed:,.0f}/s), {conn.execute('SELECT COUNT(*) FROM reminders').fetchone()[0]} left")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Serialization CPU and bytes on the wire for the larger JSON responses.
+
+Serialization compares Flask's standard JSON provider with the orjson one
+in utils/responses.py on a full chat history, a page of the drawings list
+and, for reference, a drawing sent the old way as base64 inside JSON.
+Bytes on the wire are measured through the app for a full history and a
+drawing, uncompressed, gzipped and (when brotli is installed) brotli'd,
+and for a revalidation with If-None-Match.
+
+Run from the backend folder:
+    python benchmarks/bench_responses.py --messages 100 --rounds 2000
+"""
+import argparse
+import base64
+import random
+import struct
+import tempfile
+import zlib
+from datetime import datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+from common import load_app, percentile, timed
+from utils import responses
+
+SENTENCES = ["Photosynthesis is how plants turn light into chemical energy.",
+             "A variable is a named place to keep a value while the program runs.",
+             "Gravity pulls objects with mass toward each other.",
+             "Try breaking the problem into smaller steps and solve each one.",
+             "The mitochondria releases energy from food for the cell to use.",
+             "Fractions with the same denominator are added by adding the numerators."]
+
+def canvas_png(width=800, height=600, strokes=40):
+    """A mostly blank canvas with some strokes, like a saved drawing"""
+    rng = random.Random(1)
+    rows = [bytearray(b"\xff" * width * 3) for _ in range(height)]
+    for _ in range(strokes):
+        x, y = rng.randrange(width), rng.randrange(height)
+        for _ in range(200):
+            x = min(width - 1, max(0, x + rng.choice((-1, 0, 1))))
+            y = min(height - 1, max(0, y + rng.choice((-1, 0, 1))))
+            rows[y][x * 3:x * 3 + 3] = b"\x20\x40\xa0"
+    raw = b"".join(b"\x00" + bytes(row) for row in rows)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 9)) + chunk(b"IEND", b""))
+
+def history_payload(messages):
+    history = [{"id": i + 1, "message": SENTENCES[i % len(SENTENCES)], "sender": ("user", "bot")[i % 2],
+                "timestamp": datetime(2024, 5, 1, 9, i % 60).isoformat()} for i in range(messages)]
+    return {"history": history, "count": messages, "total": messages, "next_cursor": messages, "has_more": False}
+
+def drawings_payload(count):
+    return {"drawings": [{"id": i, "title": f"Drawing {i}", "subject": "science", "mime_type": "image/png",
+                          "size": 48213, "created_at": datetime(2024, 5, 1).isoformat(),
+                          "url": f"/drawings/amy/{i}/image"} for i in range(count)],
+            "next_cursor": count, "has_more": True}
+
+def serialization(app, payloads, rounds):
+    standard = DefaultJSONProvider(app.app)
+    fast = app.app.json
+    print(f"serialization, median of {rounds} ({type(fast).__name__}, orjson "
+          f"{'installed' if responses.orjson else 'not installed'}):")
+    print(f"  {'payload':<24} {'bytes':>9} {'stdlib us':>10} {'fast us':>9}")
+    for name, payload in payloads:
+        size = len(standard.dumps(payload))
+        stdlib_us = percentile(timed(lambda: standard.dumps(payload), rounds), 50) * 1e6
+        fast_us = percentile(timed(lambda: fast.dumps(payload), rounds), 50) * 1e6
+        print(f"  {name:<24} {size:>9} {stdlib_us:>10.1f} {fast_us:>9.1f}")
+
+def wire_bytes(response):
+    """Body plus status line and headers, as sent"""
+    head = f"HTTP/1.1 {response.status}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in response.headers.items())
+    return len(head) + 2 + len(response.get_data())
+
+def on_the_wire(app, messages):
+    client = app.app.test_client()
+    for i in range(messages):
+        client.post("/chat/amy/save", json={"message": SENTENCES[i % len(SENTENCES)],
+                                            "sender": ("user", "bot")[i % 2]})
+    png = canvas_png()
+    saved = client.post("/drawings/amy/save", json={
+        "drawing": "data:image/png;base64," + base64.b64encode(png).decode(), "title": "Plant cell"}).get_json()
+    drawing_id = saved["drawing"]["id"]
+
+    urls = [("full history", "/chat/amy/history"),
+            ("drawing metadata", f"/drawings/amy/{drawing_id}"),
+            ("drawing image", f"/drawings/amy/{drawing_id}/image")]
+    encodings = ["identity", "gzip"] + (["br"] if responses.brotli else [])
+    print(f"\nbytes on the wire (canvas PNG is {len(png)} bytes):")
+    print(f"  {'resource':<18}" + "".join(f"{e:>10}" for e in encodings) + f"{'304':>10}")
+    for name, url in urls:
+        sizes = []
+        for encoding in encodings:
+            response = client.get(url, headers={"Accept-Encoding": encoding})
+            sizes.append(wire_bytes(response))
+            etag = response.headers.get("ETag")
+        revalidated = client.get(url, headers={"Accept-Encoding": encodings[-1], "If-None-Match": etag})
+        assert revalidated.status_code == 304, (url, revalidated.status_code)
+        print(f"  {name:<18}" + "".join(f"{s:>10}" for s in sizes) + f"{wire_bytes(revalidated):>10}")
+
+def compression_cpu(app, messages, rounds):
+    body = app.app.json.dumps(history_payload(messages)).encode()
+    encodings = ["gzip"] + (["br"] if responses.brotli else [])
+    print(f"\ncompressing a {len(body)} byte history, median of {rounds}:")
+    for encoding in encodings:
+        us = percentile(timed(lambda: responses.compress(body, encoding), rounds), 50) * 1e6
+        print(f"  {encoding:<6} {us:8.1f} us   {len(responses.compress(body, encoding)):>7} bytes")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = load_app(tempfile.mkdtemp(), CHAT_HISTORY_LIMIT=args.messages, LOG_LEVEL="WARNING")
+
+    legacy_drawing = {"drawing": {"id": 1, "title": "Plant cell", "subject": "science",
+                                  "data": "data:image/png;base64," + base64.b64encode(canvas_png()).decode(),
+                                  "created_at": datetime(2024, 5, 1).isoformat()}}
+    serialization(app, [(f"history, {args.messages} messages", history_payload(args.messages)),
+                        ("drawings list, 50", drawings_payload(50)),
+                        ("base64 drawing (old)", legacy_drawing)], args.rounds)
+    compression_cpu(app, args.messages, args.rounds // 4)
+    on_the_wire(app, args.messages)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Measure retrieval quality and query latency as the knowledge base grows.
+
+A small set of labelled questions is run against the real entries plus
+--sizes synthetic distractor entries, comparing the knowledge base compiled
+in memory with the same one written to disk and memory-mapped.
+
+Run from the backend folder:
+    python benchmarks/bench_retrieval.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from common import BACKEND_DIR, percentile
+
+from utils.knowledge import KnowledgeBase, compile_entries, entry_text, load_source
+
+# (question, topic or keywords of the entry that should answer it)
+LABELLED = [
+    ("how do plants make food from sunlight", "photosynthesis"),
+    ("how do cells divide into two", "cell division"),
+    ("what are newton's laws", "newton's laws of motion"),
+    ("what are the states of matter", "states of matter"),
+    ("how do i add fractions", "fractions"),
+    ("what does the pythagorean theorem say about triangles", "pythagorean theorem"),
+    ("how does a for loop work in programming", "loops in programming"),
+    ("when did world war ii end", "world war ii"),
+    ("what is the capital of france", "france"),
+    ("how does water evaporate and condense into clouds", "water cycle"),
+    ("what phases does mitosis have", "mitosis"),
+    ("why do objects fall toward the ground", "gravity"),
+]
+
+def entry_key(entry):
+    return entry["topic"] or " ".join(entry["keywords"])
+
+def make_distractors(count, vocabulary, seed=11):
+    rng = random.Random(seed)
+    subjects = ["math", "science", "programming", "history", "geography"]
+    return [{"subject": rng.choice(subjects), "topic": f"distractor {i}", "keywords": None,
+             "answer": " ".join(rng.choices(vocabulary, k=rng.randint(20, 60)))}
+            for i in range(count)]
+
+def evaluate(knowledge, queries=LABELLED, rounds=20):
+    hits_at_1 = hits_at_5 = 0
+    for question, key in queries:
+        keys = [entry_key(entry) for _, _, entry in knowledge.search(question, k=5)]
+        hits_at_1 += bool(keys) and keys[0] == key
+        hits_at_5 += key in keys
+
+    latencies = []
+    for _ in range(rounds):
+        for question, _ in queries:
+            start = time.perf_counter()
+            knowledge.search(question, k=5)
+            latencies.append(time.perf_counter() - start)
+    return hits_at_1 / len(queries), hits_at_5 / len(queries), latencies
+
+def report(name, recall_1, recall_5, latencies):
+    print(f"{name:<26} recall@1={recall_1:5.0%} recall@5={recall_5:5.0%} "
+          f"p50={percentile(latencies, 50) * 1000:7.3f}ms p99={percentile(latencies, 99) * 1000:7.3f}ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    entries = load_source(os.path.join(os.path.dirname(BACKEND_DIR), "data", "knowledge_base.json"))
+    # Distractors reuse the real vocabulary, so they compete for the same terms
+    vocabulary = " ".join(entry_text(entry) for entry in entries).lower().split()
+    vocabulary += [f"word{i}" for i in range(5000)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in [0] + args.sizes:
+            corpus = entries + make_distractors(size, vocabulary)
+            start = time.perf_counter()
+            compiled = compile_entries(corpus)
+            build_seconds = time.perf_counter() - start
+
+            path = os.path.join(directory, f"kb-{size}.kb")
+            with open(path, "wb") as f:
+                f.write(compiled)
+            start = time.perf_counter()
+            mapped = KnowledgeBase.open(path)
+            load_seconds = time.perf_counter() - start
+
+            print(f"-- {len(corpus)} entries: compile={build_seconds:.2f}s open={load_seconds:.3f}s "
+                  f"file={len(compiled) / 1e6:.1f}MB")
+            report("in memory", *evaluate(KnowledgeBase(compiled)))
+            report("memory-mapped", *evaluate(mapped))
+
+if __name__ == "__main__":
+    main()
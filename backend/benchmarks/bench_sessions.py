@@ -0,0 +1,146 @@
+"""
+Memory per session and the cost of archiving idle sessions, for --users
+simulated users.
+
+In memory: the original UserSession (instance dict, non-interned topic
+strings as they come out of JSON) against the slotted, interned one.
+In SQLite, with process RSS: payload bytes per session in sessions vs session_archive, the
+sweep that moves idle sessions, and load_session latency from each table.
+
+Run from the backend folder:
+    python benchmarks/bench_sessions.py --users 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import load_app, percentile, rss_mb, timed
+
+TOPICS = [f"topic {i}" for i in range(200)]
+
+class DictSession:
+    """UserSession as it was before __slots__ and interning"""
+
+    def __init__(self, username):
+        self.username = username
+        self.login_time = datetime.now()
+        self.questions_asked = 0
+        self.topics_covered = set()
+        self.quiz_scores = {}
+        self.last_activity = datetime.now()
+        self.theme_preference = "light"
+
+def make_records(count, seed=9):
+    rng = random.Random(seed)
+    now = datetime.now()
+    for i in range(count):
+        topics = rng.sample(TOPICS, 3)
+        last_activity = now - timedelta(days=rng.uniform(0, 60))
+        yield {
+            "username": f"user{i}",
+            "login_time": last_activity.isoformat(),
+            "questions_asked": rng.randint(1, 50),
+            "topics_covered": topics,
+            "quiz_scores": {topics[0]: {"score": rng.randint(0, 5), "total": 5}},
+            "last_activity": last_activity.isoformat(),
+            "theme_preference": "light"
+        }
+
+def build(cls, records):
+    sessions = []
+    for record in records:
+        # Round-trip through JSON so topic strings are fresh copies, as when loaded
+        record = json.loads(json.dumps(record))
+        if cls is DictSession:
+            session = DictSession(record["username"])
+            session.topics_covered = set(record["topics_covered"])
+            session.quiz_scores = record["quiz_scores"]
+            session.questions_asked = record["questions_asked"]
+        else:
+            session = cls.from_record(record)
+        sessions.append(session)
+    return sessions
+
+def measure_objects(name, cls, count):
+    gc.collect()
+    tracemalloc.start()
+    sessions = build(cls, make_records(count))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {name:<22} {size / count:7.0f} bytes/session")
+    del sessions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--in-memory", type=int, default=200000,
+                        help="sessions built as objects (tracemalloc makes this slow)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The benchmark sweeps explicitly, not during the bulk save
+        app = load_app(directory, SESSION_IDLE_SECONDS=0)
+        storage = app.storage
+        print(f"-- process rss {rss_mb():.0f}MB after importing the app")
+
+        print(f"-- {args.users} sessions in SQLite")
+        start = time.perf_counter()
+        batch = []
+        for record in make_records(args.users):
+            batch.append(record)
+            if len(batch) == 50000:
+                with storage.transaction() as conn:
+                    for item in batch:
+                        storage.save_session(item, conn)
+                batch = []
+        if batch:
+            with storage.transaction() as conn:
+                for item in batch:
+                    storage.save_session(item, conn)
+        print(f"  saved in {time.perf_counter() - start:.1f}s, process rss {rss_mb():.0f}MB")
+
+        conn = storage.connection()
+        hot_bytes = conn.execute(
+            "SELECT AVG(LENGTH(username) + LENGTH(login_time) + 8 + LENGTH(last_activity) "
+            "+ LENGTH(theme_preference) + LENGTH(topics_covered) + LENGTH(quiz_scores)) FROM sessions"
+        ).fetchone()[0]
+
+        # Everyone idle for more than 30 days is archived
+        cutoff = (datetime.now() - timedelta(days=30)).isoformat()
+        start = time.perf_counter()
+        archived = 0
+        while True:
+            moved = storage.archive_idle_sessions(cutoff, limit=5000)
+            archived += moved
+            if moved == 0:
+                break
+        elapsed = time.perf_counter() - start
+        archive_bytes = conn.execute(
+            "SELECT AVG(LENGTH(username) + LENGTH(last_activity) + LENGTH(data)) FROM session_archive"
+        ).fetchone()[0]
+        print(f"  archived {archived} idle sessions in {elapsed:.1f}s ({archived / elapsed:,.0f}/s)")
+        print(f"  payload {hot_bytes:.0f} bytes/session in sessions, {archive_bytes:.0f} archived")
+
+        stats = storage.stats()
+        rng = random.Random(1)
+        hot = [row[0] for row in conn.execute("SELECT username FROM sessions LIMIT 10000")]
+        cold = [row[0] for row in conn.execute("SELECT username FROM session_archive LIMIT 10000")]
+        for name, users in (("hot", hot), ("archived", cold)):
+            latencies = timed(lambda: storage.load_session(rng.choice(users)), 2000)
+            print(f"  load_session {name:<9} p50={percentile(latencies, 50) * 1e6:6.1f}us "
+                  f"p99={percentile(latencies, 99) * 1e6:6.1f}us")
+        print(f"  active={stats['active_sessions']} archived={stats['archived_sessions']} "
+              f"process rss {rss_mb():.0f}MB")
+
+        # Measured last: the objects' freed memory would otherwise inflate the RSS above
+        print(f"-- {args.in_memory} session objects")
+        measure_objects("dict, not interned", DictSession, args.in_memory)
+        measure_objects("slots, interned", app.UserSession, args.in_memory)
+
+if __name__ == "__main__":
+    main()
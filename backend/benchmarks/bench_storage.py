@@ -0,0 +1,85 @@
+"""
+Concurrent read/write benchmark for the SQLite storage layer.
+
+Starts several worker processes (like gunicorn workers) that share one
+database file and mix chat writes with history reads.
+
+Run from the backend folder:
+    python benchmarks/bench_storage.py --workers 4 --ops 2000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.storage import Storage
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def worker(path, worker_id, ops, write_ratio, users, results):
+    storage = Storage(path)
+    rng = random.Random(worker_id)
+    read_times = []
+    write_times = []
+
+    for _ in range(ops):
+        username = f"user{rng.randrange(users)}"
+        start = time.perf_counter()
+        if rng.random() < write_ratio:
+            now = datetime.now().isoformat()
+            storage.add_chat_messages(username, [
+                {"message": "what is gravity", "sender": "user", "timestamp": now},
+                {"message": "Gravity is a force...", "sender": "bot", "timestamp": now}
+            ])
+            write_times.append(time.perf_counter() - start)
+        else:
+            storage.get_chat_history(username)
+            read_times.append(time.perf_counter() - start)
+
+    results.put((read_times, write_times))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=2000, help="operations per worker")
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        Storage(path)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(path, i, args.ops, args.write_ratio, args.users, results))
+            for i in range(args.workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+    reads = [t for r, _ in collected for t in r]
+    writes = [t for _, w in collected for t in w]
+    total = len(reads) + len(writes)
+
+    print(f"workers={args.workers} ops={total} elapsed={elapsed:.2f}s throughput={total / elapsed:.0f} ops/s")
+    for name, times in (("read", reads), ("write", writes)):
+        if times:
+            print(f"  {name:<5} n={len(times):<6} p50={percentile(times, 50) * 1000:.2f}ms "
+                  f"p99={percentile(times, 99) * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Time-to-first-byte of /ask vs. /ask/stream for questions the local model answers.
+
+By default a simulated model emits --tokens tokens, one every --token-ms,
+so the numbers are reproducible without transformers installed. Pass
+--backend model to use the real distilgpt2 model from model.py.
+
+Run from the backend folder:
+    python benchmarks/bench_stream_ttfb.py --requests 10
+"""
+import argparse
+import tempfile
+import time
+
+from common import load_app
+from utils.ratelimit import ConcurrencyLimiter
+
+class SimulatedModel:
+    def __init__(self, tokens, token_ms):
+        self.tokens = tokens
+        self.token_ms = token_ms
+        self.admission = ConcurrencyLimiter(1)
+
+    def admit(self):
+        return self.admission.acquire()
+
+    def stream_answer(self, prompt):
+        for i in range(self.tokens):
+            time.sleep(self.token_ms / 1000)
+            yield f" token{i}"
+
+    def get_answer(self, prompt):
+        return "".join(self.stream_answer(prompt))
+
+def first_byte(client, path, question):
+    """Return (seconds to first body chunk, seconds to full body)"""
+    start = time.perf_counter()
+    response = client.post(path, json={"question": question}, buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    ttfb = time.perf_counter() - start
+    for _ in chunks:
+        pass
+    response.close()
+    return ttfb, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["simulated", "model"], default="simulated")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-ms", type=float, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = load_app(directory)
+
+        app.USE_LOCAL_MODEL = True
+        if args.backend == "model":
+            import model
+            model.preload()
+            app.local_model = model
+        else:
+            app.local_model = SimulatedModel(args.tokens, args.token_ms)
+
+        client = app.app.test_client()
+        for path in ("/ask", "/ask/stream"):
+            results = []
+            for i in range(args.requests):
+                # Unique questions so the answer cache never short-circuits
+                app.answer_cache.clear()
+                results.append(first_byte(client, path, f"why do zebras have stripes {i}"))
+            ttfb = sorted(r[0] for r in results)
+            total = sorted(r[1] for r in results)
+            print(f"{path:<12} ttfb p50={ttfb[len(ttfb) // 2] * 1000:8.1f}ms  "
+                  f"full answer p50={total[len(total) // 2] * 1000:8.1f}ms")
+
+if __name__ == "__main__":
+    main()
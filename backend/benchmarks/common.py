@@ -0,0 +1,47 @@
+"""Shared helpers for the benchmark scripts."""
+import os
+import resource
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+def load_app(directory, **env):
+    """
+    Import app.py with its database and blobs inside `directory`.
+    Extra keyword arguments are set as environment variables first.
+    """
+    os.environ["CHAT_DB_PATH"] = os.path.join(directory, "bench.db")
+    os.environ["BLOB_DIR"] = os.path.join(directory, "blobs")
+    # Benchmarks send far more requests per user than the rate limits allow
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    import app
+    return app
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def timed(fn, rounds):
+    """Latency of each of `rounds` calls to fn, in seconds"""
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def rss_mb():
+    """Current resident set size (Linux), falling back to the peak"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
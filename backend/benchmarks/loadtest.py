@@ -0,0 +1,527 @@
+"""
+Load test for the whole backend, with the local model replaced by the
+deterministic stub (LOCAL_MODEL_NAME=stub) so runs are reproducible
+offline.
+
+Concurrent virtual users send a weighted mix of requests, either through
+the Flask test client in this process or over HTTP to a local gunicorn
+started with gunicorn.conf.py. Reports requests/sec, p50/p95/p99 latency
+per operation and overall, and peak RSS, and writes them to a JSON file
+so runs can be compared.
+
+Run from the backend folder:
+    python benchmarks/loadtest.py                                 # in-process, default mix
+    python benchmarks/loadtest.py --target gunicorn --workers 2
+    python benchmarks/loadtest.py --mix all --duration 30 --concurrency 16
+    python benchmarks/loadtest.py --compare results/before.json results/after.json
+
+Mixes: "default" (mostly questions and chat), "uploads" (large drawings
+and files) and "all" (every endpoint equally often).
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from common import BACKEND_DIR, percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+KNOWN_TOPICS = ["algebra", "geometry", "calculus", "physics", "chemistry", "biology", "python", "javascript"]
+SUBJECTS = ["math", "science", "programming", "history", "geography"]
+
+
+class User:
+    """A virtual user and the ids of what it has created, so reads and deletes have targets"""
+
+    def __init__(self, name, rng, payloads):
+        self.name = name
+        self.rng = rng
+        self.payloads = payloads
+        self.reminders = []
+        self.drawings = []
+        self.files = []
+
+    def question(self):
+        # Known topics are answered from the knowledge base (and then the
+        # answer cache); the rest reach the model
+        if self.rng.random() < 0.5:
+            return f"what is {self.rng.choice(KNOWN_TOPICS)}"
+        return f"why does {self.name} wonder about thing {self.rng.randrange(1000)}"
+
+
+def json_request(method, path, data):
+    return method, path, json.dumps(data).encode("utf-8"), {"Content-Type": "application/json"}
+
+def multipart_request(path, fields, file_name, content, boundary="loadtestboundary7MA4YWxk"):
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b"\r\n"
+    )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return "POST", path, b"".join(parts), {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+def reminder_time(user):
+    # Far enough ahead that the scheduler does not deliver (and delete) them mid-run
+    return (datetime.now() + timedelta(days=user.rng.randint(1, 30))).isoformat(timespec="minutes")
+
+# Each operation returns the request to time as (method, path, body, headers)
+# and, optionally, a callback for the response body. Setup that is not
+# part of the operation (creating something to read or delete) goes
+# through `client` first and is not timed.
+
+def op_home(client, user):
+    return ("GET", "/", None, {}), None
+
+def op_status(client, user):
+    return ("GET", "/status", None, {}), None
+
+def op_metrics(client, user):
+    return ("GET", "/metrics", None, {}), None
+
+def op_ask(client, user):
+    return json_request("POST", "/ask", {"question": user.question(), "username": user.name}), None
+
+def op_ask_stream(client, user):
+    return json_request("POST", "/ask/stream", {"question": user.question(), "username": user.name}), None
+
+def op_session_create(client, user):
+    return json_request("POST", "/session/create", {"username": user.name}), None
+
+def op_session_get(client, user):
+    return ("GET", f"/session/{user.name}", None, {}), None
+
+def op_session_update(client, user):
+    return json_request("POST", f"/session/{user.name}/update", {"topic": user.rng.choice(KNOWN_TOPICS)}), None
+
+def op_session_quiz(client, user):
+    return json_request("POST", f"/session/{user.name}/quiz", {
+        "topic": user.rng.choice(KNOWN_TOPICS), "score": user.rng.randint(0, 10), "total": 10
+    }), None
+
+def op_session_theme(client, user):
+    return json_request("POST", f"/session/{user.name}/theme", {"theme": user.rng.choice(["light", "dark"])}), None
+
+def op_chat_save(client, user):
+    return json_request("POST", f"/chat/{user.name}/save", {
+        "message": f"note {user.rng.randrange(10 ** 6)} " * 8, "sender": user.rng.choice(["user", "bot"])
+    }), None
+
+def op_chat_history(client, user):
+    return ("GET", f"/chat/{user.name}/history", None, {}), None
+
+def op_chat_clear(client, user):
+    return ("POST", f"/chat/{user.name}/clear", None, {}), None
+
+def op_reminder_add(client, user):
+    def remember(body):
+        user.reminders.append(json.loads(body)["reminder"]["id"])
+    return json_request("POST", f"/reminders/{user.name}/add", {
+        "title": "Revise", "subject": user.rng.choice(SUBJECTS), "datetime": reminder_time(user), "notes": "chapter 3"
+    }), remember
+
+def op_reminder_list(client, user):
+    return ("GET", f"/reminders/{user.name}", None, {}), None
+
+def op_reminder_delete(client, user):
+    if not user.reminders:
+        untimed(client, user, op_reminder_add)
+    return ("DELETE", f"/reminders/{user.name}/delete/{user.reminders.pop()}", None, {}), None
+
+def op_drawing_save(client, user):
+    def remember(body):
+        user.drawings.append(json.loads(body)["drawing"]["id"])
+    return json_request("POST", f"/drawings/{user.name}/save", {
+        "drawing": user.payloads["drawing"], "title": "Diagram", "subject": user.rng.choice(SUBJECTS)
+    }), remember
+
+def op_drawing_list(client, user):
+    return ("GET", f"/drawings/{user.name}", None, {}), None
+
+def op_drawing_get(client, user):
+    if not user.drawings:
+        untimed(client, user, op_drawing_save)
+    return ("GET", f"/drawings/{user.name}/{user.rng.choice(user.drawings)}", None, {}), None
+
+def op_drawing_image(client, user):
+    if not user.drawings:
+        untimed(client, user, op_drawing_save)
+    return ("GET", f"/drawings/{user.name}/{user.rng.choice(user.drawings)}/image", None, {}), None
+
+def op_drawing_delete(client, user):
+    if not user.drawings:
+        untimed(client, user, op_drawing_save)
+    return ("DELETE", f"/drawings/{user.name}/{user.drawings.pop()}", None, {}), None
+
+def op_file_upload(client, user):
+    def remember(body):
+        user.files.append(json.loads(body)["fileId"])
+    return multipart_request(f"/files/{user.name}/upload", {"question": "summarise this"},
+                             "notes.bin", user.payloads["file"]), remember
+
+def op_file_list(client, user):
+    return ("GET", f"/files/{user.name}", None, {}), None
+
+def op_file_download(client, user):
+    if not user.files:
+        untimed(client, user, op_file_upload)
+    return ("GET", f"/files/{user.name}/{user.rng.choice(user.files)}/download", None, {}), None
+
+OPERATIONS = {name[3:]: fn for name, fn in globals().items() if name.startswith("op_")}
+
+MIXES = {
+    "default": {
+        "ask": 30, "ask_stream": 5, "chat_save": 20, "chat_history": 10, "session_get": 5,
+        "session_update": 5, "reminder_list": 5, "reminder_add": 2, "drawing_save": 3,
+        "file_upload": 3, "file_list": 2, "drawing_list": 2, "status": 3, "home": 5
+    },
+    "uploads": {"drawing_save": 35, "file_upload": 35, "drawing_image": 15, "file_download": 15},
+    "all": {name: 1 for name in OPERATIONS}
+}
+
+def untimed(client, user, operation):
+    (method, path, body, headers), on_response = operation(client, user)
+    status, response = client.request(method, path, body, headers)
+    if on_response is not None and status == 200:
+        on_response(response)
+
+
+class InProcessClient:
+    """Flask test client; one per virtual user thread"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def request(self, method, path, body, headers):
+        response = self.client.open(path, method=method, data=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 connection to the server; reconnects after errors"""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body, headers):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+        try:
+            self.conn.request(method, path, body, headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def app_environment(directory, args):
+    return {
+        "CHAT_DB_PATH": os.path.join(directory, "loadtest.db"),
+        "BLOB_DIR": os.path.join(directory, "blobs"),
+        "USE_LOCAL_MODEL": "1",
+        "LOCAL_MODEL_NAME": "stub",
+        "LOCAL_MODEL_STUB_PASS_MS": str(args.model_ms),
+        "LOCAL_MODEL_WARMUP": "1",
+        "LOG_LEVEL": args.log_level,
+        # Measure capacity, not the limits: a few virtual users send every
+        # request, and each of them may be waiting on the model at once
+        "RATE_LIMIT_ENABLED": "0",
+        "LOCAL_MODEL_MAX_IN_FLIGHT": str(args.concurrency)
+    }
+
+def make_payloads(args):
+    rng = random.Random(args.seed)
+    # Random bytes behind a PNG signature; drawings must sniff as an image
+    drawing = b"\x89PNG\r\n\x1a\n" + rng.randbytes(args.drawing_kb * 1024 - 8)
+    return {
+        "drawing": "data:image/png;base64," + base64.b64encode(drawing).decode("ascii"),
+        "file": rng.randbytes(args.file_kb * 1024)
+    }
+
+def run_users(make_client, args):
+    """Drive the mix from args.concurrency threads; returns (per-operation samples, elapsed seconds)"""
+    names = list(MIXES[args.mix])
+    weights = [MIXES[args.mix][name] for name in names]
+    payloads = make_payloads(args)
+    samples = {name: {"latencies": [], "statuses": Counter(), "exceptions": 0} for name in names}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.concurrency + 1)
+    measure_from = [0.0]
+    stop_at = [0.0]
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        client = make_client()
+        users = [User(f"load{index}x{k}", rng, payloads) for k in range(args.users_per_thread)]
+        for user in users:
+            untimed(client, user, op_session_create)
+        local = {name: {"latencies": [], "statuses": Counter(), "exceptions": 0} for name in names}
+        start_barrier.wait()
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at[0]:
+                break
+            name = rng.choices(names, weights)[0]
+            user = rng.choice(users)
+            started = now
+            try:
+                (method, path, body, headers), on_response = OPERATIONS[name](client, user)
+                started = time.perf_counter()
+                status, response = client.request(method, path, body, headers)
+                elapsed = time.perf_counter() - started
+                if on_response is not None and status == 200:
+                    on_response(response)
+            except Exception:
+                if started >= measure_from[0]:
+                    local[name]["exceptions"] += 1
+                continue
+            # Requests started during warm-up are not counted
+            if started >= measure_from[0]:
+                local[name]["latencies"].append(elapsed)
+                local[name]["statuses"][status] += 1
+        with lock:
+            for name, sample in local.items():
+                samples[name]["latencies"] += sample["latencies"]
+                samples[name]["statuses"].update(sample["statuses"])
+                samples[name]["exceptions"] += sample["exceptions"]
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    now = time.perf_counter()
+    measure_from[0] = now + args.warmup
+    stop_at[0] = measure_from[0] + args.duration
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    return samples, args.duration
+
+def summarize(samples, elapsed):
+    def stats(latencies, statuses, exceptions):
+        return {
+            "requests": len(latencies),
+            "errors": sum(count for status, count in statuses.items() if status >= 500) + exceptions,
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+            "statuses": {str(status): count for status, count in sorted(statuses.items())}
+        }
+
+    operations = {name: stats(**sample) for name, sample in samples.items()}
+    everything = [latency for sample in samples.values() for latency in sample["latencies"]]
+    statuses = sum((sample["statuses"] for sample in samples.values()), Counter())
+    exceptions = sum(sample["exceptions"] for sample in samples.values())
+    return stats(everything, statuses, exceptions), operations
+
+def run_in_process(args):
+    directory = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ.update(app_environment(directory, args))
+    import app
+    app.reminder_scheduler.ensure_running()
+    samples, elapsed = run_users(lambda: InProcessClient(app.app), args)
+    # The harness shares this process, so this includes its own memory
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return samples, elapsed, {"peak_rss_mb": round(peak_rss_mb, 1), "rss_scope": "harness and app process"}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def process_tree(root_pid):
+    """root_pid and its children (gunicorn's workers), from /proc"""
+    pids = [root_pid]
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The parent pid follows the parenthesised command name
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == root_pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return pids
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def start_gunicorn(env, workers):
+    """Start gunicorn.conf.py with `env` added to the environment; returns (process, port) once it answers"""
+    port = free_port()
+    env = dict(os.environ, **env, PORT=str(port), WEB_CONCURRENCY=str(workers))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while True:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup; run it by hand to see why")
+        try:
+            if HttpClient(port).request("GET", "/", None, {})[0] == 200:
+                return server, port
+        except OSError:
+            pass
+        if time.time() > deadline:
+            stop_gunicorn(server)
+            raise RuntimeError("gunicorn did not answer within 60 seconds")
+        time.sleep(0.2)
+
+def stop_gunicorn(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+def run_gunicorn(args):
+    directory = tempfile.mkdtemp(prefix="loadtest-")
+    server, port = start_gunicorn(app_environment(directory, args), args.workers)
+    try:
+        # Sum of the master's and workers' RSS, sampled while the load runs;
+        # pages shared copy-on-write are counted once per process
+        peak = [0]
+        done = threading.Event()
+        def sample_rss():
+            while not done.wait(0.25):
+                peak[0] = max(peak[0], sum(rss_kb(pid) for pid in process_tree(server.pid)))
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+        samples, elapsed = run_users(lambda: HttpClient(port), args)
+        done.set()
+        sampler.join()
+        return samples, elapsed, {"peak_rss_mb": round(peak[0] / 1024, 1), "rss_scope": "sum over gunicorn processes"}
+    finally:
+        stop_gunicorn(server)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(result):
+    meta, summary = result["meta"], result["summary"]
+    print(f"{meta['target']} / {meta['mix']} mix, {meta['concurrency']} users, {meta['duration']} s, "
+          f"commit {meta['git_commit']}")
+    print(f"{'operation':<16} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    rows = sorted(result["operations"].items()) + [("TOTAL", summary)]
+    for name, stats in rows:
+        if not stats["requests"] and name != "TOTAL":
+            continue
+        print(f"{name:<16} {stats['requests']:>9} {stats['rps']:>9.1f} {stats['p50_ms'] or 0:>9.2f} "
+              f"{stats['p95_ms'] or 0:>9.2f} {stats['p99_ms'] or 0:>9.2f} {stats['errors']:>7}")
+    print(f"peak RSS: {summary['peak_rss_mb']} MB ({summary['rss_scope']})")
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    for key in ("target", "mix", "concurrency", "duration", "model_ms"):
+        if before["meta"].get(key) != after["meta"].get(key):
+            print(f"note: {key} differs ({before['meta'].get(key)} vs {after['meta'].get(key)})")
+
+    def change(old, new):
+        if not old or new is None:
+            return "     -"
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    print(f"{'operation':<16} {'req/s':>19} {'p50 ms':>21} {'p99 ms':>21}")
+    rows = [(name, before["operations"][name], after["operations"][name])
+            for name in sorted(set(before["operations"]) & set(after["operations"]))]
+    rows.append(("TOTAL", before["summary"], after["summary"]))
+    for name, old, new in rows:
+        cells = []
+        for key, width in (("rps", 9), ("p50_ms", 9), ("p99_ms", 9)):
+            cells.append(f"{new[key] or 0:>{width}.2f} {change(old[key], new[key])}")
+        print(f"{name:<16} " + "  ".join(cells))
+    print(f"peak RSS MB: {before['summary']['peak_rss_mb']} -> {after['summary']['peak_rss_mb']}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target", choices=["inprocess", "gunicorn"], default="inprocess")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--concurrency", type=int, default=8, help="virtual user threads")
+    parser.add_argument("--users-per-thread", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds run before measuring")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--model-ms", type=float, default=20.0, help="stub model cost per generation")
+    parser.add_argument("--drawing-kb", type=int, default=256)
+    parser.add_argument("--file-kb", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL for the app")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<target>-<mix>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    run = run_gunicorn if args.target == "gunicorn" else run_in_process
+    samples, elapsed, memory = run(args)
+    summary, operations = summarize(samples, elapsed)
+    result = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "target": args.target,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "users_per_thread": args.users_per_thread,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "workers": args.workers if args.target == "gunicorn" else None,
+            "model_ms": args.model_ms,
+            "drawing_kb": args.drawing_kb,
+            "file_kb": args.file_kb,
+            "seed": args.seed
+        },
+        "summary": {**summary, **memory},
+        "operations": operations
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{args.target}-{args.mix}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print_report(result)
+    print(f"saved {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Load test: local generation with and without micro-batching.
+
+Runs 1, 8 and 32 concurrent clients for a fixed time and reports
+requests/sec with p50/p99 latency.
+
+    python benchmarks/loadtest_batching.py                 # simulated model
+    python benchmarks/loadtest_batching.py --backend model # real distilgpt2
+
+The simulated model charges a fixed cost per forward pass plus a smaller
+cost per prompt, which is roughly how a batched CPU forward pass behaves.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.batcher import MicroBatcher
+
+PROMPTS = ["Why is the sky blue?", "How do magnets work?", "What causes rain?", "Why do we sleep?"]
+
+def simulated_model(pass_ms, per_prompt_ms):
+    # One CPU: forward passes run one at a time
+    cpu = threading.Lock()
+
+    def run_batch(prompts):
+        with cpu:
+            time.sleep((pass_ms + per_prompt_ms * len(prompts)) / 1000)
+        return [prompt + " ..." for prompt in prompts]
+    return run_batch
+
+def real_model():
+    import model
+    model.preload()
+    cpu = threading.Lock()
+
+    def run_batch(prompts):
+        with cpu:
+            return model.generate_batch(prompts)
+    return run_batch
+
+def run_clients(call, clients, duration):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        prompt = PROMPTS[index % len(PROMPTS)]
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            call(prompt)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["simulated", "model"], default="simulated")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--pass-ms", type=float, default=40, help="simulated cost per forward pass")
+    parser.add_argument("--per-prompt-ms", type=float, default=5, help="simulated cost per prompt in a pass")
+    args = parser.parse_args()
+
+    run_batch = real_model() if args.backend == "model" else simulated_model(args.pass_ms, args.per_prompt_ms)
+    batcher = MicroBatcher(run_batch, args.max_batch, args.max_wait_ms)
+
+    print(f"{'clients':>7} {'mode':>10} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for clients in args.clients:
+        for mode, call in (("unbatched", lambda p: run_batch([p])[0]), ("batched", batcher.submit)):
+            rps, p50, p99 = run_clients(call, clients, args.duration)
+            print(f"{clients:>7} {mode:>10} {rps:>8.1f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+# Serving preset:
+#   "threaded" (default) - gthread workers; while one thread waits on the
+#                          model's inference pool, the others keep serving
+#                          cheap endpoints like /reminders and chat history
+#   "sync"               - gunicorn's default, one request per worker
+SERVER_PRESET = os.getenv("SERVER_PRESET", "threaded")
+if SERVER_PRESET == "threaded":
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+# Import app.py (and load the local model) once in the master before
+# forking, so every worker shares the same weights copy-on-write
+preload_app = os.getenv("LOCAL_MODEL_PRELOAD", "0") == "1"
+
+def when_ready(server):
+    if preload_app:
+        # Move preloaded objects out of the collector's reach so the
+        # workers' GC passes do not dirty the shared pages
+        gc.freeze()
+
+def post_worker_init(worker):
+    # Threads do not survive fork, so each worker starts its own reminder
+    # scheduler once the app is loaded; the database hands every due
+    # reminder to just one of them
+    import app
+    app.reminder_scheduler.ensure_running()
+    if preload_app:
+        # Only the weights were loaded before fork; the warm-up generation
+        # (and its first-token time) belongs to each worker
+        app.warm_up_model()
@@ -1,9 +1,224 @@
 # model.py
-from utils.subject_data import get_predefined_answer
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Optionally import a model (if using offline AI)
-from transformers import pipeline
-bot = pipeline("text-generation", model="distilgpt2")
+from utils.knowledge import get_predefined_answer
+from utils.batcher import MicroBatcher
+from utils.ratelimit import ConcurrencyLimiter
+from utils.inference import default_threads, load_backend
+from utils import metrics
+
+MODEL_NAME = os.getenv("LOCAL_MODEL_NAME", "distilgpt2")
+# How the model runs (utils/inference.py): "transformers" (float32
+# PyTorch), "torch-int8" (dynamically quantized) or "onnx" (ONNX Runtime).
+# LOCAL_MODEL_NAME=stub, or LOCAL_MODEL_BACKEND=stub, swaps in a
+# deterministic stand-in (utils/stub_model.py) that needs no transformers;
+# it costs STUB_PASS_MS per call plus STUB_TOKEN_MS per word, for
+# reproducible offline benchmarks
+STUB_MODEL_NAME = "stub"
+BACKEND = STUB_MODEL_NAME if MODEL_NAME == STUB_MODEL_NAME else os.getenv("LOCAL_MODEL_BACKEND", "transformers")
+STUB_PASS_MS = float(os.getenv("LOCAL_MODEL_STUB_PASS_MS", 0))
+STUB_TOKEN_MS = float(os.getenv("LOCAL_MODEL_STUB_TOKEN_MS", 0))
+MAX_LENGTH = 60
+
+# Concurrent prompts are grouped into one padded forward pass
+BATCHING_ENABLED = os.getenv("LOCAL_MODEL_BATCHING", "0") == "1"
+MAX_BATCH_SIZE = int(os.getenv("LOCAL_MODEL_MAX_BATCH", 8))
+MAX_WAIT_MS = float(os.getenv("LOCAL_MODEL_MAX_WAIT_MS", 5))
+
+# Generation runs on a small dedicated pool; request threads only wait on
+# it, so cheap endpoints keep being served while the model is busy
+INFERENCE_WORKERS = int(os.getenv("LOCAL_MODEL_WORKERS", 1))
+INFERENCE_TIMEOUT = float(os.getenv("LOCAL_MODEL_TIMEOUT", 60))
+
+# Threads each generation may use. By default the cores are shared out
+# between gunicorn workers and their inference pools rather than every
+# generation trying to use all of them at once
+THREADS = int(os.getenv("LOCAL_MODEL_THREADS", 0)) or default_threads(
+    int(os.getenv("WEB_CONCURRENCY", 1)), INFERENCE_WORKERS
+)
+
+# Generations running or waiting for the pool, per process. Past this a
+# request gets Overloaded (503 with Retry-After) instead of joining a queue
+# it may wait on until it times out; LOCAL_MODEL_ADMIT_WAIT lets it wait
+# that many seconds for a slot first
+MAX_IN_FLIGHT = int(os.getenv(
+    "LOCAL_MODEL_MAX_IN_FLIGHT", 4 * INFERENCE_WORKERS * (MAX_BATCH_SIZE if BATCHING_ENABLED else 1)
+))
+ADMIT_WAIT = float(os.getenv("LOCAL_MODEL_ADMIT_WAIT", 0))
+admission = ConcurrencyLimiter(MAX_IN_FLIGHT, ADMIT_WAIT)
+
+INFERENCE_SECONDS = metrics.Histogram(
+    "model_inference_seconds", "Time spent waiting for the local model", ("mode",)
+)
+BATCH_SIZE = metrics.Histogram(
+    "model_batch_size", "Prompts per batched forward pass", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+metrics.REGISTRY.register_callback(
+    "model_generations_in_flight", "gauge", "Generations running or waiting for the pool",
+    lambda: admission.in_flight
+)
+metrics.REGISTRY.register_callback(
+    "model_generations_rejected_total", "counter", "Generations turned away because MAX_IN_FLIGHT were in flight",
+    lambda: admission.rejected
+)
+
+# The backend is loaded on first use (or by preload()), not at import time
+_bot = None
+_bot_pid = None
+_bot_lock = threading.Lock()
+
+startup_timings = {
+    "import_seconds": None,
+    "load_seconds": None,
+    "first_token_seconds": None
+}
+
+def get_bot():
+    """Return the shared inference backend, loading it once per process"""
+    global _bot, _bot_pid
+    if _bot is None or _bot_pid != os.getpid():
+        with _bot_lock:
+            if _bot is None:
+                _bot = load_backend(BACKEND, MODEL_NAME, THREADS, pass_ms=STUB_PASS_MS, token_ms=STUB_TOKEN_MS)
+                for key in ("import_seconds", "load_seconds"):
+                    startup_timings[key] = getattr(_bot, key, None)
+            elif _bot_pid != os.getpid():
+                # Loaded in the gunicorn master before fork (preload_app)
+                _bot = _bot.after_fork()
+            _bot_pid = os.getpid()
+    return _bot
+
+def generate_batch(prompts):
+    """Generate replies for several prompts in one padded batch"""
+    BATCH_SIZE.observe(len(prompts))
+    return get_bot().generate(prompts, max_length=MAX_LENGTH)
+
+_batcher = None
+_batcher_pid = None
+_executor = None
+_executor_pid = None
+
+def get_batcher():
+    """The batcher's thread does not survive fork, so each process starts its own"""
+    global _batcher, _batcher_pid
+    if _batcher is None or _batcher_pid != os.getpid():
+        # Batches run on the inference pool, so batched and unbatched
+        # generations together never use more than THREADS per pool worker
+        executor = get_executor()
+        with _bot_lock:
+            if _batcher is None or _batcher_pid != os.getpid():
+                _batcher = MicroBatcher(generate_batch, MAX_BATCH_SIZE, MAX_WAIT_MS, executor=executor)
+                _batcher_pid = os.getpid()
+    return _batcher
+
+def get_executor():
+    """Bounded pool for model work, one per process like the batcher"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _bot_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(INFERENCE_WORKERS, thread_name_prefix="inference")
+                _executor_pid = os.getpid()
+    return _executor
+
+def generate_one(prompt):
+    return get_bot().generate([prompt], max_length=MAX_LENGTH)[0]
+
+def admit():
+    """
+    Take one of the MAX_IN_FLIGHT generation slots, or raise
+    utils.ratelimit.Overloaded. generate() does this itself; callers of
+    stream_answer() take a slot first and release it when the stream ends.
+    """
+    return admission.acquire()
+
+def release_when_done(slot, future):
+    """
+    Release `slot` once `future`, the last generation queued under it, is
+    over: a caller that gave up waiting cancels it if it has not started,
+    and otherwise keeps the slot taken until it finishes. So MAX_IN_FLIGHT
+    bounds the work queued on the pool, not only the callers waiting on it.
+    """
+    if future is None:
+        slot.release()
+        return
+    future.cancel()
+    future.add_done_callback(lambda _: slot.release())
+
+def generate(prompt):
+    """Generate a reply for one prompt, batched with concurrent callers when enabled"""
+    slot = admit()
+    future = None
+    try:
+        if BATCHING_ENABLED:
+            with INFERENCE_SECONDS.labels("batched").time():
+                future = get_batcher().enqueue(prompt)
+                return future.result(INFERENCE_TIMEOUT)
+        with INFERENCE_SECONDS.labels("single").time():
+            future = get_executor().submit(generate_one, prompt)
+            return future.result(INFERENCE_TIMEOUT)
+    finally:
+        release_when_done(slot, future)
+
+def generate_many(prompts):
+    """
+    Generate replies for a list of prompts sent together, as padded
+    batches of up to MAX_BATCH_SIZE. The whole list takes one slot.
+    """
+    slot = admit()
+    future = None
+    try:
+        with INFERENCE_SECONDS.labels("request_batch").time():
+            replies = []
+            for start in range(0, len(prompts), MAX_BATCH_SIZE):
+                future = get_executor().submit(generate_batch, prompts[start:start + MAX_BATCH_SIZE])
+                replies += future.result(INFERENCE_TIMEOUT)
+            return replies
+    finally:
+        release_when_done(slot, future)
+
+def stream_answer(prompt):
+    """
+    Yield the answer in pieces as soon as they are generated.
+    Predefined answers are yielded whole.
+    """
+    predefined = get_predefined_answer(prompt)
+    if predefined:
+        yield predefined
+        return
+
+    start = time.perf_counter()
+    yield from get_bot().stream(prompt, get_executor().submit, MAX_LENGTH, INFERENCE_TIMEOUT)
+    INFERENCE_SECONDS.labels("stream").observe(time.perf_counter() - start)
+
+def preload():
+    """
+    Load the model now. Call this in the gunicorn master (preload_app) so
+    forked workers share the weights copy-on-write.
+    """
+    get_bot()
+
+def warm_up(prompt="Hello"):
+    """Run one tiny generation so the first real request is not the slow one"""
+    bot = get_bot()
+    start = time.perf_counter()
+    bot.generate([prompt], max_new_tokens=1)
+    startup_timings["first_token_seconds"] = round(time.perf_counter() - start, 3)
+
+def model_status():
+    return {
+        "enabled": True,
+        "name": MODEL_NAME,
+        "backend": BACKEND,
+        "threads": THREADS,
+        "loaded": _bot is not None,
+        "admission": admission.stats(),
+        "batching": get_batcher().stats() if BATCHING_ENABLED else None,
+        **startup_timings
+    }
 
 def get_answer(prompt):
     """
@@ -15,5 +230,13 @@ def get_answer(prompt):
         return predefined
 
     # Step 2: Else, use AI model to generate a reply
-    reply = bot(prompt, max_length=60, num_return_sequences=1)
-    return reply[0]['generated_text']
+    return generate(prompt)
+
+def get_answers(prompts):
+    """get_answer for several prompts; those the model must answer are generated together"""
+    answers = [get_predefined_answer(prompt) for prompt in prompts]
+    pending = [i for i, answer in enumerate(answers) if not answer]
+    if pending:
+        for i, reply in zip(pending, generate_many([prompts[i] for i in pending])):
+            answers[i] = reply
+    return answers
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils.storage import Storage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return Storage(str(tmp_path / "test.db"), str(tmp_path / "blobs"))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """
+    app.py imported once for the test session, with its database in a
+    temporary directory and the stub model (utils/stub_model.py) answering
+    questions the knowledge base cannot. Its settings are read at import
+    time, so tests change the limiters and the model on the module instead.
+    """
+    directory = tmp_path_factory.mktemp("app")
+    os.environ.update({
+        "CHAT_DB_PATH": str(directory / "test.db"),
+        "BLOB_DIR": str(directory / "blobs"),
+        "USE_LOCAL_MODEL": "1",
+        "LOCAL_MODEL_NAME": "stub",
+        "LOCAL_MODEL_WARMUP": "0",
+        "METRICS_ENABLED": "0",
+        # pytest closes its captured stderr before the log queue's last flush
+        "LOG_ASYNC": "0"
+    })
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    app_module.answer_cache.clear()
+    return app_module.app.test_client()
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from utils import ratelimit
+from utils.ratelimit import ConcurrencyLimiter, Overloaded, RateLimiter, parse_limit
+
+QUESTION = "zzqx blorf wibble"
+PASS_SECONDS = 0.1
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def slow_model(app_module, monkeypatch):
+    """The stub model, taking PASS_SECONDS per generation"""
+    bot = app_module.local_model.get_bot()
+    monkeypatch.setattr(bot, "pass_ms", PASS_SECONDS * 1000)
+    monkeypatch.setattr(bot, "token_ms", 0)
+    return bot
+
+
+def test_parse_limit():
+    assert parse_limit("60/60") == (60.0, 1.0)
+    assert parse_limit("10") == (10.0, 10.0)
+
+
+def test_bucket_refills_at_its_rate(clock):
+    limiter = RateLimiter("test", burst=2, rate=0.5)
+    assert limiter.take("ann") == 0
+    assert limiter.take("ann") == 0
+    assert limiter.take("ann") == pytest.approx(2.0)
+    # Other clients have their own bucket
+    assert limiter.take("bob") == 0
+
+    clock.now += 1
+    assert limiter.take("ann") == pytest.approx(1.0)
+    clock.now += 2
+    assert limiter.take("ann") == 0
+    assert limiter.stats()["limited"] == 2
+
+
+def test_cost_above_burst_is_capped(clock):
+    limiter = RateLimiter("test", burst=3, rate=1)
+    assert limiter.take("ann", cost=10) == 0
+    assert limiter.take("ann", cost=10) == pytest.approx(3.0)
+
+
+def test_empty_bucket_answers_429_with_retry_after(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.rate_limiters, "ask", RateLimiter("ask", burst=2, rate=0.25))
+    for _ in range(2):
+        assert client.post("/ask", json={"question": "hello", "username": "ann"}).status_code == 200
+
+    response = client.post("/ask", json={"question": "hello", "username": "ann"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "4"
+    assert response.get_json()["retry_after"] == 4
+    assert response.get_json()["answer"]
+    # A batch costs one token per question
+    assert client.post("/ask/batch", json={"questions": ["hi"], "username": "ann"}).status_code == 429
+    assert client.post("/ask", json={"question": "hello", "username": "bob"}).status_code == 200
+
+
+def test_slots_are_limited():
+    limiter = ConcurrencyLimiter(2)
+    first, second = limiter.acquire(), limiter.acquire()
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.retry_after >= 1
+
+    first.release()
+    first.release()
+    with limiter.acquire():
+        assert limiter.in_flight == 2
+    second.release()
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_waiting_caller_is_admitted_when_a_slot_frees():
+    limiter = ConcurrencyLimiter(1, wait=5)
+    slot = limiter.acquire()
+    threading.Timer(0.05, slot.release).start()
+    start = time.perf_counter()
+    limiter.acquire().release()
+    assert time.perf_counter() - start < 1
+
+
+def test_waiting_caller_gives_up_after_wait():
+    limiter = ConcurrencyLimiter(1, wait=0.05)
+    with limiter.acquire():
+        with pytest.raises(Overloaded):
+            limiter.acquire()
+
+
+def test_saturated_model_answers_503(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module.local_model, "admission", ConcurrencyLimiter(1))
+    with app_module.local_model.admit():
+        for path in ("/ask", "/ask/stream"):
+            response = client.post(path, json={"question": QUESTION})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+            assert response.get_json()["answer"] == app_module.MODEL_BUSY_RESPONSE
+        # Knowledge-base answers need no slot
+        assert client.post("/ask", json={"question": "hello"}).status_code == 200
+
+    assert client.post("/ask", json={"question": QUESTION}).status_code == 200
+
+
+def test_admitted_requests_have_bounded_latency(app_module, client, slow_model, monkeypatch):
+    limit = 2
+    monkeypatch.setattr(app_module.local_model, "admission", ConcurrencyLimiter(limit))
+    monkeypatch.setitem(app_module.rate_limiters, "ask", RateLimiter("ask", burst=100, rate=100))
+    callers = 8
+    barrier = threading.Barrier(callers)
+    results = []
+
+    def ask(i):
+        test_client = app_module.app.test_client()
+        barrier.wait()
+        start = time.perf_counter()
+        status = test_client.post("/ask", json={"question": f"{QUESTION} {i}"}).status_code
+        results.append((status, time.perf_counter() - start))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    admitted = [seconds for status, seconds in results if status == 200]
+    rejected = [seconds for status, seconds in results if status == 503]
+    assert len(admitted) + len(rejected) == callers
+    assert 1 <= len(admitted) <= limit
+    assert rejected
+    # An admitted request waits behind at most the other slots' work, and a
+    # rejected one does not wait at all
+    assert max(admitted) < (limit + 1) * PASS_SECONDS
+    assert max(rejected) < PASS_SECONDS
@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils.reminders import ReminderScheduler
+from utils.storage import Storage
+
+NOW = 1_000_000.0
+
+
+def add(storage, username, title, due_at):
+    reminder = {"title": title, "subject": "math", "datetime": "", "notes": "", "created_at": ""}
+    return storage.add_reminder(username, reminder, due_at)
+
+
+class Recorder:
+    """Notifier that remembers what it was given and fails the first `failures` calls"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self.delivered = []
+        self.event = threading.Event()
+
+    def __call__(self, reminder):
+        self.calls.append(reminder["title"])
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("webhook down")
+        self.delivered.append(reminder["title"])
+        self.event.set()
+
+
+def remaining(storage):
+    return [row[0] for row in storage.connection().execute("SELECT title FROM reminders ORDER BY id")]
+
+
+def test_due_reminders_are_delivered_earliest_first(storage):
+    add(storage, "ann", "third", NOW - 10)
+    add(storage, "bob", "first", NOW - 30)
+    add(storage, "ann", "later", NOW + 60)
+    add(storage, "cat", "second", NOW - 20)
+    notifier = Recorder()
+    scheduler = ReminderScheduler(storage, notifier, batch_size=2)
+
+    assert scheduler.run_pending(NOW) == 3
+    assert notifier.delivered == ["first", "second", "third"]
+    assert remaining(storage) == ["later"]
+    assert scheduler.stats()["next_due"] == NOW + 60
+
+
+def test_due_reminders_are_hidden_until_the_scheduler_takes_them(storage):
+    add(storage, "ann", "past", NOW - 1)
+    add(storage, "ann", "future", NOW + 60)
+
+    # Listing leaves the due reminder alone for the scheduler
+    assert [r["title"] for r in storage.get_active_reminders("ann", NOW)] == ["future"]
+    assert remaining(storage) == ["past", "future"]
+
+    ReminderScheduler(storage, Recorder()).run_pending(NOW)
+    assert remaining(storage) == ["future"]
+
+
+def test_earlier_reminder_wakes_the_scheduler(storage):
+    notifier = Recorder()
+    # A poll interval far longer than the test, so only schedule() can wake it
+    scheduler = ReminderScheduler(storage, notifier, poll_interval=3600)
+    add(storage, "ann", "much later", time.time() + 3600)
+    scheduler.ensure_running()
+    time.sleep(0.1)
+    assert scheduler.stats()["running"]
+
+    due_at = time.time() + 0.2
+    add(storage, "ann", "soon", due_at)
+    scheduler.schedule(due_at)
+
+    assert notifier.event.wait(5)
+    assert notifier.delivered == ["soon"]
+    # Deleted just after the notifier returns
+    deadline = time.monotonic() + 5
+    while remaining(storage) != ["much later"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert remaining(storage) == ["much later"]
+
+
+def test_schedule_only_moves_the_next_due_time_earlier(storage):
+    scheduler = ReminderScheduler(storage, Recorder())
+    scheduler.schedule(NOW + 60)
+    scheduler.schedule(NOW + 120)
+    assert scheduler.stats()["next_due"] == NOW + 60
+    scheduler.schedule(NOW + 30)
+    assert scheduler.stats()["next_due"] == NOW + 30
+
+
+def test_failed_delivery_is_retried_with_backoff(storage):
+    add(storage, "ann", "revise", NOW - 1)
+    notifier = Recorder(failures=2)
+    scheduler = ReminderScheduler(storage, notifier, retry_seconds=10)
+
+    assert scheduler.run_pending(NOW) == 0
+    assert remaining(storage) == ["revise"]
+    assert scheduler.stats()["next_due"] == NOW + 10
+
+    # Not retried before the backoff runs out, then retried after twice as long
+    assert scheduler.run_pending(NOW + 5) == 0
+    assert scheduler.run_pending(NOW + 10) == 0
+    assert scheduler.stats()["next_due"] == NOW + 30
+    assert scheduler.run_pending(NOW + 30) == 1
+
+    assert notifier.delivered == ["revise"]
+    assert remaining(storage) == []
+    assert scheduler.stats()["failed"] == 2
+
+
+def test_reminder_is_dropped_after_max_attempts(storage):
+    add(storage, "ann", "revise", NOW - 1)
+    scheduler = ReminderScheduler(storage, Recorder(failures=10), retry_seconds=1, max_attempts=3)
+
+    for hour in range(1, 3):
+        scheduler.run_pending(NOW + hour * 3600)
+        assert remaining(storage) == ["revise"]
+    scheduler.run_pending(NOW + 3 * 3600)
+    assert remaining(storage) == []
+    assert scheduler.stats()["dropped"] == 1
+
+
+def test_claimed_reminder_goes_to_one_worker_until_its_lease_runs_out(storage):
+    add(storage, "ann", "revise", NOW - 1)
+
+    assert [r["title"] for r in storage.claim_due_reminders(NOW, lease=60)] == ["revise"]
+    # Another worker polling meanwhile does not get it
+    assert storage.claim_due_reminders(NOW + 30, lease=60) == []
+    # The first one died without settling it: it is handed out again
+    reclaimed = storage.claim_due_reminders(NOW + 60, lease=60)
+    assert [(r["title"], r["attempts"]) for r in reclaimed] == [("revise", 2)]
+
+
+def test_reminders_table_from_before_notify_at_is_upgraded(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, title TEXT NOT NULL,
+            subject TEXT NOT NULL, datetime TEXT NOT NULL, due_at REAL NOT NULL,
+            notes TEXT NOT NULL, created_at TEXT NOT NULL
+        );
+        CREATE INDEX idx_reminders_due ON reminders (due_at);
+        INSERT INTO reminders (username, title, subject, datetime, due_at, notes, created_at)
+        VALUES ('ann', 'old', 'math', '', 999990.0, '', '');
+    """)
+    conn.close()
+
+    storage = Storage(path, str(tmp_path / "blobs"))
+    assert storage.next_reminder_due() == pytest.approx(999990.0)
+    notifier = Recorder()
+    assert ReminderScheduler(storage, notifier).run_pending(NOW) == 1
+    assert notifier.delivered == ["old"]
@@ -0,0 +1,83 @@
+import json
+import time
+
+import pytest
+
+QUESTION = "zzqx blorf wibble"
+TOKEN_SECONDS = 0.05
+
+
+@pytest.fixture
+def slow_model(app_module, monkeypatch):
+    """The stub model, taking TOKEN_SECONDS per generated word"""
+    bot = app_module.local_model.get_bot()
+    monkeypatch.setattr(bot, "pass_ms", 0)
+    monkeypatch.setattr(bot, "token_ms", TOKEN_SECONDS * 1000)
+    return bot
+
+
+def read_events(response, start):
+    """(seconds since `start`, event name, data) for each SSE event as it arrives"""
+    buffer = b""
+    for chunk in response.response:
+        buffer += chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+        while b"\n\n" in buffer:
+            raw, buffer = buffer.split(b"\n\n", 1)
+            event, data = "message", None
+            for line in raw.decode("utf-8").splitlines():
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+            yield time.perf_counter() - start, event, data
+
+
+def test_first_token_arrives_before_generation_finishes(client, slow_model):
+    start = time.perf_counter()
+    response = client.post("/ask/stream", json={"question": QUESTION}, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    events = list(read_events(response, start))
+    response.close()
+    generation_seconds = slow_model.tokens * TOKEN_SECONDS
+
+    # The prompt is echoed first, then the first generated word
+    assert events[0][1:] == ("message", {"token": QUESTION})
+    first_at, first_event, first = events[1]
+    assert first_event == "message" and first["token"].strip()
+    assert first_at < generation_seconds / 2
+
+    done_at, done_event, done = events[-1]
+    assert done_event == "done"
+    assert done_at >= generation_seconds
+    assert done["answer"] == "".join(data["token"] for _, event, data in events if event == "message")
+
+
+def test_cached_answer_is_streamed_whole_and_not_stored_again(app_module, client, slow_model, monkeypatch):
+    first = client.post("/ask/stream", json={"question": QUESTION}).get_data(as_text=True)
+    stored = []
+    monkeypatch.setattr(app_module.answer_cache, "set", lambda *args: stored.append(args))
+
+    start = time.perf_counter()
+    response = client.post("/ask/stream", json={"question": QUESTION}, buffered=False)
+    events = list(read_events(response, start))
+    response.close()
+
+    assert events[-1][0] < slow_model.tokens * TOKEN_SECONDS
+    assert [event for _, event, _ in events] == ["message", "done"]
+    assert events[0][2]["token"] == events[1][2]["answer"]
+    assert json.dumps(events[1][2]["answer"]) in first
+    # Writing a hit back would extend its TTL
+    assert stored == []
+
+
+def test_streamed_answer_matches_generated_one(app_module, client, slow_model):
+    response = client.post("/ask/stream", json={"question": QUESTION}, buffered=False)
+    streamed = list(read_events(response, time.perf_counter()))[-1][2]["answer"]
+    response.close()
+    # Both answers share one cache entry, so they must agree
+    app_module.answer_cache.clear()
+    generated = client.post("/ask", json={"question": QUESTION}).get_json()["answer"]
+
+    assert streamed == generated == slow_model.reply(QUESTION)
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Stripped from both ends of a question, with the spaces around it
+QUESTION_PUNCTUATION = " ?.!,;:\u00bf\u00a1\uff1f\uff01\u3002\uff0c"
+
+
+def normalize_question(question):
+    """
+    Cache key for a question: casefolded, single-spaced, without leading or
+    trailing punctuation. Every other character is kept, so questions that
+    differ in symbols or are written in another script get their own keys.
+    An empty key means the question is not cached.
+    """
+    return " ".join(question.casefold().split()).strip(QUESTION_PUNCTUATION)
+
+
+class AnswerCache:
+    """
+    LRU cache of answers with a time-to-live.
+    An optional shared backend (see Storage.get_cached_answer) lets every
+    worker process reuse answers computed by the others.
+    Keys carry the version of what the answers were computed from (see
+    set_version), so answers from an older knowledge base are never found,
+    not even ones another worker still has in the shared backend.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, shared=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self.version = ""
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, question):
+        key = self._key(question)
+        if not key:
+            return None
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                answer, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return answer
+                del self._entries[key]
+
+        if self.shared is not None:
+            cached = self.shared.get_cached_answer(key, now)
+            if cached is not None:
+                answer, expires_at = cached
+                with self._lock:
+                    self.shared_hits += 1
+                    self._store(key, answer, expires_at)
+                return answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, question, answer):
+        key = self._key(question)
+        if not key:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, answer, expires_at)
+        if self.shared is not None:
+            self.shared.set_cached_answer(key, answer, expires_at)
+
+    def get_or_compute(self, question, compute):
+        """
+        Return the cached answer, or compute and return it. `compute`
+        returns (answer, cacheable); only cacheable answers are stored, so
+        an error message is not served again for the rest of the TTL.
+        """
+        answer = self.get(question)
+        if answer is None:
+            answer, cacheable = compute(question)
+            if cacheable:
+                self.set(question, answer)
+        return answer
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def set_version(self, version):
+        """Start a new generation of answers; the old ones are dropped here and ignored in the shared backend"""
+        with self._lock:
+            self.version = version
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "version": self.version,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0
+            }
+
+    def _key(self, question):
+        key = normalize_question(question)
+        return f"{self.version}:{key}" if key and self.version else key
+
+    def _store(self, key, answer, expires_at):
+        self._entries[key] = (answer, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,85 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for a few milliseconds and runs them as one
+    batch. `run_batch` takes a list of items and returns a list of results
+    in the same order; callers of submit() block until their result is ready.
+    Given an executor, batches run on it rather than on the batcher's own
+    thread, so they share its bound with other work submitted there.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=5, name="micro-batcher", executor=None):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, item):
+        """Queue one item; returns its Future, which may be cancelled until its batch starts"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def submit(self, item, timeout=None):
+        """Queue one item and wait for its result; on timeout it is dropped if not yet started"""
+        future = self.enqueue(item)
+        try:
+            return future.result(timeout)
+        finally:
+            future.cancel()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0
+        }
+
+    def _collect(self):
+        """Block for the first item, then gather more until full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            # Cancelled items are skipped; the others can no longer be cancelled
+            batch = [(item, future) for item, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                if self.executor is not None:
+                    # Waiting here lets the next batch fill up meanwhile
+                    results = self.executor.submit(self.run_batch, items).result()
+                else:
+                    results = self.run_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
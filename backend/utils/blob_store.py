@@ -0,0 +1,174 @@
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+
+
+class BlobStore:
+    """
+    Content-addressed store for uploaded bytes.
+    Blobs live on disk under their SHA-256, so identical uploads are kept once.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, sha):
+        return os.path.join(self.root, sha[:2], sha)
+
+    def exists(self, sha):
+        return os.path.exists(self.path(sha))
+
+    def put(self, content):
+        """Store bytes and return their SHA-256 hex digest"""
+        sha = hashlib.sha256(content).hexdigest()
+        path = self.path(sha)
+        if os.path.exists(path):
+            return sha
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file first so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha
+
+    def writer(self, limit=None):
+        """Open a BlobWriter for streaming content into the store"""
+        return BlobWriter(self, limit)
+
+    def delete(self, sha):
+        try:
+            os.remove(self.path(sha))
+        except FileNotFoundError:
+            pass
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class BlobWriter:
+    """
+    File-like sink that spools an upload to a temp file in the store while
+    hashing it, counting its size and sniffing its type chunk by chunk.
+    Nothing is kept in memory beyond the current chunk.
+    """
+
+    SNIFF_BYTES = 16
+
+    def __init__(self, store, limit=None):
+        self.store = store
+        self.limit = limit
+        self.size = 0
+        self.sha = None
+        self._hash = hashlib.sha256()
+        self._head = b""
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.root, suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+
+    @property
+    def mime_type(self):
+        return sniff_mime_type(self._head)
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.limit is not None and self.size > self.limit:
+            raise UploadTooLarge(f"Upload exceeds {self.limit} bytes")
+        if len(self._head) < self.SNIFF_BYTES:
+            self._head += bytes(chunk[:self.SNIFF_BYTES - len(self._head)])
+        self._hash.update(chunk)
+        return self._file.write(chunk)
+
+    # The multipart parser also needs to read back and seek
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def commit(self):
+        """Move the spooled upload into the store and return its SHA-256"""
+        self._file.close()
+        self.sha = self._hash.hexdigest()
+        path = self.store.path(self.sha)
+        if os.path.exists(path):
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        self._tmp_path = None
+        return self.sha
+
+    def close(self):
+        """Discard the upload unless it was committed"""
+        if not self._file.closed:
+            self._file.close()
+        if self._tmp_path and os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        self._tmp_path = None
+
+
+MAGIC_NUMBERS = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+]
+
+
+# Image types a browser may be shown inline: each is recognised by its
+# magic number, and none can carry script (unlike SVG or HTML)
+SAFE_IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/gif", "image/webp"})
+
+
+def sniff_mime_type(head):
+    """Guess a MIME type from the first bytes of a file"""
+    for magic, mime_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if not head:
+        return ""
+    if b"\x00" in head:
+        return "application/octet-stream"
+    return "text/plain"
+
+
+def decode_data_url(value):
+    """
+    Decode a base64 payload, with or without a "data:<mime>;base64," prefix.
+    Returns (bytes, mime_type) and raises ValueError on bad input.
+    """
+    mime_type = ""
+    if value.startswith("data:"):
+        header, _, value = value.partition(",")
+        if not header.endswith(";base64"):
+            raise ValueError("Only base64 data URLs are supported")
+        mime_type = header[len("data:"):-len(";base64")]
+
+    try:
+        return base64.b64decode(value, validate=True), mime_type
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid base64 data")
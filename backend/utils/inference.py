@@ -0,0 +1,185 @@
+import atexit
+import os
+import shutil
+import tempfile
+import time
+
+# Every backend has the same three methods, which is all model.py uses:
+#   generate(prompts, **options)   replies for a list of prompts, in one
+#                                  padded batch; options are generation
+#                                  settings such as max_length
+#   stream(prompt, submit, max_length, timeout)
+#                                  yield a reply in pieces; the blocking
+#                                  generation runs through submit (the
+#                                  inference pool's submit)
+#   after_fork()                   the backend to use in a forked worker
+# The transformers-based ones also report import_seconds and load_seconds.
+
+
+class TransformersBackend:
+    """
+    The transformers text-generation pipeline in float32 eager PyTorch.
+    Subclasses change only how the model itself is loaded.
+    """
+
+    name = "transformers"
+
+    def __init__(self, model_name, threads):
+        self.model_name = model_name
+        self.threads = threads
+        start = time.perf_counter()
+        import torch
+        from transformers import AutoTokenizer, pipeline
+        imported = time.perf_counter()
+        torch.set_num_threads(threads)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # GPT-2 has no pad token; pad on the left so batched prompts all
+        # end right where generation starts
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+        tokenizer.padding_side = "left"
+        self.pipeline = pipeline("text-generation", model=self.load_model(model_name), tokenizer=tokenizer)
+        self.tokenizer = tokenizer
+        self.import_seconds = round(imported - start, 3)
+        self.load_seconds = round(time.perf_counter() - imported, 3)
+
+    def load_model(self, model_name):
+        from transformers import AutoModelForCausalLM
+        return AutoModelForCausalLM.from_pretrained(model_name).eval()
+
+    def generate(self, prompts, **options):
+        replies = self.pipeline(prompts, num_return_sequences=1, batch_size=len(prompts),
+                                pad_token_id=self.tokenizer.pad_token_id, **options)
+        return [reply[0]["generated_text"] for reply in replies]
+
+    def stream(self, prompt, submit, max_length, timeout):
+        from transformers import TextIteratorStreamer
+
+        inputs = self.tokenizer(prompt, return_tensors="pt")
+        streamer = TextIteratorStreamer(self.tokenizer, skip_special_tokens=True, timeout=timeout)
+        # generate() blocks, so it runs on the inference pool while we drain the streamer
+        future = submit(
+            self.pipeline.model.generate,
+            **inputs,
+            streamer=streamer,
+            max_length=max_length,
+            pad_token_id=self.tokenizer.pad_token_id
+        )
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+            future.result(timeout)
+        finally:
+            # Still queued if the streamer timed out or the client left
+            future.cancel()
+
+    def after_fork(self):
+        # PyTorch rebuilds its thread pool in the child; the size is ours to set again
+        import torch
+        torch.set_num_threads(self.threads)
+        return self
+
+
+class QuantizedTorchBackend(TransformersBackend):
+    """
+    Weights of the linear layers stored as int8 and activations quantized
+    on the fly (PyTorch dynamic quantization): about a quarter of the
+    weight memory and faster matrix products on CPU, for slightly
+    different sampling.
+    """
+
+    name = "torch-int8"
+
+    def load_model(self, model_name):
+        import torch
+        model = super().load_model(model_name)
+        replace_conv1d(model)
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def replace_conv1d(module):
+    """
+    GPT-2 keeps its projections in transformers' Conv1D, a Linear with
+    the weight transposed, which dynamic quantization does not know.
+    Swap each for the equivalent nn.Linear, in place.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            replace_conv1d(child)
+
+
+class OnnxBackend(TransformersBackend):
+    """
+    The model exported to ONNX and run by ONNX Runtime (through optimum),
+    with `threads` intra-op threads. The export is kept in
+    LOCAL_MODEL_ONNX_DIR, when set, so later starts only load it; otherwise
+    it goes to a temporary directory that lasts as long as this process.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_name, threads, export_dir=None):
+        # Read by load_model, which the parent constructor calls
+        self.export_dir = export_dir or os.getenv("LOCAL_MODEL_ONNX_DIR")
+        super().__init__(model_name, threads)
+
+    def load_model(self, model_name):
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForCausalLM
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        if self.export_dir and os.path.isdir(self.export_dir):
+            return ORTModelForCausalLM.from_pretrained(self.export_dir, session_options=options)
+        model = ORTModelForCausalLM.from_pretrained(model_name, export=True, session_options=options)
+        if not self.export_dir:
+            self.export_dir = temporary_dir("onnx-export-")
+        model.save_pretrained(self.export_dir)
+        return model
+
+    def after_fork(self):
+        # ONNX Runtime's thread pool does not survive fork; each worker
+        # loads a fresh session from the master's export instead of
+        # exporting the model again
+        return type(self)(self.model_name, self.threads, self.export_dir)
+
+
+def temporary_dir(prefix):
+    """
+    A new directory, removed when this process exits. Forked children
+    inherit the exit hook, so only the creating process removes it.
+    """
+    path = tempfile.mkdtemp(prefix=prefix)
+    owner = os.getpid()
+    atexit.register(lambda: os.getpid() == owner and shutil.rmtree(path, ignore_errors=True))
+    return path
+
+
+BACKENDS = {
+    "transformers": TransformersBackend,
+    "torch-int8": QuantizedTorchBackend,
+    "onnx": OnnxBackend
+}
+
+def default_threads(processes, workers):
+    """Split the cores between gunicorn workers and their inference threads, so they do not oversubscribe"""
+    return max(1, (os.cpu_count() or 1) // max(1, processes * workers))
+
+def load_backend(name, model_name, threads, **stub_options):
+    """Build the backend called `name` (see BACKENDS, or "stub")"""
+    if name == "stub":
+        from utils.stub_model import StubBackend
+        return StubBackend(**stub_options)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LOCAL_MODEL_BACKEND '{name}'; choose from {', '.join(BACKENDS)} or stub")
+    return BACKENDS[name](model_name, threads)
@@ -0,0 +1,319 @@
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+from utils.retrieval import BM25Index
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+
+# data/knowledge_base.json is edited by hand; `python -m utils.knowledge`
+# compiles it into data/knowledge_base.kb, which is what the app loads
+SOURCE_PATH = os.getenv("KNOWLEDGE_BASE_PATH", os.path.join(DATA_DIR, "knowledge_base.json"))
+COMPILED_PATH = os.getenv("KNOWLEDGE_BASE_COMPILED", os.path.join(DATA_DIR, "knowledge_base.kb"))
+# How often (seconds) to look for a changed file; 0 turns reloading off
+RELOAD_SECONDS = float(os.getenv("KNOWLEDGE_RELOAD_SECONDS", 2))
+
+MAGIC = b"AIKB0001"
+
+logger = logging.getLogger(__name__)
+
+
+def load_source(path=SOURCE_PATH):
+    """
+    Entries from a knowledge-base source file. Each entry has a subject, an
+    answer and either a topic (matched by name and by retrieval) or a list of
+    keywords (all of which must appear in the question).
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    entries = []
+    for i, entry in enumerate(data.get("entries", [])):
+        if not entry.get("answer") or not (entry.get("topic") or entry.get("keywords")):
+            raise ValueError(f"{path}: entry {i} needs an answer and a topic or keywords")
+        entries.append({
+            "subject": entry.get("subject") or "general",
+            "topic": entry["topic"].lower() if entry.get("topic") else None,
+            "keywords": [k.lower() for k in entry["keywords"]] if entry.get("keywords") else None,
+            "answer": entry["answer"]
+        })
+    return entries
+
+
+def entry_text(entry):
+    """Text the retrieval index sees for an entry; the name counts twice"""
+    if entry["topic"]:
+        return f"{entry['topic']} {entry['topic']} {entry['subject']} {entry['answer']}"
+    return f"{' '.join(entry['keywords'])} {entry['answer']}"
+
+
+def compile_entries(entries):
+    """
+    Serialise entries into the compiled layout:
+        MAGIC, uint32 header length, JSON header, padding to 4 bytes,
+        BM25 postings (uint32 arrays), then one zlib-compressed JSON
+        segment per subject.
+    Entry ids are positions after grouping by subject; the header maps
+    topics and keyword rules to ids so answers can stay compressed until
+    their subject is first needed.
+    """
+    by_subject = defaultdict(list)
+    for entry in entries:
+        by_subject[entry["subject"]].append(entry)
+    ordered = [entry for subject in sorted(by_subject) for entry in by_subject[subject]]
+
+    index = BM25Index.build(entry_text(entry) for entry in ordered)
+    postings = b"".join(array.tobytes() for array in index.arrays())
+
+    segments = []
+    first_id = 0
+    for subject in sorted(by_subject):
+        rows = [[e["topic"], e["keywords"], e["answer"]] for e in by_subject[subject]]
+        segments.append((subject, first_id, len(rows), zlib.compress(json.dumps(rows).encode("utf-8"))))
+        first_id += len(rows)
+
+    topics = {}
+    rules = []
+    for entry_id, entry in enumerate(ordered):
+        if entry["topic"]:
+            topics.setdefault(entry["topic"], entry_id)
+        else:
+            rules.append([entry["keywords"], entry_id])
+
+    def header_bytes(data_start):
+        offset = data_start + len(postings)
+        subjects = []
+        for subject, first, count, blob in segments:
+            subjects.append([subject, offset, len(blob), first, count])
+            offset += len(blob)
+        return json.dumps({
+            "byteorder": sys.byteorder,
+            "version": hashlib.sha256(json.dumps(ordered, sort_keys=True).encode("utf-8")).hexdigest()[:16],
+            "entries": len(ordered),
+            "subjects": subjects,
+            "topics": topics,
+            "rules": rules,
+            "bm25": index.header()
+        }).encode("utf-8")
+
+    # Segment offsets live in the header, so size the header with
+    # placeholder offsets first; growing the digits can only move data
+    # later, so repeat until the layout is stable
+    data_start = 0
+    while True:
+        header = header_bytes(data_start)
+        start = len(MAGIC) + 4 + len(header)
+        aligned = start + (-start) % 4
+        if aligned == data_start:
+            break
+        data_start = aligned
+
+    return b"".join([MAGIC, struct.pack("<I", len(header)), header, b"\0" * (data_start - start), postings]
+                    + [blob for _, _, _, blob in segments])
+
+
+def compile_file(source=SOURCE_PATH, output=COMPILED_PATH):
+    """Compile `source` to `output` atomically; a running app picks it up on its next check"""
+    entries = load_source(source)
+    tmp_path = output + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(compile_entries(entries))
+    os.replace(tmp_path, output)
+    return len(entries)
+
+
+class KnowledgeBase:
+    """
+    Read-only view of a compiled knowledge base. Topic names, keyword rules
+    and the retrieval postings are available immediately; answers are
+    decompressed one subject at a time, the first time one is needed.
+    """
+
+    def __init__(self, buffer, origin=None):
+        self.origin = origin
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{origin or 'buffer'} is not a compiled knowledge base")
+        header_len = struct.unpack_from("<I", view, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(view[start:start + header_len]))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{origin} was compiled on a {header['byteorder']}-endian machine")
+
+        self.version = header["version"]
+        self.entries = header["entries"]
+        self.topics = header["topics"]
+        self.rules = [(keywords, entry_id) for keywords, entry_id in header["rules"]]
+        self.subjects = [name for name, *_ in header["subjects"]]
+        self._segments = [tuple(segment[1:]) for segment in header["subjects"]]
+        self._first_ids = [first_id for _, _, first_id, _ in self._segments]
+        data_start = start + header_len + (-(start + header_len)) % 4
+        self.index = BM25Index.from_buffer(header["bm25"], view, data_start)
+
+        self._view = view
+        self._loaded = {}
+        self._lock = threading.Lock()
+        self._rule_patterns = {
+            keyword: re.compile(rf"\b{re.escape(keyword)}(?:s|es|'s)?\b")
+            for keywords, _ in self.rules
+            for keyword in keywords
+        }
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a compiled file; pages are shared between forked workers"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, origin=path)
+
+    @classmethod
+    def from_source(cls, path):
+        """Compile a source file in memory, for when no compiled file is up to date"""
+        return cls(compile_entries(load_source(path)), origin=path)
+
+    def __len__(self):
+        return self.entries
+
+    def entry(self, entry_id):
+        """Entry by id: a dict with subject, topic, keywords and answer"""
+        subject_index = bisect.bisect_right(self._first_ids, entry_id) - 1
+        rows = self._subject_rows(subject_index)
+        topic, keywords, answer = rows[entry_id - self._first_ids[subject_index]]
+        return {"subject": self.subjects[subject_index], "topic": topic, "keywords": keywords, "answer": answer}
+
+    def topic_answer(self, topic):
+        entry_id = self.topics.get(topic)
+        return None if entry_id is None else self.entry(entry_id)["answer"]
+
+    def predefined_answer(self, question):
+        """Answer of the first keyword rule whose keywords all appear as whole words"""
+        question = question.lower()
+        for keywords, entry_id in self.rules:
+            if all(self._rule_patterns[keyword].search(question) for keyword in keywords):
+                return self.entry(entry_id)["answer"]
+        return None
+
+    def search(self, question, k=5):
+        """Retrieval hits as (score, matched_terms, entry), best first"""
+        return [(score, matched, self.entry(entry_id)) for score, matched, entry_id in self.index.search(question, k)]
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "origin": self.origin,
+            "entries": self.entries,
+            "subjects": len(self.subjects),
+            "subjects_loaded": len(self._loaded)
+        }
+
+    def _subject_rows(self, subject_index):
+        rows = self._loaded.get(subject_index)
+        if rows is None:
+            with self._lock:
+                rows = self._loaded.get(subject_index)
+                if rows is None:
+                    offset, length, _, _ = self._segments[subject_index]
+                    rows = json.loads(zlib.decompress(self._view[offset:offset + length]))
+                    self._loaded[subject_index] = rows
+        return rows
+
+
+class KnowledgeLoader:
+    """
+    Holds the current KnowledgeBase and replaces it when the compiled or
+    source file changes. Readers keep whichever snapshot they already have,
+    so a reload never exposes a half-loaded knowledge base.
+    """
+
+    def __init__(self, source_path=SOURCE_PATH, compiled_path=COMPILED_PATH, check_interval=RELOAD_SECONDS):
+        self.source_path = source_path
+        self.compiled_path = compiled_path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.last_error = None
+        self._current = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        if self._current is None or (self.check_interval > 0 and time.monotonic() >= self._next_check):
+            with self._lock:
+                if self._current is None or time.monotonic() >= self._next_check:
+                    self._refresh()
+        return self._current
+
+    def stats(self):
+        return {**self.current().stats(), "reloads": self.reloads, "last_error": self.last_error}
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _refresh(self):
+        self._next_check = time.monotonic() + self.check_interval
+        source, compiled = self._stat(self.source_path), self._stat(self.compiled_path)
+        if (source, compiled) == self._signature:
+            return
+
+        try:
+            # A source edited after the last compile wins over the stale compiled file
+            if compiled is not None and (source is None or compiled[0] >= source[0]):
+                knowledge = KnowledgeBase.open(self.compiled_path)
+            else:
+                knowledge = KnowledgeBase.from_source(self.source_path)
+        except (OSError, ValueError) as e:
+            # Keep serving the previous snapshot (e.g. while the file is half
+            # written); the next change to either file is tried again
+            if self._current is None:
+                raise
+            self._signature = (source, compiled)
+            self.last_error = str(e)
+            logger.warning("Knowledge base reload failed: %s", e)
+            return
+
+        if self._current is not None:
+            self.reloads += 1
+        self._current = knowledge
+        self._signature = (source, compiled)
+        self.last_error = None
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+def get_loader():
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                _loader = KnowledgeLoader()
+    return _loader
+
+def get_knowledge():
+    """The current knowledge base snapshot"""
+    return get_loader().current()
+
+def get_predefined_answer(question):
+    return get_knowledge().predefined_answer(question)
+
+
+if __name__ == "__main__":
+    # Compile the knowledge base: python -m utils.knowledge [source] [output]
+    source = sys.argv[1] if len(sys.argv) > 1 else SOURCE_PATH
+    output = sys.argv[2] if len(sys.argv) > 2 else COMPILED_PATH
+    count = compile_file(source, output)
+    print(f"Compiled {count} entries from {source} to {output}")
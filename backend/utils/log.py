@@ -0,0 +1,251 @@
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# Records below this level are dropped before they are built
+LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Share of requests whose INFO records (access log, questions) are kept;
+# warnings and errors are always kept
+SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1.0))
+# Longer string fields, such as questions and answers, are cut to this many characters
+MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", 200))
+# Records waiting for the writer thread; when it is full new records are
+# dropped (and counted) rather than making requests wait
+QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+# How often (seconds) the writer thread writes out queued records
+FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", 0.1))
+# 0 writes each record from the thread that logs it
+ASYNC = os.getenv("LOG_ASYNC", "1") == "1"
+
+# Fields of the request being handled, set by AccessLog and bind()
+_context = contextvars.ContextVar("log_context", default=None)
+_sampled = contextvars.ContextVar("log_sampled", default=True)
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "context"}
+
+
+def bind(**fields):
+    """Add fields to every record logged for the current request"""
+    context = _context.get()
+    if context is not None:
+        context.update(fields)
+
+
+def truncate(value, limit):
+    if isinstance(value, str) and limit and len(value) > limit:
+        return value[:limit] + f"... ({len(value)} chars)"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request context and extras"""
+
+    def __init__(self, max_field_chars=MAX_FIELD_CHARS):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage(), self.max_field_chars)
+        }
+        data.update(getattr(record, "context", None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                data[key] = truncate(value, self.max_field_chars)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Runs in the thread that logs: drops INFO and below for requests that were
+    not sampled, and copies the request's fields onto the record
+    """
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        context = _context.get()
+        if context:
+            record.context = dict(context)
+        return True
+
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a background thread that formats and writes them, so
+    a slow stdout or log collector never holds up a request.
+
+    Logging a record is only a deque append: the writer is not woken for
+    each one (on a busy server that costs a thread switch per record) but
+    drains the queue every flush_seconds in one write, or sooner when an
+    error is logged. The thread does not survive fork, so each process
+    starts its own on first use.
+    """
+
+    def __init__(self, target, maxsize=QUEUE_SIZE, flush_seconds=FLUSH_SECONDS):
+        super().__init__(deque())
+        self.target = target
+        self.maxsize = maxsize
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def prepare(self, record):
+        # JSON encoding waits for the writer thread; only the message (whose
+        # args may change) and the exception text (which needs the live
+        # traceback) are rendered here
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.target.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        if len(self.queue) >= self.maxsize:
+            self.dropped += 1
+            return
+        self.queue.append(record)
+        if record.levelno >= logging.ERROR:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write out everything queued so far, from the calling thread"""
+        records = []
+        while True:
+            try:
+                records.append(self.queue.popleft())
+            except IndexError:
+                break
+        if not records:
+            return
+        target = self.target
+        lines = []
+        for record in records:
+            try:
+                lines.append(target.format(record))
+            except Exception:
+                target.handleError(record)
+        with target.lock:
+            try:
+                target.stream.write("\n".join(lines) + "\n")
+                target.flush()
+            except Exception:
+                target.handleError(records[-1])
+
+    def close(self):
+        # Called by logging at exit: stop the writer and write what is left
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                self._stopping = True
+                self._wakeup.set()
+                self._thread.join()
+                self._thread = None
+        self.flush()
+        super().close()
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # Records inherited over fork belong to the parent's writer
+                self.queue = deque()
+                self._stopping = False
+                self._thread = threading.Thread(target=self._loop, name="log-writer", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _loop(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+def configure(stream=None):
+    """
+    Send the root logger's records to `stream` (stderr by default) as JSON
+    lines, through AsyncHandler unless LOG_ASYNC=0. Safe to call repeatedly;
+    returns the installed handler.
+    """
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            target = logging.StreamHandler(stream or sys.stderr)
+            target.setFormatter(JsonFormatter())
+            handler = AsyncHandler(target) if ASYNC else target
+            handler.addFilter(RequestContextFilter())
+            root = logging.getLogger()
+            root.addHandler(handler)
+            root.setLevel(LEVEL)
+            _handler = handler
+    return _handler
+
+def dropped_records():
+    return getattr(_handler, "dropped", 0)
+
+
+class AccessLog:
+    """
+    WSGI middleware: gives each request an id (X-Request-ID if the client
+    sent one), decides whether the request is sampled, and logs one line
+    when the response starts with its method, path, status and duration.
+    Server errors are always logged, at WARNING.
+    """
+
+    def __init__(self, wsgi_app, logger=None, sample_rate=SAMPLE_RATE):
+        self.wsgi_app = wsgi_app
+        self.logger = logger or logging.getLogger("access")
+        self.sample_rate = sample_rate
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        request_id = environ.get("HTTP_X_REQUEST_ID") or os.urandom(8).hex()
+        sampled = self.sample_rate >= 1 or random.random() < self.sample_rate
+        context_token = _context.set({"request_id": request_id})
+        sampled_token = _sampled.set(sampled)
+        status = "500"
+
+        def record_status(status_line, headers, exc_info=None):
+            nonlocal status
+            status = status_line[:3]
+            headers.append(("X-Request-ID", request_id))
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            return self.wsgi_app(environ, record_status)
+        finally:
+            level = logging.WARNING if status >= "500" else logging.INFO
+            if (sampled or level >= logging.WARNING) and self.logger.isEnabledFor(level):
+                self.logger.log(level, "request", extra={
+                    "method": environ.get("REQUEST_METHOD"),
+                    "path": environ.get("PATH_INFO"),
+                    "status": int(status),
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3)
+                })
+            _sampled.reset(sampled_token)
+            _context.reset(context_token)
@@ -0,0 +1,101 @@
+class KeywordMatcher:
+    """
+    Aho-Corasick keyword matcher.
+    Finds every registered keyword in a single pass over the text, so the
+    cost of a lookup does not grow with the number of keywords.
+    Keywords added first have the highest priority.
+    """
+
+    def __init__(self, word_boundaries=True):
+        self.word_boundaries = word_boundaries
+        self.keywords = {}
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._output_link = [0]
+        self._built = False
+
+    def add(self, keyword, kind, value):
+        """Register a keyword. Duplicates keep their first (highest priority) entry."""
+        keyword = keyword.lower()
+        if not keyword or keyword in self.keywords:
+            return
+        self.keywords[keyword] = (len(self.keywords), kind, value)
+
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._output_link.append(0)
+            state = next_state
+        self._output[state].append(keyword)
+        self._built = False
+
+    def build(self):
+        """Compute failure links (breadth-first over the trie)."""
+        queue = []
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                if self._fail[next_state] == next_state:
+                    self._fail[next_state] = 0
+                suffix = self._fail[next_state]
+                self._output_link[next_state] = suffix if self._output[suffix] else self._output_link[suffix]
+
+        self._built = True
+        return self
+
+    def find_all(self, text):
+        """Return (start, keyword, kind, value, priority) for every hit in text"""
+        if not self._built:
+            self.build()
+
+        text = text.lower()
+        goto, fail, output, output_link = self._goto, self._fail, self._output, self._output_link
+        hits = []
+        state = 0
+
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match_state = state if output[state] else output_link[state]
+            while match_state:
+                for keyword in output[match_state]:
+                    start = index - len(keyword) + 1
+                    if self.word_boundaries and not self._is_whole_word(text, start, index + 1):
+                        continue
+                    priority, kind, value = self.keywords[keyword]
+                    hits.append((start, keyword, kind, value, priority))
+                match_state = output_link[match_state]
+
+        return hits
+
+    def best_match(self, text):
+        """Return (kind, value) of the highest priority hit, or None"""
+        hits = self.find_all(text)
+        if not hits:
+            return None
+        best = min(hits, key=lambda hit: hit[4])
+        return best[2], best[3]
+
+    @staticmethod
+    def _is_whole_word(text, start, end):
+        if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "_"):
+            return False
+        if end < len(text) and (text[end].isalnum() or text[end] == "_"):
+            return False
+        return True
@@ -0,0 +1,239 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; suits both cheap endpoints and model generation
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def register_callback(self, name, kind, help, fn, labels=()):
+        """
+        A metric read at scrape time instead of updated on every event.
+        fn returns a number, or a dict of label-value tuples to numbers.
+        """
+        with self._lock:
+            self._callbacks.append((name, kind, help, fn, tuple(labels)))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for name, kind, help, fn, label_names in list(self._callbacks):
+            try:
+                values = fn()
+            except Exception as e:
+                values = None
+                lines.append(f"# {name} unavailable: {e}")
+            if values is None:
+                continue
+            if not isinstance(values, dict):
+                values = {(): values}
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label_values, value in values.items():
+                lines.append(f"{name}{format_labels(label_names, label_values)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+        # A metric without labels has exactly one child; make it now so
+        # updates skip the lookup
+        self._default = None if self.label_names else self.labels()
+        registry.register(self)
+
+    def labels(self, *values):
+        """The child for one combination of label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield from child.samples(self.name, self.label_names, values)
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, label_names, values):
+        yield f"{name}{format_labels(label_names, values)} {format_value(self.value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf; made cumulative only when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name, label_names, values):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = format_labels(label_names + ("le",), values + (format_value(float(bound)),))
+            yield f"{name}_bucket{labels} {cumulative}"
+        yield f"{name}_sum{format_labels(label_names, values)} {format_value(total)}"
+        yield f"{name}_count{format_labels(label_names, values)} {cumulative}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(float(bound) for bound in buckets)
+        super().__init__(name, help, labels, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class WSGIMetrics:
+    """
+    WSGI middleware counting requests and timing them until the response
+    starts, without going through the framework's per-request hooks. The
+    application names the endpoint by setting environ[ENDPOINT_KEY].
+    """
+
+    ENDPOINT_KEY = "metrics.endpoint"
+
+    def __init__(self, wsgi_app, requests, seconds, in_flight):
+        self.wsgi_app = wsgi_app
+        self.requests = requests
+        self.seconds = seconds
+        self.in_flight = in_flight
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        status = "500"
+
+        def record_status(status_line, headers, exc_info=None):
+            nonlocal status
+            status = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        self.in_flight.inc()
+        try:
+            return self.wsgi_app(environ, record_status)
+        finally:
+            self.in_flight.dec()
+            method = environ.get("REQUEST_METHOD", "")
+            endpoint = environ.get(self.ENDPOINT_KEY, "unmatched")
+            self.seconds.labels(method, endpoint).observe(time.perf_counter() - start)
+            self.requests.labels(method, endpoint, status).inc()
@@ -0,0 +1,166 @@
+import math
+import threading
+import time
+
+
+def parse_limit(spec):
+    """
+    "<requests>/<seconds>", e.g. "60/60": a client may send 60 requests at
+    once and then one a second. Returns (burst, rate per second).
+    """
+    requests, _, seconds = spec.partition("/")
+    burst = float(requests)
+    return burst, burst / float(seconds or 1)
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by client: each key holds up to `burst` tokens,
+    refilled at `rate` per second, and a request spends one.
+    Buckets live in this process unless a shared backend is given (see
+    Storage.take_rate_token), which makes the limit hold across all
+    worker processes.
+    """
+
+    # Full buckets are dropped once there are this many keys; a full
+    # bucket and a missing one behave the same
+    MAX_KEYS = 10000
+
+    def __init__(self, name, burst, rate, shared=None):
+        self.name = name
+        self.burst = burst
+        self.rate = rate
+        self.shared = shared
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def take(self, key, cost=1):
+        """
+        Spend `cost` tokens for `key`. Returns 0 if allowed, else seconds
+        until there will be enough. A cost above the burst is capped to it.
+        """
+        now = time.time()
+        cost = min(cost, self.burst)
+        if self.shared is not None:
+            wait = self.shared.take_rate_token(f"{self.name}:{key}", self.burst, self.rate, now, cost)
+            with self._lock:
+                self._count(wait)
+            return wait
+
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+            self._count(wait)
+            return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "burst": self.burst,
+                "per_second": round(self.rate, 4),
+                "shared": self.shared is not None,
+                "tracked_keys": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited
+            }
+
+    def _count(self, wait):
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+
+    def _prune(self, now):
+        refill_seconds = self.burst / self.rate
+        self._buckets = {key: bucket for key, bucket in self._buckets.items()
+                         if now - bucket[1] < refill_seconds}
+
+
+class Overloaded(Exception):
+    """Raised when there is no room for more work; retry_after is a hint in whole seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"overloaded, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Admits at most `limit` holders at once. A caller that cannot get a slot
+    within `wait` seconds gets Overloaded instead of queueing behind the
+    others, with a retry hint from how long slots have recently been held.
+    """
+
+    def __init__(self, limit, wait=0.0):
+        self.limit = limit
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of how long a slot is held, for Retry-After
+        self.mean_hold_seconds = 0.0
+
+    def acquire(self):
+        """Return a Slot (release it, or use it as a context manager), or raise Overloaded"""
+        if self.wait > 0:
+            acquired = self._slots.acquire(timeout=self.wait)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(max(1, math.ceil(self.mean_hold_seconds)))
+        with self._lock:
+            self.in_flight += 1
+            self.admitted += 1
+        return Slot(self)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "mean_hold_seconds": round(self.mean_hold_seconds, 4)
+            }
+
+    def _release(self, held):
+        with self._lock:
+            self.in_flight -= 1
+            self.mean_hold_seconds += (held - self.mean_hold_seconds) * 0.1
+        self._slots.release()
+
+
+class Slot:
+    """One admitted unit of work; releasing it more than once is harmless"""
+
+    __slots__ = ("_limiter", "_started", "_released")
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limiter._release(time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+
+class LogNotifier:
+    """Logs due reminders; stands in for e-mail or push delivery"""
+
+    def __call__(self, reminder):
+        logger.info("reminder due", extra={
+            "user": reminder["username"],
+            "title": reminder["title"],
+            "subject": reminder["subject"] or "general",
+            "due": reminder["datetime"]
+        })
+
+
+class WebhookNotifier:
+    """POSTs each due reminder as JSON to a URL"""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, reminder):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(reminder).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def notifier_from_env():
+    """WebhookNotifier when REMINDER_WEBHOOK_URL is set, otherwise LogNotifier"""
+    url = os.getenv("REMINDER_WEBHOOK_URL")
+    return WebhookNotifier(url) if url else LogNotifier()
+
+
+class ReminderScheduler:
+    """
+    Background thread that hands due reminders to a notifier.
+
+    Reminders stay in SQLite: the index on notify_at is the time-ordered
+    queue, shared by every worker process. The scheduler only remembers the
+    earliest due time, so checking whether anything is due is a single
+    comparison; it sleeps until then (or poll_interval, to notice reminders
+    added by other workers) and is woken early by schedule().
+
+    A reminder is only deleted once the notifier has taken it. A failed
+    delivery is retried after retry_seconds, doubling each time, and given
+    up after max_attempts; lease_seconds must cover delivering a whole batch.
+    """
+
+    # Longest wait between two attempts at one reminder
+    MAX_RETRY_SECONDS = 3600
+
+    def __init__(self, storage, notifier, poll_interval=30.0, batch_size=100,
+                 lease_seconds=300.0, retry_seconds=30.0, max_attempts=8):
+        self.storage = storage
+        self.notifier = notifier
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max_attempts
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self._next_due = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_running(self):
+        """Start the thread in this process; threads do not survive fork, so call it per worker"""
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._loop, name="reminder-scheduler", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def schedule(self, due_at):
+        """Note a newly added reminder; wakes the thread if it is now the earliest"""
+        if self._next_due is None or due_at < self._next_due:
+            self._next_due = due_at
+            self._wakeup.set()
+
+    def is_due(self, now):
+        return self._next_due is not None and self._next_due <= now
+
+    def run_pending(self, now=None):
+        """Deliver every reminder due by `now`; returns how many were delivered"""
+        now = time.time() if now is None else now
+        delivered = 0
+        self._next_due = self.storage.next_reminder_due()
+        while self.is_due(now):
+            done, retries = [], []
+            for reminder in self.storage.claim_due_reminders(now, self.batch_size, self.lease_seconds):
+                try:
+                    self.notifier(reminder)
+                    delivered += 1
+                    done.append(reminder["id"])
+                except Exception:
+                    self.failed += 1
+                    logger.exception("Delivering reminder failed", extra={
+                        "reminder_id": reminder["id"], "attempts": reminder["attempts"]
+                    })
+                    if reminder["attempts"] >= self.max_attempts:
+                        self.dropped += 1
+                        done.append(reminder["id"])
+                    else:
+                        retries.append((reminder["id"], now + self.retry_delay(reminder["attempts"])))
+            self.storage.settle_reminders(done, retries)
+            self._next_due = self.storage.next_reminder_due()
+        self.delivered += delivered
+        return delivered
+
+    def retry_delay(self, attempts):
+        """Seconds to wait after the `attempts`-th failed delivery"""
+        return min(self.retry_seconds * 2 ** (attempts - 1), self.MAX_RETRY_SECONDS)
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._pid == os.getpid() and self._thread.is_alive(),
+            "next_due": self._next_due,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+    def _loop(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Reminder scheduler pass failed")
+                # Do not spin if the database keeps failing
+                self._wakeup.wait(1.0)
+                continue
+
+            wait = self.poll_interval
+            if self._next_due is not None:
+                wait = max(0.0, min(wait, self._next_due - time.time()))
+            self._wakeup.wait(wait)
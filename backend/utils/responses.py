@@ -0,0 +1,102 @@
+import gzip
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+# Optional accelerators: `pip install orjson brotli`. Without them JSON
+# goes through the standard library and responses are only gzipped.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent as they are; below about a packet
+# compression saves nothing on the wire and still costs CPU
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+# Brotli's lower qualities compress about as well as gzip -6, much faster
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+
+COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "image/svg+xml"}
+
+# What this process can produce, in order of preference when the client
+# accepts several equally
+ENCODINGS = (["br"] if brotli is not None else []) + ["gzip"]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider, with orjson doing the work when it is installed.
+    Output matches the standard provider (sorted keys, dates as HTTP dates)
+    except that non-ASCII text is sent as UTF-8 instead of \\u escapes.
+    """
+
+    if orjson is not None:
+        OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME \
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Pretty-printed in debug mode, like the standard provider
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def is_compressible(response):
+    mimetype = response.mimetype or ""
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES or mimetype.endswith("+json")
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def compress_response(response, accept_encodings, min_bytes=COMPRESS_MIN_BYTES):
+    """
+    Compress a buffered response with the best encoding the client accepts.
+    Streamed responses (SSE) and files (sent with Range support) are left
+    alone, as is anything already encoded or too small to be worth it.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or "Content-Encoding" in response.headers or not is_compressible(response)):
+        return response
+
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    # From here on the representation depends on Accept-Encoding
+    response.vary.add("Accept-Encoding")
+    encoding = accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    compressed = compress(body, encoding)
+    if len(compressed) >= len(body):
+        return response
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    # A strong ETag names exact bytes; the compressed body is a different
+    # representation of the same version, so the tag becomes weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,118 @@
+import array
+import heapq
+import math
+import re
+from collections import defaultdict
+
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "could", "do", "does", "explain",
+    "for", "from", "give", "happen", "help", "how", "i", "in", "is", "it", "learn", "me", "my", "of",
+    "on", "or", "please", "so", "tell", "that", "the", "their", "them", "they", "this", "to", "was",
+    "we", "what", "when", "where", "which", "who", "why", "will", "with", "would", "you", "your"
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def stem(word):
+    """Very light stemming: fold common plural endings"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "ches", "shes", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in TOKEN_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of texts; hits are reported by position in that list.
+    Postings are flat uint32 arrays, so a saved index can be memory-mapped
+    and queried without loading it into the heap (see utils.knowledge).
+    """
+
+    def __init__(self, terms, doc_ids, tfs, doc_lengths, avgdl, k1=1.2, b=0.75):
+        self.terms = terms
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.avgdl = avgdl or 1.0
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts, k1=1.2, b=0.75):
+        postings = defaultdict(list)
+        doc_lengths = array.array("I")
+
+        for doc_id, text in enumerate(texts):
+            counts = defaultdict(int)
+            tokens = tokenize(text)
+            for token in tokens:
+                counts[token] += 1
+            for token, tf in counts.items():
+                postings[token].append((doc_id, tf))
+            doc_lengths.append(len(tokens))
+
+        terms = {}
+        doc_ids = array.array("I")
+        tfs = array.array("I")
+        for term in sorted(postings):
+            terms[term] = (len(doc_ids), len(postings[term]))
+            for doc_id, tf in postings[term]:
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        avgdl = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 1.0
+        return cls(terms, memoryview(doc_ids), memoryview(tfs), memoryview(doc_lengths), avgdl, k1, b)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def search(self, query, k=5):
+        """Return up to k (score, matched_terms, doc_id) tuples, best first"""
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        total = len(self.doc_lengths)
+
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, count = entry
+            idf = math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for i in range(offset, offset + count):
+                doc_id = self.doc_ids[i]
+                tf = self.tfs[i]
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avgdl)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_id] += 1
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, matched[doc_id], doc_id) for doc_id, score in best]
+
+    def header(self):
+        """Everything but the postings, as JSON-serialisable values"""
+        return {"avgdl": self.avgdl, "k1": self.k1, "b": self.b,
+                "postings": len(self.doc_ids), "docs": len(self.doc_lengths), "terms": self.terms}
+
+    def arrays(self):
+        """The postings and document lengths, in the order from_buffer() reads them"""
+        return [self.doc_ids, self.tfs, self.doc_lengths]
+
+    @classmethod
+    def from_buffer(cls, header, view, offset):
+        """Index over uint32 arrays stored in `view` from `offset` on; nothing is copied"""
+        postings = header["postings"]
+        doc_ids = view[offset:offset + 4 * postings].cast("I")
+        offset += 4 * postings
+        tfs = view[offset:offset + 4 * postings].cast("I")
+        offset += 4 * postings
+        doc_lengths = view[offset:offset + 4 * header["docs"]].cast("I")
+        terms = {term: tuple(entry) for term, entry in header["terms"].items()}
+        return cls(terms, doc_ids, tfs, doc_lengths, header["avgdl"], header["k1"], header["b"])
@@ -0,0 +1,700 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from utils.blob_store import BlobStore
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "database",
+    "chat_history.db"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_messages_user_seq ON chat_messages (username, seq);
+
+-- Per-user write position of the chat ring buffer. last_seq never goes
+-- back, so it doubles as a pagination cursor and an ETag.
+CREATE TABLE IF NOT EXISTS chat_counters (
+    username TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL,
+    message_count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    title TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    datetime TEXT NOT NULL,
+    due_at REAL NOT NULL,
+    notes TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    -- When the scheduler next tries to deliver it: due_at at first, then
+    -- pushed back while a worker holds it and after each failed attempt
+    notify_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_reminders_user_due ON reminders (username, due_at);
+CREATE INDEX IF NOT EXISTS idx_reminders_notify ON reminders (notify_at);
+CREATE INDEX IF NOT EXISTS idx_reminders_user_id ON reminders (username, id);
+
+CREATE TABLE IF NOT EXISTS drawings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    title TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    blob_sha TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_drawings_user_id ON drawings (username, id);
+CREATE INDEX IF NOT EXISTS idx_drawings_blob ON drawings (blob_sha);
+
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    blob_sha TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_user_id ON files (username, id);
+CREATE INDEX IF NOT EXISTS idx_files_blob ON files (blob_sha);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    username TEXT PRIMARY KEY,
+    login_time TEXT NOT NULL,
+    questions_asked INTEGER NOT NULL,
+    last_activity TEXT NOT NULL,
+    theme_preference TEXT NOT NULL,
+    topics_covered TEXT NOT NULL,
+    quiz_scores TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_last_activity ON sessions (last_activity);
+
+-- Sessions idle longer than SESSION_IDLE_SECONDS, as one JSON array
+-- [login_time, questions_asked, theme_preference, topics_covered,
+-- quiz_scores]; moved back into sessions the next time the user is active
+CREATE TABLE IF NOT EXISTS session_archive (
+    username TEXT PRIMARY KEY,
+    last_activity TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS answer_cache (
+    question_key TEXT PRIMARY KEY,
+    answer TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_answer_cache_expires ON answer_cache (expires_at);
+
+-- Token buckets shared by every worker when RATE_LIMIT_SHARED=1; full_at
+-- is when the bucket will be full again, after which the row can go
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    full_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rate_limits_full_at ON rate_limits (full_at);
+
+-- Row counts for /status, kept current by the triggers below so reading
+-- them never scans a table
+CREATE TABLE IF NOT EXISTS table_counts (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS count_chat_users_insert AFTER INSERT ON chat_counters BEGIN
+    UPDATE table_counts SET value = value + (NEW.message_count > 0) WHERE name = 'chat_users';
+END;
+CREATE TRIGGER IF NOT EXISTS count_chat_users_update AFTER UPDATE OF message_count ON chat_counters BEGIN
+    UPDATE table_counts SET value = value + (NEW.message_count > 0) - (OLD.message_count > 0)
+    WHERE name = 'chat_users';
+END;
+CREATE TRIGGER IF NOT EXISTS count_sessions_insert AFTER INSERT ON sessions BEGIN
+    UPDATE table_counts SET value = value + 1 WHERE name = 'sessions';
+END;
+CREATE TRIGGER IF NOT EXISTS count_sessions_delete AFTER DELETE ON sessions BEGIN
+    UPDATE table_counts SET value = value - 1 WHERE name = 'sessions';
+END;
+CREATE TRIGGER IF NOT EXISTS count_session_archive_insert AFTER INSERT ON session_archive BEGIN
+    UPDATE table_counts SET value = value + 1 WHERE name = 'session_archive';
+END;
+CREATE TRIGGER IF NOT EXISTS count_session_archive_delete AFTER DELETE ON session_archive BEGIN
+    UPDATE table_counts SET value = value - 1 WHERE name = 'session_archive';
+END;
+CREATE TRIGGER IF NOT EXISTS count_reminders_insert AFTER INSERT ON reminders BEGIN
+    UPDATE table_counts SET value = value + 1 WHERE name = 'reminders';
+END;
+CREATE TRIGGER IF NOT EXISTS count_reminders_delete AFTER DELETE ON reminders BEGIN
+    UPDATE table_counts SET value = value - 1 WHERE name = 'reminders';
+END;
+CREATE TRIGGER IF NOT EXISTS count_drawings_insert AFTER INSERT ON drawings BEGIN
+    UPDATE table_counts SET value = value + 1 WHERE name = 'drawings';
+END;
+CREATE TRIGGER IF NOT EXISTS count_drawings_delete AFTER DELETE ON drawings BEGIN
+    UPDATE table_counts SET value = value - 1 WHERE name = 'drawings';
+END;
+CREATE TRIGGER IF NOT EXISTS count_files_insert AFTER INSERT ON files BEGIN
+    UPDATE table_counts SET value = value + 1 WHERE name = 'files';
+END;
+CREATE TRIGGER IF NOT EXISTS count_files_delete AFTER DELETE ON files BEGIN
+    UPDATE table_counts SET value = value - 1 WHERE name = 'files';
+END;
+"""
+
+# How each entry of table_counts is computed from scratch; only used once,
+# when a database created before the counters existed is first opened
+TABLE_COUNT_QUERIES = {
+    "chat_users": "SELECT COUNT(*) FROM chat_counters WHERE message_count > 0",
+    "sessions": "SELECT COUNT(*) FROM sessions",
+    "session_archive": "SELECT COUNT(*) FROM session_archive",
+    "reminders": "SELECT COUNT(*) FROM reminders",
+    "drawings": "SELECT COUNT(*) FROM drawings",
+    "files": "SELECT COUNT(*) FROM files"
+}
+
+# Expired shared cache rows are purged once every this many writes
+ANSWER_CACHE_PURGE_EVERY = 100
+
+# Shared rate limit buckets that have refilled are purged once every this
+# many requests
+RATE_LIMIT_PURGE_EVERY = 1000
+
+# Sessions idle for this long are moved to session_archive (0 keeps them
+# all in sessions); the sweep runs once every SESSION_SWEEP_EVERY saves
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", 7 * 24 * 3600))
+SESSION_SWEEP_EVERY = 100
+SESSION_SWEEP_BATCH = 500
+
+
+class UserCollection:
+    """
+    One table of items owned by users (reminders, drawings, files).
+
+    IDs come from AUTOINCREMENT, so they only ever grow and are never reused
+    after a delete. get() and delete() are primary-key lookups, and list()
+    walks the (username, id) index in insertion order a page at a time, so
+    none of them touch the rest of a user's items.
+    """
+
+    def __init__(self, storage, table, columns, list_columns, blob_column=None):
+        self.storage = storage
+        self.table = table
+        # Column names; "column AS alias" renames a column in results
+        self.columns = columns
+        self.list_columns = list_columns
+        self.blob_column = blob_column
+
+    def add(self, conn, username, values):
+        """Insert one item in the caller's transaction and return its id"""
+        names = ["username", *values]
+        cursor = conn.execute(
+            f"INSERT INTO {self.table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            (username, *values.values())
+        )
+        return cursor.lastrowid
+
+    def get(self, username, item_id):
+        row = self.storage.connection().execute(
+            f"SELECT {', '.join(self.columns)} FROM {self.table} WHERE username = ? AND id = ?",
+            (username, item_id)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def list(self, username, after=0, limit=None, where="", params=()):
+        """Items with id greater than `after`, oldest first, at most `limit`"""
+        rows = self.storage.connection().execute(
+            f"SELECT {', '.join(self.list_columns)} FROM {self.table} "
+            f"WHERE username = ? AND id > ? {'AND ' + where if where else ''} ORDER BY id LIMIT ?",
+            (username, after, *params, -1 if limit is None else limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, username, item_id):
+        """Delete one item; its blob goes too once no other item references it"""
+        with self.storage.transaction() as conn:
+            if self.blob_column is None:
+                return conn.execute(
+                    f"DELETE FROM {self.table} WHERE username = ? AND id = ?", (username, item_id)
+                ).rowcount
+
+            row = conn.execute(
+                f"SELECT {self.blob_column} FROM {self.table} WHERE username = ? AND id = ?",
+                (username, item_id)
+            ).fetchone()
+            if row is None:
+                return 0
+            conn.execute(f"DELETE FROM {self.table} WHERE username = ? AND id = ?", (username, item_id))
+            self.storage.release_blob(conn, row[0])
+            return 1
+
+
+class Storage:
+    """
+    SQLite storage for all per-user state.
+    The database runs in WAL mode so readers never block the writer, and
+    every thread (and every forked worker) gets its own connection.
+    Drawing and file contents go to a content-addressed BlobStore; the
+    database only keeps their metadata.
+    """
+
+    def __init__(self, path=None, blob_dir=None, session_idle_seconds=SESSION_IDLE_SECONDS):
+        self.path = path or os.getenv("CHAT_DB_PATH", DEFAULT_DB_PATH)
+        self.session_idle_seconds = session_idle_seconds
+        self._local = threading.local()
+        self._answer_cache_writes = 0
+        self._rate_limit_writes = 0
+        self._session_writes = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.blobs = BlobStore(blob_dir or os.getenv("BLOB_DIR", os.path.join(directory or ".", "blobs")))
+        self.reminders = UserCollection(
+            self, "reminders",
+            ["id", "title", "subject", "datetime", "due_at", "notes", "created_at"],
+            ["id", "title", "subject", "datetime", "notes", "created_at"]
+        )
+        self.drawings = UserCollection(
+            self, "drawings",
+            ["id", "title", "subject", "blob_sha", "mime_type", "size", "created_at"],
+            ["id", "title", "subject", "created_at"],
+            blob_column="blob_sha"
+        )
+        self.files = UserCollection(
+            self, "files",
+            ["id", "file_name AS fileName", "file_type AS fileType", "blob_sha", "size", "question", "uploaded_at"],
+            ["id", "file_name AS fileName", "file_type AS fileType", "question", "uploaded_at"],
+            blob_column="blob_sha"
+        )
+        self._upgrade_reminders()
+        self.connection().executescript(SCHEMA)
+        self._seed_table_counts()
+
+    def connection(self):
+        """Return this thread's connection, opening one if needed"""
+        conn = getattr(self._local, "conn", None)
+        # A forked worker must not reuse the parent's connection
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements as one write transaction"""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ============================================
+    # CHAT HISTORY
+    # ============================================
+
+    def add_chat_messages(self, username, entries, keep=100):
+        """
+        Append several messages in one transaction, keeping only the newest
+        `keep`. Each message gets the next per-user sequence number, so
+        trimming is a single index range delete rather than a rescan.
+        """
+        with self.transaction() as conn:
+            last_seq, count = self._chat_state(conn, username)
+            conn.executemany(
+                "INSERT INTO chat_messages (username, seq, message, sender, timestamp) VALUES (?, ?, ?, ?, ?)",
+                [(username, last_seq + i, e["message"], e["sender"], e["timestamp"])
+                 for i, e in enumerate(entries, start=1)]
+            )
+            last_seq += len(entries)
+            trimmed = conn.execute(
+                "DELETE FROM chat_messages WHERE username = ? AND seq <= ?", (username, last_seq - keep)
+            ).rowcount
+            count = count + len(entries) - trimmed
+            # An upsert rather than INSERT OR REPLACE, so the counting triggers see an update
+            conn.execute(
+                "INSERT INTO chat_counters (username, last_seq, message_count) VALUES (?, ?, ?) "
+                "ON CONFLICT (username) DO UPDATE SET last_seq = excluded.last_seq, "
+                "message_count = excluded.message_count",
+                (username, last_seq, count)
+            )
+            return count
+
+    def get_chat_state(self, username):
+        """Return (last_seq, message_count) for a user; (0, 0) if none"""
+        return self._chat_state(self.connection(), username)
+
+    def get_chat_history(self, username, since=0, limit=None):
+        """Messages with seq greater than `since`, oldest first, at most `limit`"""
+        rows = self.connection().execute(
+            "SELECT seq AS id, message, sender, timestamp FROM chat_messages "
+            "WHERE username = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (username, since, -1 if limit is None else limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear_chat_history(self, username):
+        with self.transaction() as conn:
+            deleted = conn.execute("DELETE FROM chat_messages WHERE username = ?", (username,)).rowcount
+            conn.execute("UPDATE chat_counters SET message_count = 0 WHERE username = ?", (username,))
+            return deleted
+
+    @staticmethod
+    def _chat_state(conn, username):
+        row = conn.execute(
+            "SELECT last_seq, message_count FROM chat_counters WHERE username = ?", (username,)
+        ).fetchone()
+        return (row["last_seq"], row["message_count"]) if row else (0, 0)
+
+    # ============================================
+    # REMINDERS
+    # ============================================
+
+    def add_reminder(self, username, reminder, due_at):
+        with self.transaction() as conn:
+            return self.reminders.add(conn, username, {
+                "title": reminder["title"],
+                "subject": reminder["subject"],
+                "datetime": reminder["datetime"],
+                "due_at": due_at,
+                "notes": reminder["notes"],
+                "created_at": reminder["created_at"],
+                "notify_at": due_at
+            })
+
+    def get_active_reminders(self, username, now, after=0, limit=None):
+        """Reminders that are not due yet; due ones are left for the scheduler"""
+        return self.reminders.list(username, after, limit, where="due_at > ?", params=(now,))
+
+    def next_reminder_due(self):
+        """Earliest time a reminder is up for delivery, or None; one seek on idx_reminders_notify"""
+        return self.connection().execute("SELECT MIN(notify_at) FROM reminders").fetchone()[0]
+
+    def claim_due_reminders(self, now, limit=100, lease=300):
+        """
+        Claim and return up to `limit` reminders up for delivery by `now`,
+        earliest first. Claimed reminders stay in the table with notify_at
+        moved `lease` seconds ahead: this runs in one write transaction, so
+        when several workers poll at once each reminder goes to one of them,
+        and if that worker dies before settle_reminders() another picks the
+        reminder up once the lease runs out.
+        """
+        with self.transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, username, title, subject, datetime, due_at, notes, created_at, attempts + 1 AS attempts "
+                "FROM reminders WHERE notify_at <= ? ORDER BY notify_at LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE reminders SET notify_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(now + lease, row["id"]) for row in rows]
+            )
+        return [dict(row) for row in rows]
+
+    def settle_reminders(self, done, retries=()):
+        """
+        After a delivery pass: delete the reminders in `done` (delivered or
+        given up on) and put each (id, retry_at) in `retries` back in the
+        queue for another attempt at retry_at.
+        """
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM reminders WHERE id = ?", [(reminder_id,) for reminder_id in done])
+            conn.executemany(
+                "UPDATE reminders SET notify_at = ? WHERE id = ?",
+                [(retry_at, reminder_id) for reminder_id, retry_at in retries]
+            )
+
+    def delete_reminder(self, username, reminder_id):
+        return self.reminders.delete(username, reminder_id)
+
+    # ============================================
+    # DRAWINGS
+    # ============================================
+
+    def add_drawing(self, username, drawing, content):
+        """Store the drawing's bytes as a blob and its metadata as a row"""
+        with self.transaction() as conn:
+            sha = self.blobs.put(content)
+            return self.drawings.add(conn, username, {
+                "title": drawing["title"],
+                "subject": drawing["subject"],
+                "blob_sha": sha,
+                "mime_type": drawing["mime_type"],
+                "size": len(content),
+                "created_at": drawing["created_at"]
+            })
+
+    def list_drawings(self, username, after=0, limit=None):
+        return self.drawings.list(username, after, limit)
+
+    def get_drawing(self, username, drawing_id):
+        return self.drawings.get(username, drawing_id)
+
+    def delete_drawing(self, username, drawing_id):
+        return self.drawings.delete(username, drawing_id)
+
+    # ============================================
+    # UPLOADED FILES
+    # ============================================
+
+    def add_file(self, username, file_record, content):
+        with self.transaction() as conn:
+            sha = self.blobs.put(content)
+            return self._insert_file(conn, username, file_record, sha, len(content))
+
+    def add_file_from_writer(self, username, file_record, writer):
+        """Commit a streamed upload (see BlobWriter) and record it"""
+        with self.transaction() as conn:
+            sha = writer.commit()
+            return self._insert_file(conn, username, file_record, sha, writer.size)
+
+    def _insert_file(self, conn, username, file_record, sha, size):
+        return self.files.add(conn, username, {
+            "file_name": file_record["fileName"],
+            "file_type": file_record["fileType"],
+            "blob_sha": sha,
+            "size": size,
+            "question": file_record["question"],
+            "uploaded_at": file_record["uploaded_at"]
+        })
+
+    def list_files(self, username, after=0, limit=None):
+        return self.files.list(username, after, limit)
+
+    def get_file(self, username, file_id):
+        return self.files.get(username, file_id)
+
+    # ============================================
+    # BLOBS
+    # ============================================
+
+    def blob_path(self, sha):
+        return self.blobs.path(sha)
+
+    def release_blob(self, conn, sha):
+        """Remove a blob once no drawing or file references it (call inside a transaction)"""
+        still_used = (
+            conn.execute("SELECT 1 FROM drawings WHERE blob_sha = ? LIMIT 1", (sha,)).fetchone()
+            or conn.execute("SELECT 1 FROM files WHERE blob_sha = ? LIMIT 1", (sha,)).fetchone()
+        )
+        if not still_used:
+            self.blobs.delete(sha)
+
+    # ============================================
+    # SESSIONS
+    # ============================================
+
+    def load_session(self, username, conn=None):
+        """Pass `conn` to read inside an open transaction; archived sessions are found too"""
+        conn = conn or self.connection()
+        row = conn.execute("SELECT * FROM sessions WHERE username = ?", (username,)).fetchone()
+        if row is not None:
+            return self._session_record(row)
+        row = conn.execute(
+            "SELECT last_activity, data FROM session_archive WHERE username = ?", (username,)
+        ).fetchone()
+        if row is not None:
+            login_time, questions_asked, theme_preference, topics_covered, quiz_scores = json.loads(row["data"])
+            return {
+                "username": username,
+                "login_time": login_time,
+                "questions_asked": questions_asked,
+                "topics_covered": topics_covered,
+                "quiz_scores": quiz_scores,
+                "last_activity": row["last_activity"],
+                "theme_preference": theme_preference
+            }
+        return None
+
+    def save_session(self, record, conn=None):
+        """Save a session; an archived copy is dropped, so saving rehydrates it"""
+        if conn is None:
+            with self.transaction() as conn:
+                return self.save_session(record, conn)
+        conn.execute(
+            "INSERT INTO sessions (username, login_time, questions_asked, last_activity, "
+            "theme_preference, topics_covered, quiz_scores) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET login_time = excluded.login_time, "
+            "questions_asked = excluded.questions_asked, last_activity = excluded.last_activity, "
+            "theme_preference = excluded.theme_preference, topics_covered = excluded.topics_covered, "
+            "quiz_scores = excluded.quiz_scores",
+            (record["username"], record["login_time"], record["questions_asked"], record["last_activity"],
+             record["theme_preference"], json.dumps(record["topics_covered"]), json.dumps(record["quiz_scores"]))
+        )
+        conn.execute("DELETE FROM session_archive WHERE username = ?", (record["username"],))
+        self._session_writes += 1
+        if self.session_idle_seconds and self._session_writes % SESSION_SWEEP_EVERY == 0:
+            cutoff = datetime.now() - timedelta(seconds=self.session_idle_seconds)
+            self.archive_idle_sessions(cutoff.isoformat(), conn=conn)
+
+    def archive_idle_sessions(self, cutoff, limit=SESSION_SWEEP_BATCH, conn=None):
+        """
+        Move up to `limit` sessions last active before `cutoff` (ISO time) to
+        session_archive; returns how many moved
+        """
+        if conn is None:
+            with self.transaction() as conn:
+                return self.archive_idle_sessions(cutoff, limit, conn)
+        rows = conn.execute(
+            "SELECT * FROM sessions WHERE last_activity < ? ORDER BY last_activity LIMIT ?", (cutoff, limit)
+        ).fetchall()
+        # The JSON columns are spliced in as they are, without a decode/encode round trip
+        archived = [
+            (row["username"], row["last_activity"],
+             f'[{json.dumps(row["login_time"])},{row["questions_asked"]},{json.dumps(row["theme_preference"])},'
+             f'{row["topics_covered"]},{row["quiz_scores"]}]')
+            for row in rows
+        ]
+        conn.executemany(
+            "INSERT INTO session_archive (username, last_activity, data) VALUES (?, ?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET last_activity = excluded.last_activity, data = excluded.data",
+            archived
+        )
+        conn.executemany("DELETE FROM sessions WHERE username = ?", [(username,) for username, _, _ in archived])
+        return len(archived)
+
+    @staticmethod
+    def _session_record(row):
+        if row is None:
+            return None
+        record = dict(row)
+        record["topics_covered"] = json.loads(record["topics_covered"])
+        record["quiz_scores"] = json.loads(record["quiz_scores"])
+        return record
+
+    # ============================================
+    # SHARED ANSWER CACHE
+    # ============================================
+
+    def get_cached_answer(self, question_key, now):
+        """Return (answer, expires_at) if a fresh answer is cached"""
+        row = self.connection().execute(
+            "SELECT answer, expires_at FROM answer_cache WHERE question_key = ? AND expires_at > ?",
+            (question_key, now)
+        ).fetchone()
+        return (row["answer"], row["expires_at"]) if row else None
+
+    def set_cached_answer(self, question_key, answer, expires_at):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answer_cache (question_key, answer, expires_at) VALUES (?, ?, ?)",
+                (question_key, answer, expires_at)
+            )
+            self._answer_cache_writes += 1
+            if self._answer_cache_writes % ANSWER_CACHE_PURGE_EVERY == 0:
+                conn.execute("DELETE FROM answer_cache WHERE expires_at <= ?", (time.time(),))
+
+    # ============================================
+    # SHARED RATE LIMITS
+    # ============================================
+
+    def take_rate_token(self, key, burst, rate, now, cost=1):
+        """
+        Spend `cost` tokens from the bucket for `key` (see utils/ratelimit.py).
+        Returns 0 if there were enough, else seconds until there will be.
+        """
+        with self.transaction() as conn:
+            row = conn.execute("SELECT tokens, updated FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row["tokens"] + (now - row["updated"]) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / rate
+            conn.execute(
+                "INSERT INTO rate_limits (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                "full_at = excluded.full_at",
+                (key, tokens, now, now + (burst - tokens) / rate)
+            )
+            self._rate_limit_writes += 1
+            if self._rate_limit_writes % RATE_LIMIT_PURGE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limits WHERE full_at <= ?", (now,))
+        return wait
+
+    # ============================================
+    # STATUS
+    # ============================================
+
+    def has_user(self, username):
+        """True if the user has a session or any chat history"""
+        conn = self.connection()
+        return bool(
+            conn.execute("SELECT 1 FROM sessions WHERE username = ?", (username,)).fetchone()
+            or conn.execute("SELECT 1 FROM session_archive WHERE username = ?", (username,)).fetchone()
+            or conn.execute("SELECT 1 FROM chat_counters WHERE username = ?", (username,)).fetchone()
+        )
+
+    def stats(self):
+        """Totals from table_counts: one small read however much data there is"""
+        counts = dict(self.connection().execute("SELECT name, value FROM table_counts").fetchall())
+        return {
+            "active_sessions": counts.get("sessions", 0),
+            "archived_sessions": counts.get("session_archive", 0),
+            "users_with_chat_history": counts.get("chat_users", 0),
+            "total_reminders": counts.get("reminders", 0),
+            "total_drawings": counts.get("drawings", 0),
+            "total_files": counts.get("files", 0)
+        }
+
+    def _upgrade_reminders(self):
+        """Add the delivery columns to a reminders table created before they existed"""
+        conn = self.connection()
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reminders'").fetchone():
+            return
+        with self.transaction() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(reminders)")}
+            if "notify_at" in columns:
+                return
+            conn.execute("ALTER TABLE reminders ADD COLUMN notify_at REAL NOT NULL DEFAULT 0")
+            conn.execute("ALTER TABLE reminders ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE reminders SET notify_at = due_at")
+            conn.execute("DROP INDEX IF EXISTS idx_reminders_due")
+
+    def _seed_table_counts(self):
+        """Count any table that has no entry in table_counts yet"""
+        conn = self.connection()
+        present = {row[0] for row in conn.execute("SELECT name FROM table_counts")}
+        if present >= TABLE_COUNT_QUERIES.keys():
+            return
+        # The write lock keeps other processes from changing the tables
+        # between the count and the insert; until the row exists their
+        # triggers update nothing, so nothing is counted twice
+        with self.transaction() as conn:
+            for name, query in TABLE_COUNT_QUERIES.items():
+                conn.execute(
+                    f"INSERT OR IGNORE INTO table_counts (name, value) VALUES (?, ({query}))", (name,)
+                )
@@ -0,0 +1,52 @@
+import hashlib
+import time
+
+WORDS = ("learning", "practice", "example", "step", "idea", "answer", "rule", "pattern",
+         "question", "method", "result", "reason", "detail", "concept", "review", "summary")
+
+
+class StubBackend:
+    """
+    Deterministic stand-in for a real inference backend (utils/inference.py),
+    selected with LOCAL_MODEL_NAME=stub or LOCAL_MODEL_BACKEND=stub. The
+    reply depends only on the prompt, and a call costs pass_ms plus
+    token_ms per generated word (a batch is one pass), so benchmark runs
+    are reproducible offline.
+    """
+
+    name = "stub"
+
+    def __init__(self, pass_ms=0.0, token_ms=0.0, tokens=12):
+        self.pass_ms = pass_ms
+        self.token_ms = token_ms
+        self.tokens = tokens
+
+    def words(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return [WORDS[digest[i % len(digest)] % len(WORDS)] for i in range(self.tokens)]
+
+    def generate(self, prompts, **options):
+        self._sleep((self.pass_ms + self.token_ms * self.tokens) / 1000)
+        return [self.reply(prompt) for prompt in prompts]
+
+    def reply(self, prompt):
+        return prompt + " " + " ".join(self.words(prompt))
+
+    def stream(self, prompt, submit=None, max_length=None, timeout=None):
+        """
+        Yield the reply word by word, as a real backend streams tokens. The
+        prompt comes first, as generate() includes it too.
+        """
+        yield prompt
+        self._sleep(self.pass_ms / 1000)
+        for word in self.words(prompt):
+            self._sleep(self.token_ms / 1000)
+            yield " " + word
+
+    def after_fork(self):
+        return self
+
+    @staticmethod
+    def _sleep(seconds):
+        if seconds > 0:
+            time.sleep(seconds)
@@ -63,8 +63,8 @@ async function sendMessage() {
     const typingIndicator = showTypingIndicator();
 
     try {
-        // Send request to backend
-        const response = await fetch("http://localhost:5000/ask", {
+        // Stream the answer from the backend as Server-Sent Events
+        const response = await fetch("http://localhost:5000/ask/stream", {
             method: "POST",
             headers: {
                 "Content-Type": "application/json"
@@ -78,13 +78,50 @@ async function sendMessage() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
-        
-        // Remove typing indicator
-        removeTypingIndicator();
-        
-        // Display bot response
-        displayMessage(data.answer, 'bot');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        let botMessage = null;
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+
+            // Events are separated by a blank line
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const event of events) {
+                const dataLine = event.split('\n').find(line => line.startsWith('data: '));
+                if (!dataLine) {
+                    continue;
+                }
+                const data = JSON.parse(dataLine.slice(6));
+
+                if (event.startsWith('event: done') || event.startsWith('event: error')) {
+                    answer = data.answer;
+                } else {
+                    answer += data.token;
+                }
+
+                // Replace the typing indicator with the answer as soon as text arrives
+                if (!botMessage) {
+                    removeTypingIndicator();
+                    botMessage = displayMessage(answer, 'bot');
+                } else {
+                    botMessage.querySelector('.message-text').innerHTML = answer;
+                    chatBox.scrollTop = chatBox.scrollHeight;
+                }
+            }
+        }
+
+        if (!botMessage) {
+            throw new Error("Empty response from backend");
+        }
         
     } catch (error) {
         console.error("Error:", error);